@@ -0,0 +1,771 @@
+import argparse
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import transOA
+from recordsOA import iter_records, Authorship
+
+# resource (peak RSS) is only available on Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Name parts used for synthetic authors; some carry diacritics
+given_names = ["Anna", "Björn", "José", "Marie", "Søren", "Chen", "Ólafur", "Zoë", "Li", "Karin", "Jürgen", "Ana María"]
+family_names = ["Svensson", "Müller", "García", "Nguyen", "Østergaard", "Dupont", "Kowalski", "Öberg", "Smith", "Tanaka"]
+country_codes = ["SE", "US", "DE", "FR", "GB", "CN", "JP", "DK", "NO", "FI", "NL", "IT", "ES", "CH"]
+funder_names = ["Vetenskapsrådet", "Forte", "Formas", "Vinnova", "European Research Council", "Wellcome Trust",
+                "National Science Foundation", "Knut och Alice Wallenbergs Stiftelse"]
+
+# Weighted raw_type distribution of synthetic corpora; the last ones match no genre rule
+raw_type_weights = {
+    "journal-article": 60, "proceedings-article": 12, "book-chapter": 8, "Article, review": 4,
+    "posted-content": 4, "book": 2, "report": 2, "edited-book": 1, "Conference Abstract": 1,
+    "dataset": 3, "other": 2, "": 1
+}
+
+# Weighted language distribution of synthetic corpora; "xx" is not an ISO 639-1 code
+language_weights = {"en": 85, "sv": 8, "de": 2, "fr": 2, "no": 1, "fi": 1, "xx": 1}
+
+def make_institutions(count, rng):
+    """Return count synthetic OpenAlex institutions."""
+    return [{
+        "id": f"https://openalex.org/I{1000 + i}",
+        "display_name": f"University of {rng.choice(family_names)} {i}",
+        "country_code": rng.choice(country_codes)
+    } for i in range(count)]
+
+def make_authorships(count, institutions, rng, duplicate_rate=0.05, max_institutions=3):
+    """
+    Return count synthetic authorships.
+
+    A share of duplicate_rate repeats an earlier author, as OpenAlex does when an
+    author is listed once per affiliation.
+    """
+    authorships = []
+    for i in range(count):
+        if authorships and rng.random() < duplicate_rate:
+            author = dict(rng.choice(authorships)["author"])
+        else:
+            author = {
+                "id": f"https://openalex.org/A{i}",
+                "display_name": f"{rng.choice(given_names)} {rng.choice(family_names)}-{i}",
+                "orcid": f"https://orcid.org/0000-0002-{i:04d}-0000" if rng.random() < 0.4 else None
+            }
+        authorships.append({
+            "author": author,
+            "institutions": rng.sample(institutions, rng.randint(0, min(max_institutions, len(institutions))))
+        })
+    return authorships
+
+def make_work(index, authors, institutions, rng, max_institutions=3, funders=1, raw_type="journal-article",
+              abstract_words=0, language="en"):
+    """Return a synthetic OpenAlex work with the given number of authorships."""
+    work = {
+        "id": f"https://openalex.org/W{index}",
+        "doi": f"https://doi.org/10.9999/bench.{index}",
+        "title": f"Synthetic work {index}: a benchmark record",
+        "publication_year": 2025,
+        "updated_date": "2025-06-01T00:00:00.000000",
+        "language": language,
+        "ids": {"openalex": f"https://openalex.org/W{index}"},
+        "primary_location": {
+            "raw_type": raw_type,
+            "is_oa": True,
+            "landing_page_url": f"https://example.org/{index}",
+            "source": {"display_name": "Journal of Benchmarks", "issn_l": "1234-5678"}
+        },
+        "authorships": make_authorships(authors, institutions, rng, max_institutions=max_institutions),
+        "biblio": {"volume": "1", "issue": "2", "first_page": "1", "last_page": "10"},
+        "funders": [{"display_name": name} for name in funder_names[:funders]]
+    }
+    if index % 2:
+        work["ids"]["pmid"] = f"https://pubmed.ncbi.nlm.nih.gov/{index}"
+    if abstract_words:
+        work["abstract_inverted_index"] = make_inverted_index(abstract_words, rng)
+    work.update(make_unused_fields(index))
+    return work
+
+def make_unused_fields(index):
+    """
+    Return fields of a real OpenAlex work that neither the converter nor the classifier read.
+
+    They are derived from index alone, so they do not change the random draws
+    of the rest of the corpus, and make the payloads about as large as real ones.
+    """
+    return {
+        "referenced_works": [f"https://openalex.org/W{index * 7 + i}" for i in range(40)],
+        "related_works": [f"https://openalex.org/W{index * 3 + i}" for i in range(10)],
+        "counts_by_year": [{"year": 2025 - i, "cited_by_count": (index + i) % 9} for i in range(5)],
+        "topics": [{"id": f"https://openalex.org/T{10000 + (index + i) % 500}", "display_name": f"Topic {i}",
+                    "score": 0.9 - i / 10} for i in range(3)],
+        "concepts": [{"id": f"https://openalex.org/C{index % 1000 + i}", "wikidata": f"https://www.wikidata.org/wiki/Q{i}",
+                      "display_name": f"Concept {i}", "level": i % 4, "score": 0.5} for i in range(8)],
+        "locations": [{"is_oa": True, "landing_page_url": f"https://example.org/{index}/{i}", "license": "cc-by",
+                       "version": "publishedVersion"} for i in range(2)],
+        "cited_by_count": index % 50,
+        "is_retracted": False
+    }
+
+def make_corpus(count, seed=1, max_authors=3000, hyper_rate=0.01, institutions=500, max_institutions=3,
+                max_funders=4, abstract_words=400, abstract_rate=0.9):
+    """
+    Generate a synthetic corpus of OpenAlex works.
+
+    Most works get 1-15 authorships; a share of hyper_rate is hyper-authored,
+    with 1,000 up to max_authors authorships. raw_types and languages follow
+    raw_type_weights and language_weights, including values without a genre
+    rule or ISO code.
+
+    Args:
+        count (int): Number of works.
+        seed (int): Random seed; the same arguments give the same corpus.
+        max_authors (int): Authorships of the largest hyper-authored works.
+        hyper_rate (float): Share of hyper-authored works.
+        institutions (int): Size of the institution pool.
+        max_institutions (int): Maximum institutions per authorship.
+        max_funders (int): Maximum funders per work.
+        abstract_words (int): Maximum abstract length in words.
+        abstract_rate (float): Share of works with an abstract.
+    Returns:
+        list: The works.
+    """
+    rng = random.Random(seed)
+    pool = make_institutions(institutions, rng)
+    raw_types, raw_type_counts = zip(*raw_type_weights.items())
+    languages, language_counts = zip(*language_weights.items())
+    corpus = []
+    for index in range(count):
+        if rng.random() < hyper_rate:
+            authors = rng.randint(min(1000, max_authors), max_authors)
+        else:
+            authors = rng.randint(1, 15)
+        words = rng.randint(min(50, abstract_words), abstract_words) if rng.random() < abstract_rate else 0
+        corpus.append(make_work(
+            index, authors, pool, rng, max_institutions,
+            funders=rng.randint(0, max_funders),
+            raw_type=rng.choices(raw_types, raw_type_counts)[0],
+            abstract_words=words,
+            language=rng.choices(languages, language_counts)[0]))
+    return corpus
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB, or None where it is unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def summarize(benchmark, records, seconds, stages=None, **extra):
+    """Return the result fields common to the corpus benchmarks."""
+    result = {
+        "benchmark": benchmark,
+        "records": records,
+        "seconds": round(seconds, 4),
+        "records_per_second": round(records / seconds) if seconds else None,
+        "peak_rss_mb": peak_rss_mb()
+    }
+    if stages is not None:
+        result["stages"] = {name: round(value, 4) for name, value in stages.items()}
+    result.update(extra)
+    return result
+
+def names_before_index(mods, authorships, role):
+    """
+    Author loop of build_mods before the name index, kept as the baseline of bench_authors.
+
+    Authors are keyed on the raw display_name, and the affiliation string is
+    formatted from every institution of every authorship.
+    """
+    seen_authors = {}  # display_name -> first instance data
+
+    for authorship in authorships:
+        author = authorship.get("author", {})
+        institutions = authorship.get("institutions", [])
+        display_name = author.get("display_name", "")
+        orcid = author.get("orcid", None)
+
+        # Create affiliation string
+        affiliations = []
+        for institution in institutions:
+            inst_display_name = institution.get("display_name", "")
+            country_code = institution.get("country_code", "")
+            country_name = transOA.country_names.get(country_code)
+
+            if not country_name:
+                print(f"Error: Country code '{country_code}' not found in country_code_mapping.")
+                country_name = country_code
+
+            if inst_display_name:
+                affiliations.append(f"{inst_display_name}, {country_name}")
+
+        affiliation_str = "; ".join(affiliations)
+        current_author_data = {
+            'orcid': orcid,
+            'affiliation': affiliation_str,
+            'institutions': institutions
+        }
+
+        # Check if we've seen this author before
+        if display_name in seen_authors:
+            # Check for conflicts with the first instance
+            first_instance = seen_authors[display_name]
+            has_orcid_conflict = (first_instance['orcid'] != current_author_data['orcid']) and (first_instance['orcid'] and current_author_data['orcid'])
+            has_affiliation_conflict = (first_instance['affiliation'] != current_author_data['affiliation']) and (first_instance['affiliation'] and current_author_data['affiliation'])
+
+            # If there are conflicts, add this as a separate author entry
+            if not (has_orcid_conflict or has_affiliation_conflict):
+                continue
+        else:
+            seen_authors[display_name] = current_author_data
+
+        # Create XML for the author
+        name_parts = display_name.split()
+        family_name = name_parts[-1] if name_parts else ""
+        given_name = " ".join(name_parts[:-1]) if len(name_parts) > 1 else ""
+
+        name_elem = ET.SubElement(mods, "name", {"type": "personal"})
+        ET.SubElement(name_elem, "namePart", {"type": "family"}).text = family_name
+        ET.SubElement(name_elem, "namePart", {"type": "given"}).text = given_name
+
+        role_elem = ET.SubElement(name_elem, "role")
+        ET.SubElement(role_elem, "roleTerm", {"type": "code", "authority": "marcrelator"}).text = role
+
+        if current_author_data['affiliation']:
+            ET.SubElement(name_elem, "affiliation").text = current_author_data['affiliation']
+
+        if current_author_data['orcid']:
+            orcid_value = current_author_data['orcid'].replace("https://orcid.org/", "")
+            ET.SubElement(name_elem, "description").text = f"orcid.org={orcid_value}"
+
+def names_with_index(mods, authorships, role):
+    """Author loop of build_mods: decode the authorships, deduplicate them on the name index and add the names."""
+    for display_name, affiliation, orcid in transOA.dedupe_authorships(map(Authorship, authorships)):
+        transOA.add_name(mods, display_name, role, affiliation, orcid)
+
+def bench_authors(works=20, authors=3000, institutions=200, max_institutions=3, shared=False, repeat=5, seed=1):
+    """
+    Time author processing on hyper-authored works, against the loop used before the name index.
+
+    Both author loops add the <name> elements of every work to a fresh <mods>
+    element and must give the same markup; build_mods is also timed as a whole.
+
+    Args:
+        works (int): Number of works.
+        authors (int): Authorships per work.
+        institutions (int): Size of the institution pool.
+        max_institutions (int): Maximum institutions per authorship.
+        shared (bool): Give every work the same author list, as for large collaborations.
+        repeat (int): Number of timed rounds; the fastest is reported.
+        seed (int): Random seed.
+    Returns:
+        dict: Timing results.
+    """
+    rng = random.Random(seed)
+    pool = make_institutions(institutions, rng)
+    records = [make_work(i, authors, pool, rng, max_institutions) for i in range(works)]
+    if shared:
+        for record in records:
+            record["authorships"] = json.loads(json.dumps(records[0]["authorships"]))
+
+    def names(method):
+        def run(record):
+            mods = ET.Element("mods")
+            method(mods, record["authorships"], "aut")
+            return mods
+        return run
+
+    methods = {"name_index": names(names_with_index), "before_index": names(names_before_index),
+               "build_mods": transOA.build_mods}
+    expected = [transOA.serialize_direct(methods["before_index"](record)) for record in records]
+    if [transOA.serialize_direct(methods["name_index"](record)) for record in records] != expected:
+        raise AssertionError("the name index gives different <name> elements")
+
+    # Rounds alternate between the methods, so drift in machine speed affects them alike
+    seconds = {}
+    for _ in range(repeat):
+        for name, method in methods.items():
+            start = time.perf_counter()
+            for record in records:
+                method(record)
+            elapsed = time.perf_counter() - start
+            seconds[name] = min(seconds.get(name, elapsed), elapsed)
+    return {
+        "benchmark": "authors",
+        "works": works,
+        "authorships_per_work": authors,
+        "shared_author_list": shared,
+        "name_index_authorships_per_second": round(works * authors / seconds["name_index"]),
+        "before_index_authorships_per_second": round(works * authors / seconds["before_index"]),
+        "speedup": round(seconds["before_index"] / seconds["name_index"], 2),
+        "build_mods_seconds": round(seconds["build_mods"], 4),
+        "build_mods_authorships_per_second": round(works * authors / seconds["build_mods"])
+    }
+
+def synthetic_word(number):
+    """Return a word made of letters only for a number (0 -> "wa", 27 -> "wbb"), so it survives tokenizers."""
+    letters = ""
+    while True:
+        number, digit = divmod(number, 26)
+        letters = chr(ord("a") + digit) + letters
+        if not number:
+            return "w" + letters
+
+def make_inverted_index(words, rng, vocabulary=2000):
+    """Return a synthetic abstract_inverted_index for an abstract of the given number of words."""
+    inverted_index = {}
+    for position in range(words):
+        inverted_index.setdefault(synthetic_word(rng.randrange(vocabulary)), []).append(position)
+    return inverted_index
+
+def abstract_by_sorting_pairs(inverted_index):
+    """Naive rebuild: sort all (position, word) pairs."""
+    pairs = sorted((position, word) for word, positions in inverted_index.items() for position in positions)
+    return " ".join(word for _, word in pairs)
+
+def abstract_by_sorting_positions(inverted_index):
+    """Naive rebuild: map positions to words, then sort the positions."""
+    words = {position: word for word, positions in inverted_index.items() for position in positions}
+    return " ".join(words[position] for position in sorted(words))
+
+def bench_abstract(words=250, abstracts=2000, repeat=3, seed=1):
+    """
+    Time abstract reconstruction from inverted indexes against naive sorting.
+
+    Args:
+        words (int): Words per abstract.
+        abstracts (int): Number of abstracts.
+        repeat (int): Number of timed rounds; the fastest is reported.
+        seed (int): Random seed.
+    Returns:
+        dict: Abstracts per second for each method.
+    """
+    rng = random.Random(seed)
+    indexes = [make_inverted_index(words, rng) for _ in range(abstracts)]
+    methods = {
+        "scatter": transOA.abstract_from_inverted_index,
+        "sort_pairs": abstract_by_sorting_pairs,
+        "sort_positions": abstract_by_sorting_positions
+    }
+    expected = [abstract_by_sorting_pairs(index) for index in indexes]
+    result = {"benchmark": "abstract", "words_per_abstract": words, "abstracts": abstracts}
+    for name, method in methods.items():
+        if [method(index) for index in indexes] != expected:
+            raise AssertionError(f"{name} rebuilds a different abstract")
+        seconds = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for index in indexes:
+                method(index)
+            elapsed = time.perf_counter() - start
+            seconds = elapsed if seconds is None else min(seconds, elapsed)
+        result[f"{name}_per_second"] = round(abstracts / seconds)
+    return result
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the OpenAlex works API and the Swepub Classify API.
+
+    Serves GET /works with select and cursor paging and these filters, combined
+    with "," (and) and "|" (or) like OpenAlex does:
+
+    - "openalex" and "doi": the works with those IDs, in the order given
+    - "authorships.institutions.lineage": works with an author at one of the
+      institutions or below it
+    - "from_updated_date" and "from_created_date": works changed (created) on
+      or after the date; like OpenAlex, whole days are compared
+
+    It also serves GET /works/<ID or DOI URL> and POST /classify, which suggests
+    a code derived from a hash of the title. Pages hold at most max_per_page
+    works. Every response is delayed by latency seconds, like a remote server would.
+    Use load() to serve a corpus from a server in this process.
+    """
+    protocol_version = "HTTP/1.1"
+    works_by_id = {}
+    works_by_doi = {}
+    latency = 0
+    max_per_page = 200
+
+    @classmethod
+    def load(cls, corpus, latency=0):
+        """Serve the works of corpus, replacing those served so far."""
+        cls.latency = latency
+        cls.works_by_id = {stub_short_id(work["id"]): work for work in corpus}
+        cls.works_by_doi = {work["doi"].replace("https://doi.org/", "").lower(): work
+                            for work in corpus if work.get("doi")}
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.rstrip("/") == "/works":
+            try:
+                works = self.filter_works(query.get("filter", [""])[0])
+            except ValueError as e:
+                return self.send_json(400, {"error": str(e)})
+            if "select" in query:
+                fields = query["select"][0].split(",")
+                works = [{field: work.get(field) for field in fields} for work in works]
+            per_page = min(self.max_per_page, int(query.get("per-page", ["25"])[0]))
+            cursor = query.get("cursor", ["*"])[0]
+            start = 0 if cursor == "*" else int(cursor)
+            next_cursor = str(start + per_page) if start + per_page < len(works) else None
+            return self.send_json(200, {"meta": {"count": len(works), "next_cursor": next_cursor},
+                                        "results": works[start:start + per_page]})
+        key = unquote(url.path[len("/works/"):]).lower()
+        if key.startswith("https://doi.org/"):
+            work = self.works_by_doi.get(key[len("https://doi.org/"):])
+        else:
+            work = self.works_by_id.get(key)
+        if work is None:
+            return self.send_json(404, {"error": "not found"})
+        self.send_json(200, work)
+
+    def filter_works(self, filter_string):
+        """Return the works matching an OpenAlex filter string, in a stable order."""
+        lookups, tests = None, []
+        for part in filter(None, filter_string.split(",")):
+            name, _, values = part.partition(":")
+            values = values.split("|")
+            if name in ("openalex", "doi"):
+                table = self.works_by_doi if name == "doi" else self.works_by_id
+                lookups = (lookups or []) + [table[value.lower()] for value in values if value.lower() in table]
+            elif name == "authorships.institutions.lineage":
+                tests.append(lambda work, wanted={value.lower() for value in values}: not wanted.isdisjoint(
+                    stub_short_id(lineage_id)
+                    for authorship in work.get("authorships") or []
+                    for institution in authorship.get("institutions") or []
+                    for lineage_id in (institution.get("lineage") or []) + [institution.get("id")]))
+            elif name in ("from_updated_date", "from_created_date"):
+                field = name[len("from_"):]
+                tests.append(lambda work, field=field, day=values[0][:10]: (work.get(field) or "")[:10] >= day)
+            else:
+                raise ValueError(f"the stub does not support the filter {name}")
+        works = lookups if lookups is not None else list(self.works_by_id.values())
+        return [work for work in works if all(test(work) for test in tests)]
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.send_json(200, {"suggestions": [{"code": stub_code(body.get("title"), body.get("level")), "_score": 0.9}]})
+
+def stub_code(title, level):
+    """Return the code the stub classifier suggests for a title at a level."""
+    digest = int(hashlib.md5((title or "").encode("utf-8")).hexdigest(), 16)
+    return str(10000 + digest % 900) if level == 5 else str(100 + digest % 90)
+
+def stub_short_id(openalex_id):
+    """Return the lower-cased short form of an OpenAlex ID ("https://openalex.org/I1" -> "i1")."""
+    return (openalex_id or "").rsplit("/", 1)[-1].lower()
+
+def serve_stub(corpus, connection, latency=0):
+    """Serve corpus from a stub server in this process and send its port through connection."""
+    StubHandler.load(corpus, latency)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    connection.send(server.server_address[1])
+    server.serve_forever()
+
+@contextlib.contextmanager
+def stub_server(corpus, latency=0):
+    """
+    Run the stub OpenAlex and Swepub server in a separate process.
+
+    In its own process the server does not compete with the timed code for the
+    interpreter lock. latency (seconds) delays every response.
+
+    Yields:
+        str: Base URL of the server (e.g., "http://127.0.0.1:8765").
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=serve_stub, args=(corpus, child, latency), daemon=True)
+    process.start()
+    try:
+        yield f"http://127.0.0.1:{parent.recv()}"
+    finally:
+        process.terminate()
+        process.join()
+
+def bench_convert(corpus, directory):
+    """
+    Time transOA.json_to_xml on a corpus, then its two steps separately.
+
+    Returns:
+        dict: Timing results; stages are "build" (build_mods) and "write" (serializing the tree).
+    """
+    output_file = os.path.join(directory, "convert.xml")
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        transOA.json_to_xml(corpus, output_file)
+        seconds = time.perf_counter() - start
+
+        stages = {}
+        start = time.perf_counter()
+        collection = transOA.create_mods_collection()
+        for record in corpus:
+            collection.append(transOA.build_mods(record))
+        stages["build"] = time.perf_counter() - start
+        start = time.perf_counter()
+        ET.ElementTree(collection).write(output_file, encoding="utf-8", xml_declaration=True)
+        stages["write"] = time.perf_counter() - start
+        transOA.report_unmatched()
+    return summarize("convert", len(corpus), seconds, stages, output_bytes=os.path.getsize(output_file))
+
+def bench_serialize(corpus, directory, repeat=3):
+    """
+    Time the transOA serializers on the <mods> elements of a corpus.
+
+    Before timing, each serializer writes a whole file, which must be equivalent
+    to the ElementTree one after canonicalization (C14N 2.0).
+
+    Returns:
+        dict: Records and MB per second for each serializer, and whether its file is byte-identical.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        elements = [transOA.build_mods(record) for record in corpus]
+        for mods in elements:
+            transOA.add_subject(mods, "10205")
+        transOA.report_unmatched()
+
+    result = {"benchmark": "serialize", "records": len(corpus)}
+    reference = None
+    for name, serialize in transOA.serializers.items():
+        output_file = os.path.join(directory, f"serialize_{name}.xml")
+        with contextlib.redirect_stdout(io.StringIO()):
+            transOA.write_mods_stream(elements, output_file, serializer=name)
+        canonical = ET.canonicalize(from_file=output_file)
+        with open(output_file, "rb") as file:
+            data = file.read()
+        if reference is None:
+            reference = (canonical, data)
+        elif canonical != reference[0]:
+            raise AssertionError(f"{name} writes a document not equivalent to {next(iter(transOA.serializers))}")
+
+        seconds = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for mods in elements:
+                serialize(mods)
+            elapsed = time.perf_counter() - start
+            seconds = elapsed if seconds is None else min(seconds, elapsed)
+        result[name] = {
+            "records_per_second": round(len(elements) / seconds),
+            "mb_per_second": round(len(data) / seconds / (1024 * 1024), 1),
+            "byte_identical": data == reference[1]
+        }
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def bench_classify(corpus, directory, workers=8, latency=0):
+    """
+    Time importOpenAlex.add_classification_to_xml against the stub classifier, without cache.
+
+    Returns:
+        dict: Timing results, including the number of classify requests.
+    """
+    import importOpenAlex
+    from httpOA import FetchEngine
+
+    xml_file = os.path.join(directory, "classify.xml")
+    with contextlib.redirect_stdout(io.StringIO()):
+        transOA.json_to_xml(corpus, xml_file)
+    with stub_server(corpus, latency) as base_url:
+        importOpenAlex.classify_api = f"{base_url}/classify"
+        engine = FetchEngine(workers=workers, rate=0,
+                             endpoints={"openalex": importOpenAlex.openalex_api, "classify": importOpenAlex.classify_api})
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            importOpenAlex.add_classification_to_xml(corpus, xml_file, engine, workers=workers)
+        seconds = time.perf_counter() - start
+    return summarize("classify", len(corpus), seconds, requests=engine.summary()["requests"], workers=workers,
+                     latency=latency)
+
+def bench_local(corpus, directory, repeat=3):
+    """
+    Time training the local classifier (classifyOA) on a corpus and classifying the corpus with it.
+
+    The records are labelled with the stub classifier's codes, which follow
+    from a hash of the title, so only the speed is meaningful, not the accuracy.
+
+    Returns:
+        dict: Timing results of the predictions, with training seconds and model size.
+    """
+    import classifyOA
+
+    examples = []
+    for work in corpus:
+        abstract = transOA.abstract_from_inverted_index(work.get("abstract_inverted_index"))
+        if abstract:
+            examples.append((work.get("title", ""), abstract, stub_code(work.get("title"), 5)))
+    start = time.perf_counter()
+    model = classifyOA.train(examples)
+    train_seconds = time.perf_counter() - start
+    model_file = os.path.join(directory, "model.json.gz")
+    model.save(model_file)
+    model = classifyOA.LocalClassifier.load(model_file)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for title, abstract, _ in examples:
+            model.predict(title, abstract)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return summarize("local", len(examples), best, train_seconds=round(train_seconds, 3), words=len(model.terms),
+                     classes=len(model.classes), model_mb=round(os.path.getsize(model_file) / 1e6, 2),
+                     microseconds_per_record=round(best / max(1, len(examples)) * 1e6))
+
+def bench_pipeline(corpus, directory, workers=8, batch_size=50, full_records=False, latency=0, queue_size=None):
+    """
+    Time the importOpenAlex flow against the stub server.
+
+    The works are fetched by DOI with OR-filter queries, then converted,
+    classified and written by run_pipeline, without cache or export index.
+    Unless full_records is set, only the fields in recordsOA.work_fields are
+    requested and kept, as importOpenAlex.py does by default. With latency,
+    every stub response is delayed, which shows how far the fetch and classify
+    waits overlap conversion; queue_size 0 fetches in step with the pipeline.
+
+    Returns:
+        dict: Timing results; stages and counters are those recorded in metricsOA.metrics.
+    """
+    import importOpenAlex
+    from httpOA import FetchEngine
+    from metricsOA import metrics
+    from recordsOA import work_fields
+
+    importOpenAlex.record_fields = None if full_records else work_fields
+
+    dois = [work["doi"] for work in corpus]
+    records_file = os.path.join(directory, "pipeline.jsonl")
+    xml_file = os.path.join(directory, "pipeline.xml")
+    if queue_size is None:
+        queue_size = importOpenAlex.queue_size
+    with stub_server(corpus, latency) as base_url:
+        importOpenAlex.openalex_api = f"{base_url}/works"
+        importOpenAlex.classify_api = f"{base_url}/classify"
+        engine = FetchEngine(workers=workers, rate=0,
+                             endpoints={"openalex": importOpenAlex.openalex_api, "classify": importOpenAlex.classify_api})
+        metrics.reset()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = importOpenAlex.fetch_stage([], dois, records_file, batch_size, engine, queue_size=queue_size)
+            written = importOpenAlex.run_pipeline(records, xml_file, engine=engine, workers=workers)
+        seconds = time.perf_counter() - start
+    return summarize("pipeline", written, seconds, metrics.stage_seconds(), counters=dict(metrics.counters),
+                     requests=engine.summary()["requests"], workers=workers, batch_size=batch_size,
+                     full_records=full_records, records_mb=round(os.path.getsize(records_file) / 1e6, 2),
+                     latency=latency, queue_size=queue_size)
+
+def run_info():
+    """Return when, where and on which commit the benchmarks ran, so runs can be compared over time."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+def write_corpus(corpus, path):
+    """Write a corpus as JSON Lines, e.g. to convert with transOA.py (json_to_xml) or to benchmark with --corpus."""
+    with open(path, "w", encoding="utf-8") as file:
+        for work in corpus:
+            file.write(json.dumps(work, ensure_ascii=False) + "\n")
+    print(f"Wrote {len(corpus)} synthetic works to {path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for transOA and the import pipeline.")
+    parser.add_argument("benchmark", nargs="?", default="authors",
+                        choices=["authors", "abstract", "convert", "serialize", "classify", "local", "pipeline", "all",
+                                 "corpus"],
+                        help="what to time (default: authors); all runs convert, serialize, classify, local and pipeline, "
+                             "corpus only writes the synthetic corpus to --corpus")
+    parser.add_argument("--works", type=int, default=20, help="authors: number of synthetic works")
+    parser.add_argument("--authors", type=int, default=3000, help="authors: authorships per work")
+    parser.add_argument("--max-institutions", type=int, default=3, help="maximum institutions per authorship")
+    parser.add_argument("--shared", action="store_true", help="authors: give every work the same author list")
+    parser.add_argument("--words", type=int, default=250, help="abstract: words per abstract")
+    parser.add_argument("--abstracts", type=int, default=2000, help="abstract: number of abstracts")
+    parser.add_argument("--records", type=int, default=1000, help="number of works in the synthetic corpus")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--max-authors", type=int, default=3000, help="authorships of the largest hyper-authored works")
+    parser.add_argument("--hyper-rate", type=float, default=0.01, help="share of hyper-authored works")
+    parser.add_argument("--institutions", type=int, default=500, help="size of the institution pool")
+    parser.add_argument("--max-funders", type=int, default=4, help="maximum funders per work")
+    parser.add_argument("--abstract-words", type=int, default=400, help="maximum abstract length in words")
+    parser.add_argument("--corpus", default=None,
+                        help="JSON Lines corpus file: read instead of generating one, or written by 'corpus'")
+    parser.add_argument("--full-records", action="store_true",
+                        help="pipeline: fetch complete works instead of only the fields in recordsOA.work_fields")
+    parser.add_argument("--latency-ms", type=float, default=0, help="classify/pipeline: delay of every stub response")
+    parser.add_argument("--queue-size", type=int, default=None,
+                        help="pipeline: records fetched ahead (default: importOpenAlex.queue_size; 0 = in step)")
+    parser.add_argument("--http-workers", type=int, default=8, help="classify/pipeline: requests in flight")
+    parser.add_argument("--output", default=None, help="also append the report as one JSON line to this file")
+    args = parser.parse_args()
+
+    if args.benchmark == "authors":
+        results = [bench_authors(args.works, args.authors, max_institutions=args.max_institutions,
+                                 shared=args.shared, seed=args.seed)]
+    elif args.benchmark == "abstract":
+        results = [bench_abstract(args.words, args.abstracts, seed=args.seed)]
+    else:
+        if args.corpus and args.benchmark != "corpus":
+            corpus = list(iter_records(args.corpus))
+        else:
+            corpus = make_corpus(args.records, args.seed, args.max_authors, args.hyper_rate, args.institutions,
+                                 args.max_institutions, args.max_funders, args.abstract_words)
+        if args.benchmark == "corpus":
+            write_corpus(corpus, args.corpus or "bench_corpus.jsonl")
+            sys.exit()
+
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            if args.benchmark in ("convert", "all"):
+                results.append(bench_convert(corpus, directory))
+            if args.benchmark in ("serialize", "all"):
+                results.append(bench_serialize(corpus, directory))
+            if args.benchmark in ("classify", "all"):
+                results.append(bench_classify(corpus, directory, args.http_workers, args.latency_ms / 1000))
+            if args.benchmark in ("local", "all"):
+                results.append(bench_local(corpus, directory))
+            if args.benchmark in ("pipeline", "all"):
+                results.append(bench_pipeline(corpus, directory, args.http_workers, full_records=args.full_records,
+                                              latency=args.latency_ms / 1000, queue_size=args.queue_size))
+
+    report = dict(run_info(), results=results)
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as file:
+            file.write(json.dumps(report) + "\n")
@@ -0,0 +1,368 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+# Default cache file, time-to-live and size cap
+default_cache_file = "openalex_cache.sqlite"
+default_ttl = 7 * 24 * 3600  # One week, in seconds
+default_max_bytes = 1024 * 1024 * 1024  # 1 GB of compressed records
+
+# Writes and accessed_at updates are committed together once this many are pending
+commit_every = 500
+
+def connect(path):
+    """
+    Open a SQLite database shared by threads, in write-ahead log mode.
+
+    With WAL and synchronous=NORMAL a commit appends to the log without an
+    fsync; the log is synced at checkpoints. A crash can lose the last
+    commits but never corrupts the database, which is fine for caches.
+    """
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+class WorkCache:
+    """
+    SQLite cache of OpenAlex works keyed by OpenAlex ID and normalized DOI.
+
+    Records are stored zlib-compressed. Entries older than ttl seconds are
+    stale: they are still returned, but flagged so the caller can revalidate
+    them. When the total size exceeds max_bytes, the least recently used
+    entries are evicted.
+
+    Lookups note the access time in memory; the access times and the stored
+    works are committed commit_every changes at a time, and by evict(),
+    flush() and close().
+
+    Args:
+        path (str): Path of the SQLite file.
+        ttl (int): Seconds before an entry becomes stale.
+        max_bytes (int): Size cap for the stored records.
+    """
+    def __init__(self, path=default_cache_file, ttl=default_ttl, max_bytes=default_max_bytes):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.accessed = {}  # openalex_id -> access time not yet written
+        self.pending = 0  # Works stored since the last commit
+        self.connection = connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS works (
+                openalex_id TEXT PRIMARY KEY,
+                doi TEXT,
+                updated_date TEXT,
+                fetched_at REAL,
+                accessed_at REAL,
+                size INTEGER,
+                body BLOB
+            );
+            CREATE INDEX IF NOT EXISTS works_doi ON works (doi);
+            CREATE INDEX IF NOT EXISTS works_accessed_at ON works (accessed_at);
+        """)
+
+    def _get(self, column, value):
+        with self.lock:
+            row = self.connection.execute(
+                f"SELECT openalex_id, fetched_at, body FROM works WHERE {column} = ?", (value,)).fetchone()
+            if row is None:
+                return None, False
+            self.accessed[row[0]] = time.time()
+            if len(self.accessed) + self.pending >= commit_every:
+                self._flush()
+        record = json.loads(zlib.decompress(row[2]))
+        return record, time.time() - row[1] < self.ttl
+
+    def _flush(self):
+        """Write the pending access times and commit; the caller holds self.lock."""
+        if self.accessed:
+            self.connection.executemany(
+                "UPDATE works SET accessed_at = ? WHERE openalex_id = ?",
+                [(accessed_at, openalex_id) for openalex_id, accessed_at in self.accessed.items()])
+            self.accessed.clear()
+        self.connection.commit()
+        self.pending = 0
+
+    def flush(self):
+        """Commit the works stored and the access times noted since the last commit."""
+        with self.lock:
+            self._flush()
+
+    def get_by_id(self, openalex_id):
+        """
+        Look up a work by normalized OpenAlex ID (e.g., "W123").
+
+        Returns:
+            tuple: (record, fresh) where record is None on a miss and fresh is False for stale entries.
+        """
+        return self._get("openalex_id", openalex_id)
+
+    def get_by_doi(self, doi):
+        """
+        Look up a work by normalized DOI.
+
+        Returns:
+            tuple: (record, fresh) where record is None on a miss and fresh is False for stale entries.
+        """
+        return self._get("doi", doi)
+
+    def put(self, openalex_id, doi, record):
+        """
+        Store a work, replacing any previous version.
+
+        Args:
+            openalex_id (str): Normalized OpenAlex ID.
+            doi (str): Normalized DOI, or "" if the work has none.
+            record (dict): The OpenAlex work.
+        """
+        body = zlib.compress(json.dumps(record).encode("utf-8"))
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO works VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (openalex_id, doi or None, record.get("updated_date"), now, now, len(body), body))
+            self.accessed.pop(openalex_id, None)
+            self.pending += 1
+            if len(self.accessed) + self.pending >= commit_every:
+                self._flush()
+
+    def records(self, batch=500):
+        """
+        Yield every cached work, e.g. to train the local classifier, without marking it as used.
+
+        Works are read batch at a time, so the cache stays usable while they are processed.
+        """
+        last = ""
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    "SELECT openalex_id, body FROM works WHERE openalex_id > ? ORDER BY openalex_id LIMIT ?",
+                    (last, batch)).fetchall()
+            if not rows:
+                return
+            for _, body in rows:
+                yield json.loads(zlib.decompress(body))
+            last = rows[-1][0]
+
+    def updated_dates(self, openalex_ids):
+        """
+        Return the cached updated_date of each given work.
+
+        Args:
+            openalex_ids (list): Normalized OpenAlex IDs.
+        Returns:
+            dict: openalex_id -> updated_date for the IDs present in the cache.
+        """
+        dates = {}
+        with self.lock:
+            for openalex_id in openalex_ids:
+                row = self.connection.execute(
+                    "SELECT updated_date FROM works WHERE openalex_id = ?", (openalex_id,)).fetchone()
+                if row is not None:
+                    dates[openalex_id] = row[0]
+        return dates
+
+    def touch(self, openalex_ids):
+        """Mark works as freshly fetched after revalidation showed they are unchanged."""
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "UPDATE works SET fetched_at = ? WHERE openalex_id = ?", [(now, i) for i in openalex_ids])
+            self._flush()
+
+    def evict(self):
+        """
+        Delete least recently used works until the cache fits within max_bytes.
+
+        Returns:
+            int: Number of works evicted.
+        """
+        evicted = 0
+        with self.lock:
+            self._flush()
+            total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM works").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            rows = self.connection.execute("SELECT openalex_id, size FROM works ORDER BY accessed_at")
+            doomed = []
+            for openalex_id, size in rows:
+                if total <= self.max_bytes:
+                    break
+                doomed.append((openalex_id,))
+                total -= size
+            self.connection.executemany("DELETE FROM works WHERE openalex_id = ?", doomed)
+            self.connection.commit()
+            evicted = len(doomed)
+        return evicted
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.connection.close()
+
+# Default classification cache file; known misses are retried after negative_ttl
+default_classify_cache_file = "swepub_cache.sqlite"
+default_negative_ttl = 30 * 24 * 3600  # 30 days, in seconds
+
+# Marker returned by ClassificationCache.get for a remembered miss
+known_miss = ""
+
+class ClassificationCache:
+    """
+    SQLite cache of Swepub Classify results keyed by a hash of (title, abstract, level).
+
+    Both suggestions and misses (no suggestions at that level) are stored;
+    misses are forgotten after negative_ttl seconds so they are eventually retried.
+
+    Args:
+        path (str): Path of the SQLite file.
+        negative_ttl (int): Seconds a remembered miss is trusted.
+    """
+    def __init__(self, path=default_classify_cache_file, negative_ttl=default_negative_ttl):
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.connection = connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS classifications (
+                key TEXT PRIMARY KEY,
+                level INTEGER,
+                code TEXT,
+                created_at REAL
+            )
+        """)
+        self.connection.commit()
+
+    @staticmethod
+    def key(title, abstract, level):
+        """Return the cache key for a classify request."""
+        return hashlib.sha256(json.dumps([title, abstract, level]).encode("utf-8")).hexdigest()
+
+    def get(self, title, abstract, level):
+        """
+        Look up a classify result.
+
+        Returns:
+            str: The classification code, known_miss ("") for a remembered miss, or None if not cached.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT code, created_at FROM classifications WHERE key = ?", (self.key(title, abstract, level),)).fetchone()
+        if row is None:
+            return None
+        code, created_at = row
+        if code is None:
+            return known_miss if time.time() - created_at < self.negative_ttl else None
+        return code
+
+    def put(self, title, abstract, level, code):
+        """
+        Store a classify result.
+
+        Args:
+            code (str): Classification code, or None to remember that there were no suggestions.
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?)",
+                (self.key(title, abstract, level), level, code, time.time()))
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+# Default index of works already exported as MODS
+default_export_index_file = "export_index.sqlite"
+
+class ExportIndex:
+    """
+    SQLite index of exported works keyed by OpenAlex ID, normalized DOI and PMID.
+
+    Each entry keeps the work's updated_date and a hash of its generated <mods>
+    element (before classification), so a later run can tell unchanged works
+    from new or materially changed ones. Lookups use indexed columns, so the
+    index does not need to be loaded into memory.
+
+    Entries added with add() become visible to the next run only after
+    commit(); a failed run leaves the index as it was.
+
+    Args:
+        path (str): Path of the SQLite file.
+    """
+    def __init__(self, path=default_export_index_file):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS exported (
+                openalex_id TEXT PRIMARY KEY,
+                doi TEXT,
+                pmid TEXT,
+                updated_date TEXT,
+                mods_hash TEXT,
+                exported_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS exported_doi ON exported (doi);
+            CREATE INDEX IF NOT EXISTS exported_pmid ON exported (pmid);
+        """)
+
+    def lookup(self, openalex_id=None, doi=None, pmid=None):
+        """
+        Find an exported work by any of its keys, trying OpenAlex ID, DOI and PMID in turn.
+
+        Returns:
+            tuple: (openalex_id, updated_date, mods_hash) of the entry, or None if the work was never exported.
+        """
+        with self.lock:
+            for column, value in (("openalex_id", openalex_id), ("doi", doi), ("pmid", pmid)):
+                if not value:
+                    continue
+                row = self.connection.execute(
+                    f"SELECT openalex_id, updated_date, mods_hash FROM exported WHERE {column} = ?", (value,)).fetchone()
+                if row is not None:
+                    return row
+        return None
+
+    def add(self, openalex_id, doi, pmid, updated_date, mods_hash):
+        """
+        Record an exported work, replacing an entry found by any of its keys; see commit().
+
+        Args:
+            openalex_id (str): Normalized OpenAlex ID.
+            doi (str): Normalized DOI, or "" if the work has none.
+            pmid (str): PubMed ID, or "" if the work has none.
+            updated_date (str): The work's updated_date.
+            mods_hash (str): Hash of the generated <mods> element.
+        """
+        with self.lock:
+            # OpenAlex IDs can change when works are merged, so drop entries sharing the DOI or PMID
+            self.connection.execute(
+                "DELETE FROM exported WHERE openalex_id = ? OR doi = ? OR pmid = ?",
+                (openalex_id, doi or None, pmid or None))
+            self.connection.execute(
+                "INSERT INTO exported VALUES (?, ?, ?, ?, ?, ?)",
+                (openalex_id, doi or None, pmid or None, updated_date, mods_hash, time.time()))
+
+    def commit(self):
+        """Make the works added since the last commit part of the index."""
+        with self.lock:
+            self.connection.commit()
+
+    def rollback(self):
+        """Forget the works added since the last commit."""
+        with self.lock:
+            self.connection.rollback()
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM exported").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,120 @@
+import collections
+import json
+import os
+
+# Default checkpoint file and number of written records between checkpoints
+default_checkpoint_file = "openalex_checkpoint.json"
+default_checkpoint_every = 100
+
+class RunCheckpoint:
+    """
+    Progress of a fetch/convert/classify/write run, saved so an interrupted run can be resumed.
+
+    Every `every` written <mods> elements the checkpoint file records, at one
+    consistent moment:
+
+    - fetch: the size of the record store up to the last record fully written
+      to it (see stored()), which holds every record fetched so far
+    - convert/classify/write: the number of records taken from the record
+      stream (written or skipped), the number of elements written and the size
+      of the XML file
+
+    Records between the two points were fetched but not yet written; a resumed
+    run reads them back from the record store instead of fetching them again.
+
+    Args:
+        path (str): Path of the JSON checkpoint file.
+        records_file (str): The run's record store; must not be compressed.
+        xml_file (str): The run's MODS XML file.
+        every (int): Written elements between checkpoints.
+    """
+    def __init__(self, path=default_checkpoint_file, records_file=None, xml_file=None, every=default_checkpoint_every):
+        self.path = path
+        self.records_file = records_file
+        self.xml_file = xml_file
+        self.every = max(1, every)
+        self.read = 0  # Records taken from the record stream
+        self.written = 0  # Elements written
+        self.records_offset = 0  # Size of the record store up to its last complete record
+        self.in_flight = collections.OrderedDict()  # id(record) -> position, for records not yet written
+
+    def load(self):
+        """
+        Return the saved state of an interrupted run, or None if there is none.
+
+        Returns:
+            dict: "records_file", "records_offset", "xml_file", "xml_offset", "read" and "written".
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding="utf-8") as file:
+            return json.load(file)
+
+    def resume(self, state):
+        """Continue counting from a loaded state."""
+        self.records_file = state["records_file"]
+        self.xml_file = state["xml_file"]
+        self.written = state["written"]
+        self.records_offset = state["records_offset"]
+
+    def stored(self, offset):
+        """
+        Note that the record store holds complete records up to offset, e.g. a RecordWriter's offset.
+
+        Called by the stage writing the record store after each record; save()
+        checkpoints this offset rather than the file size, which can fall
+        inside a record being written.
+        """
+        self.records_offset = offset
+
+    def track(self, records):
+        """
+        Number the records flowing into the pipeline, from the start of the record stream.
+
+        Yields:
+            dict: The records, unchanged.
+        """
+        for record in records:
+            # The id of a skipped record that was freed may be reused; move it to the end
+            self.in_flight.pop(id(record), None)
+            self.in_flight[id(record)] = self.read
+            self.read += 1
+            yield record
+
+    def element_written(self, record, count, file):
+        """
+        Note that the element of record was written to file; save a checkpoint every `every` elements.
+
+        Args:
+            record (dict): The record whose <mods> element was written.
+            count (int): Elements written so far.
+            file: The binary XML file object.
+        """
+        # Output keeps input order, so every record before this one is done
+        position = self.in_flight.pop(id(record))
+        while self.in_flight and next(iter(self.in_flight.values())) < position:
+            self.in_flight.popitem(last=False)
+        self.written = count
+        if count % self.every == 0:
+            file.flush()
+            self.save(position + 1, file.tell())
+
+    def save(self, read, xml_offset):
+        """Write the checkpoint file; it is replaced atomically."""
+        state = {
+            "records_file": self.records_file,
+            "records_offset": self.records_offset,
+            "xml_file": self.xml_file,
+            "xml_offset": xml_offset,
+            "read": read,
+            "written": self.written
+        }
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(state, file, indent=4)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        """Remove the checkpoint file after a completed run."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,266 @@
+import argparse
+import collections
+import gzip
+import hashlib
+import json
+import math
+import os
+import re
+import time
+
+from cacheOA import ClassificationCache, WorkCache, default_cache_file, default_classify_cache_file, known_miss
+from recordsOA import iter_records
+from transOA import abstract_from_inverted_index
+
+# Default model file and the confidence below which the Swepub API is still asked
+default_model_file = "classifier_model.json.gz"
+default_threshold = 0.9
+
+# Words of two or more letters; numbers and punctuation are not features
+token_pattern = re.compile(r"[^\W\d_]{2,}")
+
+def tokenize(text):
+    """Return the lower-cased words of a text."""
+    return token_pattern.findall(text.lower())
+
+def features(title, abstract, idf):
+    """
+    Return the L2-normalized TF-IDF vector of a title and abstract.
+
+    Term frequencies are dampened (1 + log tf); words not in idf are dropped.
+
+    Args:
+        title (str): Title of the record.
+        abstract (str): Abstract of the record.
+        idf (dict): Word -> inverse document frequency.
+    Returns:
+        dict: Word -> weight.
+    """
+    counts = collections.Counter(word for word in tokenize(f"{title} {abstract}") if word in idf)
+    vector = {word: (1 + math.log(count)) * idf[word] for word, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {word: weight / norm for word, weight in vector.items()}
+
+class LocalClassifier:
+    """
+    Multinomial naive Bayes over TF-IDF features of title and abstract.
+
+    The model predicts the code fetch_xlink_href would get from the Swepub
+    Classify API (the level-5 code, or the level-3 code where level 5 has no
+    suggestions), with the posterior probability of that code as confidence.
+    Scoring is linear in the words of the record: for every word, only the
+    classes it occurs in are visited.
+
+    Args:
+        classes (list): Classification codes.
+        priors (list): Log prior of each class.
+        defaults (list): Log probability of a word never seen in each class.
+        terms (dict): Word -> (idf, {class index: log probability above the class default}).
+    """
+    def __init__(self, classes, priors, defaults, terms):
+        self.classes = classes
+        self.priors = priors
+        self.defaults = defaults
+        self.terms = terms
+        self.idf = {word: idf for word, (idf, _) in terms.items()}
+
+    def predict(self, title, abstract):
+        """
+        Classify one record.
+
+        Returns:
+            tuple: (code, confidence) with confidence in 0-1; (None, 0.0) if no word of the record is known.
+        """
+        vector = features(title or "", abstract or "", self.idf)
+        if not vector:
+            return None, 0.0
+        total = sum(vector.values())
+        scores = [prior + default * total for prior, default in zip(self.priors, self.defaults)]
+        for word, weight in vector.items():
+            for index, delta in self.terms[word][1].items():
+                scores[index] += weight * delta
+        best = max(range(len(scores)), key=scores.__getitem__)
+        # Posterior of the best class, computed stably around its score
+        confidence = 1.0 / sum(math.exp(score - scores[best]) for score in scores)
+        return self.classes[best], confidence
+
+    def to_dict(self):
+        return {
+            "version": 1,
+            "classes": self.classes,
+            "priors": [round(prior, 5) for prior in self.priors],
+            "defaults": [round(default, 5) for default in self.defaults],
+            # Word -> [idf, class index, delta, class index, delta, ...]
+            "terms": {word: [round(idf, 4)] + [value for index, delta in sorted(deltas.items())
+                                               for value in (index, round(delta, 4))]
+                      for word, (idf, deltas) in self.terms.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        terms = {word: (values[0], dict(zip(values[1::2], values[2::2]))) for word, values in data["terms"].items()}
+        return cls(data["classes"], data["priors"], data["defaults"], terms)
+
+    def save(self, path):
+        """Write the model as gzipped JSON (plain JSON unless path ends in .gz); it is replaced atomically."""
+        temporary = path + ".tmp"
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(temporary, "wt", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, separators=(",", ":"))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a model written by save()."""
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as file:
+            return cls.from_dict(json.load(file))
+
+def train(examples, alpha=0.1, min_df=2, max_df=0.5, max_terms=100000):
+    """
+    Train a LocalClassifier.
+
+    Args:
+        examples (list): (title, abstract, code) tuples.
+        alpha (float): Additive smoothing of the word weights.
+        min_df (int): Minimum number of records a word must occur in.
+        max_df (float): Maximum share of records a word may occur in; more common words
+            ("the", "of", ...) say little about the class and would be scored for every class.
+        max_terms (int): Maximum vocabulary size; the words in most records are kept.
+    Returns:
+        LocalClassifier: The trained model.
+    """
+    documents = []
+    document_frequency = collections.Counter()
+    for title, abstract, code in examples:
+        counts = collections.Counter(tokenize(f"{title} {abstract}"))
+        document_frequency.update(counts.keys())
+        documents.append((counts, code))
+
+    vocabulary = [word for word, df in document_frequency.most_common()
+                  if min_df <= df <= max_df * len(documents)][:max_terms]
+    idf = {word: math.log((1 + len(documents)) / (1 + document_frequency[word])) + 1 for word in vocabulary}
+
+    classes = sorted({code for _, code in documents})
+    class_index = {code: index for index, code in enumerate(classes)}
+    class_counts = collections.Counter(code for _, code in documents)
+    weights = collections.defaultdict(dict)  # word -> {class index: summed feature weight}
+    totals = [0.0] * len(classes)
+    for counts, code in documents:
+        index = class_index[code]
+        norm = math.sqrt(sum(((1 + math.log(count)) * idf[word]) ** 2
+                             for word, count in counts.items() if word in idf)) or 1.0
+        for word, count in counts.items():
+            if word in idf:
+                weight = (1 + math.log(count)) * idf[word] / norm
+                weights[word][index] = weights[word].get(index, 0.0) + weight
+                totals[index] += weight
+
+    # log P(word | class) = log(weight + alpha) - log(total + alpha * V); the
+    # part shared by every unseen word is the class default
+    size = len(vocabulary)
+    priors = [math.log(class_counts[code] / len(documents)) for code in classes]
+    defaults = [math.log(alpha) - math.log(total + alpha * size) for total in totals]
+    terms = {word: (idf[word], {index: math.log(1 + weight / alpha) for index, weight in weights[word].items()})
+             for word in vocabulary}
+    return LocalClassifier(classes, priors, defaults, terms)
+
+def swepub_code(cache, title, abstract):
+    """
+    Return the code fetch_xlink_href got for a record from the classification cache.
+
+    Returns:
+        str: The level-5 code, the level-3 code if level 5 had no suggestions, or None if unknown.
+    """
+    code = cache.get(title, abstract, 5)
+    if code == known_miss:
+        code = cache.get(title, abstract, 3)
+    return code or None
+
+def training_examples(records, cache):
+    """
+    Pair records with the classifications cached for them.
+
+    Args:
+        records (iterable): OpenAlex works, e.g. from record files or the work cache.
+        cache (ClassificationCache): Cache of Swepub Classify answers.
+    Yields:
+        tuple: (title, abstract, code) for every record with an abstract and a cached code, once per text.
+    """
+    seen = set()
+    for record in records:
+        abstract = abstract_from_inverted_index(record.get("abstract_inverted_index"))
+        if not abstract:
+            continue
+        title = record.get("title", "")
+        key = hashlib.sha256(json.dumps([title, abstract]).encode("utf-8")).digest()
+        if key in seen:
+            continue
+        seen.add(key)
+        code = swepub_code(cache, title, abstract)
+        if code:
+            yield title, abstract, code
+
+def evaluate(model, examples, thresholds=(0.5, 0.7, 0.8, 0.9, 0.95, 0.99)):
+    """
+    Measure how many records a model classifies at each threshold, and how many of them correctly.
+
+    Returns:
+        list: (threshold, coverage, accuracy) tuples; accuracy is None if nothing was classified.
+    """
+    predictions = [(model.predict(title, abstract), code) for title, abstract, code in examples]
+    results = []
+    for threshold in thresholds:
+        confident = [predicted == code for (predicted, confidence), code in predictions if confidence >= threshold]
+        results.append((threshold, len(confident) / max(1, len(predictions)),
+                        sum(confident) / len(confident) if confident else None))
+    return results
+
+def held_out(title, abstract, fraction):
+    """Return True for the stable share fraction of records used for evaluation only."""
+    digest = hashlib.sha256(f"{title}\n{abstract}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") < fraction * 2 ** 32
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local classifier from cached Swepub classifications.")
+    parser.add_argument("records", nargs="*", help="record files (JSON array or JSON Lines, optionally .gz/.zst)")
+    parser.add_argument("--work-cache", default=default_cache_file,
+                        help="also train on the works in this cache (\"\" to use only the record files)")
+    parser.add_argument("--classify-cache", default=default_classify_cache_file,
+                        help="SQLite file with the cached Swepub classifications")
+    parser.add_argument("--model", default=default_model_file, help="model file to write")
+    parser.add_argument("--holdout", type=float, default=0.1,
+                        help="share of records held out to report coverage and accuracy per threshold")
+    parser.add_argument("--alpha", type=float, default=0.1, help="smoothing of the word weights")
+    parser.add_argument("--min-df", type=int, default=2, help="minimum number of records a word must occur in")
+    parser.add_argument("--max-df", type=float, default=0.5, help="maximum share of records a word may occur in")
+    parser.add_argument("--max-terms", type=int, default=100000, help="maximum vocabulary size")
+    args = parser.parse_args()
+
+    def all_records():
+        for path in args.records:
+            yield from iter_records(path)
+        if args.work_cache and os.path.exists(args.work_cache):
+            yield from WorkCache(args.work_cache).records()
+
+    cache = ClassificationCache(args.classify_cache)
+    examples = list(training_examples(all_records(), cache))
+    if not examples:
+        parser.error("no records with an abstract and a cached classification")
+    print(f"Training on {len(examples)} classified records in "
+          f"{len({code for _, _, code in examples})} classes")
+
+    if args.holdout:
+        test = [example for example in examples if held_out(example[0], example[1], args.holdout)]
+        fit = [example for example in examples if not held_out(example[0], example[1], args.holdout)]
+        if test and fit:
+            print(f"Held out {len(test)} records:")
+            for threshold, coverage, accuracy in evaluate(train(fit, args.alpha, args.min_df, args.max_df, args.max_terms), test):
+                accuracy = f"{accuracy:.1%}" if accuracy is not None else "-"
+                print(f"  threshold {threshold:.2f}: {coverage:.1%} classified locally, {accuracy} correct")
+
+    start = time.perf_counter()
+    model = train(examples, args.alpha, args.min_df, args.max_df, args.max_terms)
+    model.save(args.model)
+    print(f"Model with {len(model.terms)} words trained in {time.perf_counter() - start:.1f}s, "
+          f"saved to {args.model} ({os.path.getsize(args.model) / 1e6:.1f} MB)")
@@ -0,0 +1,84 @@
+import datetime
+import json
+import os
+
+# Default file keeping the high-water marks of incremental harvests
+default_state_file = "harvest_state.json"
+
+# Date fields usable for incremental harvests: record field and the OpenAlex filter on it
+date_fields = {
+    "updated": ("updated_date", "from_updated_date"),
+    "created": ("created_date", "from_created_date")
+}
+
+def harvest_key(institution_ids, date_field):
+    """Return the state key of a harvest, e.g. "updated:I123|I456"."""
+    return f"{date_field}:" + "|".join(sorted(institution_ids))
+
+class HarvestState:
+    """
+    High-water marks of incremental harvests, kept in a small JSON file.
+
+    Each harvest (set of institutions and date field) has its own mark: the
+    latest date seen in a completed run, plus the IDs of the works seen at
+    exactly that date. OpenAlex from_ filters include the given date, so these
+    works come back in the next run and are recognized as already harvested.
+
+    New marks are only saved by commit(), after the harvested records were
+    written, so the changes of a failed run are harvested again next time.
+
+    Args:
+        path (str): Path of the JSON state file.
+    """
+    def __init__(self, path=default_state_file):
+        self.path = path
+        self.marks = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.marks = json.load(file)
+        self.pending = {}
+
+    def watermark(self, key):
+        """Return the committed high-water mark of a harvest, or None before its first run."""
+        return self.marks.get(key, {}).get("watermark")
+
+    def seen(self, key, date, work_id):
+        """Return True if the work has not changed since it was harvested up to the committed high-water mark."""
+        mark = self.marks.get(key, {})
+        if not date or mark.get("watermark") is None:
+            return False
+        # OpenAlex may compare whole days, returning works from before the mark
+        return date < mark["watermark"] or (date == mark["watermark"] and work_id in mark.get("ids", []))
+
+    def advance(self, key, date, work_id):
+        """
+        Record a harvested work; the pending mark moves to the latest date seen.
+
+        Args:
+            key (str): Harvest key from harvest_key().
+            date (str): The work's updated_date or created_date.
+            work_id (str): Normalized OpenAlex ID of the work.
+        """
+        if not date:
+            return
+        mark = self.pending.get(key)
+        if mark is None:
+            committed = self.marks.get(key, {})
+            mark = {"watermark": committed.get("watermark"), "ids": list(committed.get("ids", []))}
+            self.pending[key] = mark
+        if mark["watermark"] is None or date > mark["watermark"]:
+            mark["watermark"] = date
+            mark["ids"] = [work_id]
+        elif date == mark["watermark"] and work_id not in mark["ids"]:
+            mark["ids"].append(work_id)
+
+    def commit(self):
+        """Save the pending marks; the file is replaced atomically."""
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        for key, mark in self.pending.items():
+            self.marks[key] = dict(mark, harvested_at=now)
+        self.pending = {}
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.marks, file, indent=4)
+        os.replace(temporary, self.path)
@@ -0,0 +1,265 @@
+import collections
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metricsOA import metrics
+
+# OpenAlex polite pool allows 10 requests per second
+default_rate = 10
+default_workers = 8
+
+# Transient failures are retried with exponential backoff: up to default_retries
+# more attempts, waiting a random time up to default_backoff * 2**attempt seconds
+default_retries = 3
+default_backoff = 1.0
+max_backoff = 60
+
+# HTTP statuses worth retrying: rate limiting and temporary server errors
+retry_statuses = {429, 500, 502, 503, 504}
+
+# Seconds to wait for a connection and for each read from it; a stalled
+# request fails with a Timeout (and is retried) instead of hanging the run
+default_timeout = 30
+
+def backoff_delay(attempt, backoff=default_backoff, retry_after=None):
+    """
+    Return the seconds to wait before retry number attempt + 1.
+
+    Uses "full jitter": a random delay between 0 and backoff * 2**attempt, so
+    concurrent workers do not retry in lockstep. A Retry-After header value in
+    seconds is honoured instead when present.
+
+    Args:
+        attempt (int): Number of the failed attempt, starting at 0.
+        backoff (float): Base delay in seconds.
+        retry_after (str): Value of the Retry-After response header, if any.
+    Returns:
+        float: Seconds to wait.
+    """
+    if retry_after:
+        try:
+            return min(max_backoff, float(retry_after))
+        except ValueError:
+            pass  # An HTTP date; fall back to backoff
+    return random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+
+class RateLimiter:
+    """
+    Token bucket limiting the number of requests started per second.
+
+    Args:
+        rate (float): Tokens added per second (0 disables limiting).
+        burst (int): Maximum number of tokens that can be saved up.
+    """
+    def __init__(self, rate=default_rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _take(self):
+        """Take a token if one is available, otherwise return the seconds to wait for one."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block until a request may be started."""
+        if not self.rate:
+            return
+        wait = self._take()
+        while wait:
+            time.sleep(wait)
+            wait = self._take()
+
+def create_session(pool_size=default_workers, headers=None):
+    """
+    Create a requests Session with a keep-alive connection pool.
+
+    Args:
+        pool_size (int): Connections kept open per host.
+        headers (dict): Headers sent with every request.
+    Returns:
+        requests.Session: Session sharing TCP/TLS connections between requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+class FetchEngine:
+    """
+    Run HTTP requests over a shared session with a bounded number in flight.
+
+    Results of map() and imap() are returned in input order. Every request
+    made through get() and post() is timed: the engine keeps running totals
+    for summary(), and the latency goes to the run metrics histogram of its
+    endpoint.
+    Connection errors, timeouts and retry_statuses responses are retried with
+    exponential backoff and jitter.
+
+    Args:
+        workers (int): Maximum number of requests in flight.
+        rate (float): Requests started per second (0 disables limiting).
+        session: Object with requests-style get/post methods, e.g. a stub for tests.
+        headers (dict): Headers for the session created when none is given.
+        retries (int): Extra attempts for a transiently failing request.
+        backoff (float): Base delay in seconds between attempts; see backoff_delay.
+        timeout (float): Connect and read timeout in seconds for requests not passing their own.
+        endpoints (dict): Endpoint name -> URL prefix, naming the latency histograms; see RunMetrics.add_request.
+    """
+    def __init__(self, workers=default_workers, rate=default_rate, session=None, headers=None,
+                 retries=default_retries, backoff=default_backoff, timeout=default_timeout, endpoints=None):
+        self.workers = max(1, workers)
+        self.limiter = RateLimiter(rate)
+        self.session = session or create_session(self.workers, headers)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.endpoints = endpoints or {}
+        self.requests = 0  # Number of attempts
+        self.seconds = 0.0  # Total and longest time of an attempt
+        self.max_seconds = 0.0
+        self.statuses = collections.Counter()  # HTTP status (None for errors) -> attempts
+        self.retried = 0  # Number of attempts that were retried
+        self.lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a rate-limited request, retrying transient failures, and record its timing.
+
+        Args:
+            method (str): "get" or "post".
+            url (str): Request URL.
+            **kwargs: Passed on to the session method (params, json, headers, ...).
+        Returns:
+            requests.Response: The response; after the last attempt also a retry_statuses one.
+        Raises:
+            requests.exceptions.RequestException: If the last attempt failed to connect or timed out.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.attempt(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff)
+                print(f"Retrying {method.upper()} {url} in {delay:.1f} s after error: {e}")
+            else:
+                if response.status_code not in retry_statuses or attempt == self.retries:
+                    return response
+                delay = backoff_delay(attempt, self.backoff, response.headers.get("Retry-After"))
+                print(f"Retrying {method.upper()} {url} in {delay:.1f} s after HTTP {response.status_code}")
+            with self.lock:
+                self.retried += 1
+            time.sleep(delay)
+
+    def attempt(self, method, url, **kwargs):
+        """Send a single rate-limited request and record its timing."""
+        kwargs.setdefault("timeout", self.timeout)
+        self.limiter.acquire()
+        start = time.perf_counter()
+        status = None
+        try:
+            response = getattr(self.session, method)(url, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.requests += 1
+                self.seconds += seconds
+                self.max_seconds = max(self.max_seconds, seconds)
+                self.statuses[status] += 1
+            metrics.add_request(url, status, seconds, self.endpoints)
+
+    def get(self, url, **kwargs):
+        return self.request("get", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("post", url, **kwargs)
+
+    def map(self, func, items, workers=None):
+        """
+        Call func on every item on a thread pool.
+
+        Args:
+            func (callable): Function taking one item, typically calling self.get/self.post.
+            items (iterable): Items to process.
+            workers (int): Maximum calls running at once (defaults to self.workers).
+        Returns:
+            list: Results in the same order as items.
+        """
+        items = list(items)
+        workers = max(1, workers or self.workers)
+        if workers == 1 or len(items) < 2:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+
+    def imap(self, func, items, workers=None, ahead=None):
+        """
+        Like map(), but yield each result as soon as it and all earlier results are done.
+
+        Items are taken from the iterable only as calls finish: at most ahead
+        calls are submitted before their results are yielded, so a slow consumer
+        holds back the calls instead of piling up results, and items from a
+        generator are processed while it is still producing.
+
+        Args:
+            func (callable): Function taking one item.
+            items (iterable): Items to process.
+            workers (int): Maximum calls running at once (defaults to self.workers).
+            ahead (int): Maximum calls submitted and not yet yielded (defaults to twice workers).
+        Yields:
+            Results in the same order as items.
+        """
+        workers = max(1, workers or self.workers)
+        if workers == 1:
+            for item in items:
+                yield func(item)
+            return
+        ahead = max(workers, ahead or 2 * workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = collections.deque()
+            try:
+                for item in items:
+                    pending.append(executor.submit(func, item))
+                    if len(pending) >= ahead:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # Stopped early: do not start the calls still queued
+                for future in pending:
+                    future.cancel()
+
+    def summary(self):
+        """
+        Summarize the requests made so far.
+
+        Returns:
+            dict: Request count, total and max seconds, retries, and counts per HTTP status.
+        """
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "total_seconds": round(self.seconds, 3),
+                "max_seconds": round(self.max_seconds, 3),
+                "retries": self.retried,
+                "status": {str(status): count for status, count in self.statuses.items()}
+            }
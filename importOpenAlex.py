@@ -1,98 +1,745 @@
 import requests
-import json
-import subprocess
+import argparse
 import xml.etree.ElementTree as ET
 import datetime  # Import datetime for date formatting
+import hashlib
+import itertools
+import os
+import queue
+import threading
+import time
+import cProfile
+from concurrent.futures import Future
+from httpOA import FetchEngine, default_rate, default_workers, default_retries, default_timeout
+from cacheOA import WorkCache, default_cache_file, default_ttl, default_max_bytes
+from cacheOA import ClassificationCache, default_classify_cache_file, known_miss
+from cacheOA import ExportIndex, default_export_index_file
+from harvestOA import HarvestState, harvest_key, date_fields, default_state_file
+from recordsOA import RecordWriter, iter_records, is_compressed, truncate_file
+from recordsOA import work_fields, select_fields, project, json_loads
+from checkpointOA import RunCheckpoint, default_checkpoint_file, default_checkpoint_every
+from transOA import build_mods, write_mods_stream, add_subject, abstract_from_inverted_index
+from transOA import serializers, default_serializer
+from shardOA import write_mods_shards, manifest_file
+from snapshotOA import SnapshotFilter, snapshot_stage
+from metricsOA import metrics, write_report
+from classifyOA import LocalClassifier, default_threshold
 
 # List of OpenAlex IDs to fetch
 openalex_ids = []
 doi = ["10.1145/3770501.3770517","10.1177/14639491251399202","10.1140/epjd/s10053-025-01105-8"]
 
-def fetch_openalex_records(openalex_ids, dois, output_file):
+# OpenAlex works endpoint and the polite-pool User-Agent sent with every request
+openalex_api = "https://api.openalex.org/works"
+openalex_headers = {
+    "User-Agent": "mailto=aron.lindhagen@mau.se"
+}
+
+# OpenAlex API key, needed for the from_updated_date/from_created_date filters of incremental harvests
+openalex_api_key = os.environ.get("OPENALEX_API_KEY")
+
+# Number of IDs/DOIs combined into one OR-filter query (OpenAlex allows up to 100)
+batch_size = 50
+
+# Records fetched ahead of conversion and classification; bounds memory while
+# fetching overlaps the later stages (0 = fetch only when the next record is needed)
+queue_size = 200
+
+# Fields of the works requested from OpenAlex and kept in the records (None = full works)
+record_fields = work_fields
+
+# Swepub Classify endpoint
+classify_api = "https://bibliometri.swepub.kb.se/api/v1/classify"
+
+# Optional local classifier (classifyOA.LocalClassifier) asked before the Swepub API;
+# its code is used when its confidence is at least local_threshold
+local_classifier = None
+local_threshold = default_threshold
+
+# Shared engine (keep-alive session, worker pool and rate limiter), created on first use
+engine = None
+
+def get_engine():
     """
-    Fetch records from OpenAlex API using both OpenAlex IDs and DOIs, and save them to a file.
+    Return the shared FetchEngine, creating it with default settings on first use.
+
+    Returns:
+        FetchEngine: Engine used when no engine is passed explicitly.
+    """
+    global engine
+    if engine is None:
+        engine = FetchEngine(headers=openalex_headers, endpoints={"openalex": openalex_api, "classify": classify_api})
+    return engine
+
+def prefetch(items, size=queue_size, name="fetch"):
+    """
+    Run a stage on a background thread, handing its items over through a bounded queue.
+
+    The thread keeps producing while the consumer works on earlier items, and
+    blocks once size items are waiting, so a slow consumer holds back the
+    producer instead of filling memory. Exceptions of the producer are raised
+    in the consumer; if the consumer stops early, the producer is stopped and
+    closed on its own thread.
+
+    Args:
+        items (iterable): Items to produce, typically a generator doing network I/O.
+        size (int): Maximum items waiting in the queue; 0 produces items in the consumer's thread.
+        name (str): Stage name, for the thread and the "<name>_queue_full" counter.
+    Yields:
+        The items, in order.
+    """
+    if not size:
+        yield from items
+        return
+    handover = queue.Queue(size)
+    stop = threading.Event()
+    end = object()
+
+    def put(entry):
+        # Wait while the queue is full, unless the consumer has gone away
+        full = False
+        while not stop.is_set():
+            try:
+                handover.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                if not full:
+                    metrics.count(f"{name}_queue_full")
+                    full = True
+        return False
+
+    def produce():
+        error = None
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    break
+        except BaseException as e:
+            error = e
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+        put((end, error))
+
+    thread = threading.Thread(target=produce, name=f"{name}-stage", daemon=True)
+    thread.start()
+    interrupted = False
+    try:
+        while True:
+            item, error = handover.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    except KeyboardInterrupt:
+        interrupted = True
+        raise
+    finally:
+        stop.set()
+        # On Ctrl-C, do not wait for a request in flight; the daemon thread ends with the process
+        if not interrupted:
+            thread.join()
+
+def normalize_doi(doi):
+    """
+    Normalize a DOI so that input DOIs and the "doi" field of OpenAlex works can be compared.
+
+    Args:
+        doi (str): DOI, with or without "https://doi.org/" or "doi:" prefix.
+    Returns:
+        str: Lower-cased bare DOI (e.g., "10.1145/3770501.3770517").
+    """
+    doi = (doi or "").strip().lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "doi:"):
+        if doi.startswith(prefix):
+            return doi[len(prefix):]
+    return doi
+
+def normalize_openalex_id(openalex_id):
+    """
+    Normalize an OpenAlex work ID to its short form.
+
+    Args:
+        openalex_id (str): OpenAlex ID, either "W123" or "https://openalex.org/W123".
+    Returns:
+        str: Upper-cased short ID (e.g., "W123").
+    """
+    return (openalex_id or "").strip().replace("https://openalex.org/", "").upper()
+
+def record_select():
+    """Return the select parameter for works fetched as records, or None for full works."""
+    return select_fields(record_fields) if record_fields else None
+
+def slim_record(record):
+    """Drop the fields of a fetched work that are not in record_fields (see recordsOA.project)."""
+    return project(record, record_fields) if record_fields and record is not None else record
+
+def iter_openalex_query(filter_string, get=requests.get, select=None):
+    """
+    Yield all works matching an OpenAlex filter, following cursor pagination.
+
+    Args:
+        filter_string (str): Value of the filter parameter (e.g., "doi:a|b,from_updated_date:2025-01-01").
+        get (callable): HTTP transport with the signature of requests.get.
+        select (str): Comma-separated fields to return instead of the full works.
+    Yields:
+        dict: One work at a time, as the pages arrive.
+    """
+    params = {
+        "filter": filter_string,
+        "per-page": 200,
+        "cursor": "*"
+    }
+    if select:
+        params["select"] = select
+    if openalex_api_key:
+        params["api_key"] = openalex_api_key
+    while params["cursor"]:
+        response = get(openalex_api, params=params, headers=openalex_headers)
+        response.raise_for_status()
+        page = json_loads(response.content)
+        results = page.get("results", [])
+        yield from results
+        # Stop when OpenAlex has no further pages
+        params["cursor"] = page.get("meta", {}).get("next_cursor") if results else None
+
+def normalize_pmid(pmid):
+    """
+    Normalize a PubMed ID as found in the "ids" of OpenAlex works.
+
+    Args:
+        pmid (str): PMID, bare or as "https://pubmed.ncbi.nlm.nih.gov/123".
+    Returns:
+        str: Bare PMID (e.g., "123").
+    """
+    return (pmid or "").strip().replace("https://pubmed.ncbi.nlm.nih.gov/", "").strip("/")
+
+def work_keys(record):
+    """Return the normalized (OpenAlex ID, DOI, PMID) of a work."""
+    return (normalize_openalex_id(record.get("id")), normalize_doi(record.get("doi")),
+            normalize_pmid((record.get("ids") or {}).get("pmid")))
+
+def fetch_openalex_filter(filter_name, values, get=requests.get, select=None):
+    """
+    Fetch all works matching an OR-filter (e.g., "doi:a|b|c") using cursor pagination.
+
+    Args:
+        filter_name (str): OpenAlex filter attribute, "doi" or "openalex".
+        values (list): Values combined with "|" into a single filter.
+        get (callable): HTTP transport with the signature of requests.get.
+        select (str): Comma-separated fields to return instead of the full works.
+    Returns:
+        list: All works returned for the filter.
+    """
+    return list(iter_openalex_query(f"{filter_name}:" + "|".join(values), get, select))
+
+def iter_openalex_batched(openalex_ids, dois, batch_size=batch_size, engine=None):
+    """
+    Fetch works with OR-filter list queries, batch_size keys per request.
 
     Args:
         openalex_ids (list): List of OpenAlex IDs to fetch.
         dois (list): List of DOIs to fetch.
-        output_file (str): Path to the output file where the response will be saved.
+        batch_size (int): Number of keys combined into one filter query.
+        engine (FetchEngine): Engine running the queries; its session is the HTTP transport.
+    Yields:
+        tuple: (key, record) for every input key in input order (OpenAlex IDs first, then DOIs),
+            as soon as the query holding it has finished; record is None if no work was found.
     """
-    headers = {
-        "User-Agent": "mailto=aron.lindhagen@mau.se"
+    engine = engine or get_engine()
+    record_keys = {
+        "openalex": lambda record: normalize_openalex_id(record.get("id")),
+        "doi": lambda record: normalize_doi(record.get("doi"))
     }
-    
-    all_records = []  # List to store all fetched records
+    inputs = [("openalex", key, normalize_openalex_id(key)) for key in openalex_ids]
+    inputs += [("doi", key, normalize_doi(key)) for key in dois]
+
+    # Build one job per filter query, or per DOI containing a filter separator
+    jobs = []
+    job_of = {}  # (filter_name, normalized key) -> index of the job fetching it
+    for filter_name in ("openalex", "doi"):
+        wanted = list(dict.fromkeys(normalized for name, key, normalized in inputs if name == filter_name and normalized))
+        for start in range(0, len(wanted), batch_size):
+            batch = wanted[start:start + batch_size]
+            # "|" and "," are filter separators, so such DOIs are fetched one by one
+            single = [key for key in batch if "|" in key or "," in key]
+            batch = [key for key in batch if key not in single]
+            for job in ([(filter_name, batch)] if batch else []) + [(filter_name, key) for key in single]:
+                for key in (job[1] if isinstance(job[1], list) else [job[1]]):
+                    job_of[(filter_name, key)] = len(jobs)
+                jobs.append(job)
+
+    def run(job):
+        filter_name, values = job
+        if isinstance(values, list):
+            return [(filter_name, record_keys[filter_name](record), slim_record(record))
+                    for record in fetch_openalex_filter(filter_name, values, engine.get, record_select())]
+        response = engine.get(f"{openalex_api}/https://doi.org/{values}", params=single_params(),
+                              headers=openalex_headers)
+        if response.status_code == 404:
+            return []
+        response.raise_for_status()
+        return [(filter_name, values, slim_record(json_loads(response.content)))]
+
+    found = {}  # (filter_name, normalized key) -> record
+    results = engine.imap(run, jobs)
+    done = 0  # Number of jobs whose results are in found
+    for filter_name, key, normalized in inputs:
+        # Wait for the job holding this key (jobs finish in order)
+        while done <= job_of.get((filter_name, normalized), -1):
+            for result_filter, result_key, record in next(results):
+                found.setdefault((result_filter, result_key), record)
+            done += 1
+        yield key, found.get((filter_name, normalized))
+
+def fetch_openalex_batched(openalex_ids, dois, batch_size=batch_size, engine=None):
+    """
+    Fetch works with OR-filter list queries, batch_size keys per request.
+
+    Returns:
+        tuple: (records, not_found) where records is in input order (OpenAlex IDs first,
+            then DOIs) and not_found lists the input keys that returned no work.
+    """
+    records = []
+    not_found = []
+    for key, record in iter_openalex_batched(openalex_ids, dois, batch_size, engine):
+        if record is None:
+            not_found.append(key)
+        else:
+            records.append(record)
+    return records, not_found
+
+def single_params():
+    """Return the query parameters of a single-work request (select, unless full works are fetched)."""
+    return {"select": record_select()} if record_fields else None
+
+def iter_openalex_single(openalex_ids, dois, engine=None):
+    """
+    Fetch works with one request per OpenAlex ID or DOI.
+
+    Yields:
+        tuple: (key, record) in input order (OpenAlex IDs first, then DOIs).
+    """
+    engine = engine or get_engine()
+
+    # Fetch by OpenAlex IDs, then by DOIs, concurrently but kept in input order
+    keys = list(openalex_ids) + list(dois)
+    urls = [f"{openalex_api}/{openalex_id}" for openalex_id in openalex_ids]
+    urls += [f"{openalex_api}/https://doi.org/{doi}" for doi in dois]
 
+    def fetch(url):
+        response = engine.get(url, params=single_params(), headers=openalex_headers)
+        response.raise_for_status()
+        return slim_record(json_loads(response.content))
+
+    yield from zip(keys, engine.imap(fetch, urls))
+
+def iter_openalex_cached(openalex_ids, dois, cache, mode=None, batch_size=batch_size, engine=None):
+    """
+    Fetch works through the on-disk cache.
+
+    Fresh cache entries are used as they are. Stale entries are revalidated
+    with a cheap select=id,updated_date query and only re-downloaded if
+    OpenAlex has a newer updated_date. Misses are fetched in batches and
+    stored in the cache as they arrive; every key is yielded as soon as it
+    and all keys before it are resolved.
+
+    Args:
+        openalex_ids (list): List of OpenAlex IDs to fetch.
+        dois (list): List of DOIs to fetch.
+        cache (WorkCache): Cache to read from and write to.
+        mode (str): None for normal use, "refresh" to ignore cached entries,
+            "offline" to use only cached entries (fresh or stale) without network access.
+        batch_size (int): Keys per OR-filter query.
+        engine (FetchEngine): Engine running the requests.
+    Yields:
+        tuple: (key, record) in input order, as for iter_openalex_batched.
+    """
+    engine = engine or get_engine()
+    lookups = [(cache.get_by_id, normalize_openalex_id(key)) for key in openalex_ids]
+    lookups += [(cache.get_by_doi, normalize_doi(key)) for key in dois]
+
+    missing_ids, missing_dois, stale_ids = [], [], []
+    fetched_as = {}  # index of an input key -> key it is fetched with
+    if mode != "offline":
+        for position, ((lookup, key), original) in enumerate(zip(lookups, openalex_ids + dois)):
+            record, fresh = lookup(key) if mode != "refresh" else (None, False)
+            if record is None:
+                metrics.count("work_cache_misses")
+                (missing_ids if lookup == cache.get_by_id else missing_dois).append(original)
+                fetched_as[position] = original
+            elif not fresh:
+                metrics.count("work_cache_stale")
+                stale_ids.append(normalize_openalex_id(record.get("id")))
+                fetched_as[position] = stale_ids[-1]
+            else:
+                metrics.count("work_cache_hits")
+
+    # Revalidate stale entries on updated_date; refetch only the changed works
+    if stale_ids:
+        cached_dates = cache.updated_dates(stale_ids)
+        unchanged = set()
+        for start in range(0, len(stale_ids), 100):
+            for work in fetch_openalex_filter("openalex", stale_ids[start:start + 100], engine.get, select="id,updated_date"):
+                work_id = normalize_openalex_id(work.get("id"))
+                if work.get("updated_date") and work.get("updated_date") == cached_dates.get(work_id):
+                    unchanged.add(work_id)
+        cache.touch(unchanged)
+        metrics.count("work_cache_revalidated_unchanged", len(unchanged))
+        missing_ids += [work_id for work_id in stale_ids if work_id not in unchanged]
+        fetched_as = {position: key for position, key in fetched_as.items() if key not in unchanged}
+
+    fetched = iter_openalex_batched(missing_ids, missing_dois, batch_size or 1, engine)
+    found = {}  # key fetched with -> records fetched ahead of their turn
     try:
-        # Fetch by OpenAlex IDs
-        for openalex_id in openalex_ids:
-            url = f"https://api.openalex.org/works/{openalex_id}"
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            record = response.json()
-            all_records.append(record)
-        
-        # Fetch by DOIs
-        for doi in dois:
-            url = f"https://api.openalex.org/works/https://doi.org/{doi}"
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            record = response.json()
-            all_records.append(record)
-
-        with open(output_file, "w", encoding="utf-8") as file:
-            json.dump(all_records, file, indent=4)
+        for position, ((lookup, key), original) in enumerate(zip(lookups, openalex_ids + dois)):
+            if position not in fetched_as:
+                yield original, lookup(key)[0]
+                continue
+            # Misses come back in the order they were asked for; stale works come after them
+            while not found.get(fetched_as[position]):
+                fetched_key, record = next(fetched)
+                if record is not None:
+                    cache.put(normalize_openalex_id(record.get("id")), normalize_doi(record.get("doi")), record)
+                found.setdefault(fetched_key, []).append(record)
+            record = found[fetched_as[position]].pop(0)
+            # A stale work no longer in OpenAlex is still served from the cache
+            yield original, record if record is not None else lookup(key)[0]
+    finally:
+        fetched.close()
+        if missing_ids or missing_dois:
+            cache.evict()
+
+def fetch_stage(openalex_ids, dois, records_file=None, batch_size=batch_size, engine=None,
+                cache=None, cache_mode=None, resume=False, queue_size=queue_size, checkpoint=None):
+    """
+    Pipeline stage fetching works from OpenAlex.
+
+    Records are yielded in input order and, if records_file is given, appended
+    to it as they arrive, so a failed run still leaves the records fetched so far.
+    With resume, the records already in records_file are yielded first and
+    only the keys they do not cover are fetched. The requests run on a
+    background thread up to queue_size records ahead of the consumer (see
+    prefetch); records are written to records_file as the consumer takes them.
+
+    Args:
+        openalex_ids (list): List of OpenAlex IDs to fetch.
+        dois (list): List of DOIs to fetch.
+        records_file (str): Optional record store (.jsonl, .jsonl.gz, .jsonl.zst or .json).
+        batch_size (int): Keys per OR-filter query; 0 fetches one work per request.
+        engine (FetchEngine): Engine running the requests; its session is the HTTP transport.
+        cache (WorkCache): Optional on-disk cache of works.
+        cache_mode (str): None, "refresh" or "offline"; see iter_openalex_cached.
+        resume (bool): Continue the records_file of an interrupted run.
+        queue_size (int): Records fetched ahead of the consumer (0 = no background thread).
+        checkpoint (RunCheckpoint): Optional checkpoint told the record store offset after each record.
+    Yields:
+        dict: One OpenAlex work at a time.
+    """
+    engine = engine or get_engine()
+
+    if resume:
+        fetched_ids, fetched_dois = set(), set()
+        for record in iter_records(records_file):
+            fetched_ids.add(normalize_openalex_id(record.get("id")))
+            fetched_dois.add(normalize_doi(record.get("doi")))
+        openalex_ids = [key for key in openalex_ids if normalize_openalex_id(key) not in fetched_ids]
+        dois = [key for key in dois if normalize_doi(key) not in fetched_dois]
+        for record in iter_records(records_file):
+            metrics.count("records_resumed")
+            yield record
+
+    if cache is not None:
+        results = iter_openalex_cached(openalex_ids, dois, cache, cache_mode, batch_size, engine)
+    elif batch_size:
+        results = iter_openalex_batched(openalex_ids, dois, batch_size, engine)
+    else:
+        results = iter_openalex_single(openalex_ids, dois, engine)
+    results = prefetch(results, queue_size)
+
+    writer = RecordWriter(records_file, append=resume) if records_file else None
+    try:
+        for key, record in results:
+            if record is None:
+                print(f"Not found in OpenAlex: {key}")
+                metrics.count("works_not_found")
+                continue
+            metrics.count("records_fetched")
+            if writer:
+                writer.write(record)
+                if checkpoint is not None:
+                    checkpoint.stored(writer.offset)
+            yield record
+    finally:
+        if writer:
+            writer.close()
+
+def fetch_openalex_records(openalex_ids, dois, output_file, batch_size=batch_size, engine=None,
+                           cache=None, cache_mode=None):
+    """
+    Fetch records from OpenAlex API using both OpenAlex IDs and DOIs, and save them to a file.
+
+    Records are written as they arrive, so a failed run still leaves the records
+    fetched so far. A .jsonl output file (optionally .jsonl.gz or .jsonl.zst) gets
+    one record per line; any other file gets a pretty-printed JSON array.
+
+    Args:
+        openalex_ids (list): List of OpenAlex IDs to fetch.
+        dois (list): List of DOIs to fetch.
+        output_file (str): Path to the output file where the response will be saved.
+        batch_size (int): Keys per OR-filter query; 0 fetches one work per request.
+        engine (FetchEngine): Engine running the requests; its session is the HTTP transport.
+        cache (WorkCache): Optional on-disk cache of works.
+        cache_mode (str): None, "refresh" or "offline"; see iter_openalex_cached.
+    """
+    try:
+        for _ in fetch_stage(openalex_ids, dois, output_file, batch_size, engine, cache, cache_mode):
+            pass
         
         print(f"Records successfully fetched and saved to {output_file}")
     except requests.exceptions.RequestException as e:
         print(f"An error occurred while fetching records: {e}")
 
-def fetch_xlink_href(abstract, title):
+def iter_openalex_changed(institution_ids, since=None, date_field="updated", engine=None):
     """
-    Fetch classification from Swepub Classify API.
+    Yield the works of one or more institutions that changed on or after a date.
+
+    Works are selected with the authorships.institutions.lineage filter, so works
+    of child institutions are included, and paged through with a cursor.
+
+    Args:
+        institution_ids (list): OpenAlex institution IDs (e.g., "I123" or "https://openalex.org/I123").
+        since (str): Date or timestamp for the from_updated_date/from_created_date filter;
+            None harvests all works of the institutions.
+        date_field (str): "updated" for changed works, "created" for new works only.
+        engine (FetchEngine): Engine running the requests; its session is the HTTP transport.
+    Yields:
+        dict: One OpenAlex work at a time.
+    """
+    engine = engine or get_engine()
+    filter_string = "authorships.institutions.lineage:" + "|".join(normalize_openalex_id(i) for i in institution_ids)
+    if since:
+        filter_string += f",{date_fields[date_field][1]}:{since}"
+    for record in iter_openalex_query(filter_string, engine.get, record_select()):
+        yield slim_record(record)
+
+def harvest_stage(institution_ids, state, since=None, date_field="updated", records_file=None, engine=None,
+                  cache=None, resume=False, queue_size=queue_size, checkpoint=None):
+    """
+    Pipeline stage yielding the works of institutions that are new or changed since the last harvest.
+
+    The harvest starts at since or, if not given, at the high-water mark saved in
+    state; without either, all works of the institutions are harvested. Works
+    already harvested up to the mark are skipped, unless since is given. The pending mark is advanced for
+    every work; call state.commit() once the records have been written.
+    With resume, the records already in records_file are yielded first and
+    skipped in the harvest.
+
     Args:
-        abstract (str): Concatenated abstract terms.
+        institution_ids (list): OpenAlex institution IDs.
+        state (HarvestState): High-water marks of earlier harvests.
+        since (str): Date overriding the saved high-water mark.
+        date_field (str): "updated" or "created"; see iter_openalex_changed.
+        records_file (str): Optional record store (.jsonl, .jsonl.gz, .jsonl.zst or .json).
+        engine (FetchEngine): Engine running the requests.
+        cache (WorkCache): Optional cache the harvested works are stored in.
+        resume (bool): Continue the records_file of an interrupted run.
+        queue_size (int): Works fetched ahead of the consumer; the next pages are
+            requested while earlier works are converted (0 = no background thread).
+        checkpoint (RunCheckpoint): Optional checkpoint told the record store offset after each record.
+    Yields:
+        dict: One OpenAlex work at a time.
+    """
+    key = harvest_key([normalize_openalex_id(i) for i in institution_ids], date_field)
+    record_field = date_fields[date_field][0]
+    since_given = bool(since)
+    since = since or state.watermark(key)
+    print(f"Harvesting works with {record_field} from {since}" if since else "Harvesting all works")
+
+    harvested = set()
+    if resume:
+        for record in iter_records(records_file):
+            work_id = normalize_openalex_id(record.get("id"))
+            harvested.add(work_id)
+            state.advance(key, record.get(record_field), work_id)
+            metrics.count("records_resumed")
+            yield record
+
+    writer = RecordWriter(records_file, append=resume) if records_file else None
+    skipped = 0
+    try:
+        for record in prefetch(iter_openalex_changed(institution_ids, since, date_field, engine), queue_size):
+            work_id = normalize_openalex_id(record.get("id"))
+            if work_id in harvested:
+                continue
+            if not since_given and state.seen(key, record.get(record_field), work_id):
+                skipped += 1
+                continue
+            state.advance(key, record.get(record_field), work_id)
+            metrics.count("records_fetched")
+            if cache is not None:
+                cache.put(work_id, normalize_doi(record.get("doi")), record)
+            if writer:
+                writer.write(record)
+                if checkpoint is not None:
+                    checkpoint.stored(writer.offset)
+            yield record
+    finally:
+        if writer:
+            writer.close()
+        if cache is not None:
+            cache.evict()
+    metrics.count("records_skipped_harvested", skipped)
+    if skipped:
+        print(f"Skipped {skipped} works already harvested")
+
+def classify_level(abstract, title, level, engine=None, cache=None, offline=False):
+    """
+    Ask the Swepub Classify API for the best classification at one level.
+
+    Args:
+        abstract (str): Abstract text.
         title (str): Title of the record.
+        level (int): Classification level, 5 or 3.
+        engine (FetchEngine): Engine sending the request.
+        cache (ClassificationCache): Optional cache of earlier answers, including misses.
+        offline (bool): Only answer from the cache.
     Returns:
-        str: Classification code (e.g., "10205").
+        str: Classification code, or None if there were no suggestions (or no cached answer offline).
     """
-    url = "https://bibliometri.swepub.kb.se/api/v1/classify"
+    if cache is not None:
+        code = cache.get(title, abstract, level)
+        metrics.count("classification_cache_misses" if code is None else "classification_cache_hits")
+        if code == known_miss:
+            return None  # No suggestions last time, do not ask again
+        if code is not None:
+            return code
+    if offline:
+        return None
+
+    engine = engine or get_engine()
     headers = {
         "Content-Type": "application/json"
     }
-    
-    # First attempt with level 5
     data = {
         "abstract": abstract,
         "keywords": "",
         "classes": 1,
-        "level": 5,
+        "level": level,
         "title": title
     }
-    response = requests.post(url, json=data, headers=headers)
-    if response.status_code == 200:
-        result = response.json()
-        if 'suggestions' in result and len(result['suggestions']) > 0:
-            best_suggestion = max(result['suggestions'], key=lambda x: x['_score'])
-            return best_suggestion['code']
-    
-    # Second attempt with level 3 if no suggestions found in the first attempt
-    data["level"] = 3
-    response = requests.post(url, json=data, headers=headers)
-    if response.status_code == 200:
-        result = response.json()
-        if 'suggestions' in result and len(result['suggestions']) > 0:
-            best_suggestion = max(result['suggestions'], key=lambda x: x['_score'])
-            return best_suggestion['code']
-    
+    response = engine.post(classify_api, json=data, headers=headers)
+    if response.status_code != 200:
+        # Do not remember failed requests, they are retried next time
+        print(f"Classification failed with HTTP {response.status_code}: {title}")
+        metrics.count("classify_failed")
+        return None
+    result = response.json()
+    code = None
+    if 'suggestions' in result and len(result['suggestions']) > 0:
+        best_suggestion = max(result['suggestions'], key=lambda x: x['_score'])
+        code = best_suggestion['code']
+    if cache is not None:
+        cache.put(title, abstract, level, code)
+    return code
+
+def fetch_xlink_href(abstract, title, engine=None, cache=None, offline=False):
+    """
+    Fetch classification from Swepub Classify API.
+
+    With a local_classifier, its code is used without any lookup or request
+    if its confidence reaches local_threshold.
+
+    Args:
+        abstract (str): Abstract text.
+        title (str): Title of the record.
+        engine (FetchEngine): Engine sending the requests.
+        cache (ClassificationCache): Optional cache of earlier answers, including misses.
+        offline (bool): Only answer from the cache.
+    Returns:
+        str: Classification code (e.g., "10205").
+    """
+    if local_classifier is not None:
+        start = time.perf_counter()
+        code, confidence = local_classifier.predict(title, abstract)
+        metrics.observe("classify_local_seconds", time.perf_counter() - start)
+        if code and confidence >= local_threshold:
+            metrics.count("classify_local")
+            return code
+        metrics.count("classify_local_unsure")
+
+    # First attempt with level 5, second attempt with level 3 if no suggestions found
+    for level in (5, 3):
+        code = classify_level(abstract, title, level, engine, cache, offline)
+        if code:
+            if level == 3:
+                metrics.count("classify_fallback_level3")
+            return code
+
+    metrics.count("classify_unclassified")
     raise Exception("No suggestions found in API response")
 
-def add_classification_to_xml(json_data_list, xml_file):
+def classify_request(json_data):
+    """
+    Return the (title, abstract) a record is classified by, or None if it has no abstract.
+    """
+    # Skip if no "abstract_inverted_index" exists
+    abstract_inverted_index = json_data.get("abstract_inverted_index", None)
+    if not abstract_inverted_index:
+        metrics.count("classify_without_abstract")
+        return None
+    # Rebuild the abstract in word order from "abstract_inverted_index"
+    abstract = abstract_from_inverted_index(abstract_inverted_index)
+    return json_data.get("title", ""), abstract
+
+def classify_one(request, engine=None, cache=None, offline=False):
+    """
+    Classify one (title, abstract), returning the code or None if it could not be classified.
+    """
+    title, abstract = request
+    try:
+        # Fetch classification code from Swepub Classify API
+        return fetch_xlink_href(abstract, title, engine, cache, offline)
+    except Exception as e:
+        print(f"Error fetching classification for title '{title}': {e}")
+        return None
+
+def classify_records(json_data_list, engine=None, cache=None, workers=None, offline=False):
+    """
+    Classify records concurrently, sending each distinct (title, abstract) only once.
+
+    Args:
+        json_data_list (iterable): JSON records, e.g. streamed with recordsOA.iter_records.
+        engine (FetchEngine): Engine sending the classify requests.
+        cache (ClassificationCache): Optional persistent cache of results.
+        workers (int): Maximum records being classified at once (defaults to the engine's workers).
+        offline (bool): Only answer from the cache.
+    Returns:
+        list: Classification code or None for each record, in input order.
+    """
+    engine = engine or get_engine()
+    requests_by_record = [classify_request(json_data) for json_data in json_data_list]
+
+    def classify(request):
+        return classify_one(request, engine, cache, offline)
+
+    unique = list(dict.fromkeys(request for request in requests_by_record if request is not None))
+    metrics.count("classify_duplicates", sum(request is not None for request in requests_by_record) - len(unique))
+    codes = dict(zip(unique, engine.map(classify, unique, workers)))
+    return [codes[request] if request is not None else None for request in requests_by_record]
+
+def add_classification_to_xml(json_data_list, xml_file, engine=None, cache=None, workers=None, offline=False):
     """
     Add classification to each record in the XML based on Swepub Classify API.
     Args:
-        json_data_list (list): List of JSON records.
+        json_data_list (iterable): JSON records, e.g. streamed with recordsOA.iter_records.
         xml_file (str): Path to the XML file to modify.
+        engine (FetchEngine): Engine sending the classify requests concurrently.
+        cache (ClassificationCache): Optional persistent cache of classify results.
+        workers (int): Maximum records being classified at once.
+        offline (bool): Only use cached classifications.
     """
     # Define namespaces
     namespaces = {
@@ -106,56 +753,476 @@ def add_classification_to_xml(json_data_list, xml_file):
     tree = ET.parse(xml_file)
     root = tree.getroot()
 
-    # Iterate over JSON records and corresponding <mods> elements
-    for json_data, mods in zip(json_data_list, root.findall("{http://www.loc.gov/mods/v3}mods")):
-        # Skip if no "abstract_inverted_index" exists
-        abstract_inverted_index = json_data.get("abstract_inverted_index", None)
-        if not abstract_inverted_index:
+    # Classify concurrently; results come back in the order of json_data_list
+    classification_codes = classify_records(json_data_list, engine, cache, workers, offline)
+
+    # Iterate over classification codes and corresponding <mods> elements
+    for classification_code, mods in zip(classification_codes, root.findall("{http://www.loc.gov/mods/v3}mods")):
+        if classification_code is None:
             continue
-        
-        # Concatenate all terms in "abstract_inverted_index" to form the abstract
-        abstract = " ".join(abstract_inverted_index.keys())
-        title = json_data.get("title", "")
-        
-        try:
-            # Fetch classification code from Swepub Classify API
-            classification_code = fetch_xlink_href(abstract, title)
-            
-            # Add <subject> element to the XML
-            ET.SubElement(mods, "subject", {
-                "lang": "eng",
-                "authority": "hsv",
-                "{http://www.w3.org/1999/xlink}href": classification_code  # Use xlink namespace
-            })
-        except Exception as e:
-            print(f"Error fetching classification for title '{title}': {e}")
+
+        # Add <subject> element to the XML
+        ET.SubElement(mods, "subject", {
+            "lang": "eng",
+            "authority": "hsv",
+            "{http://www.w3.org/1999/xlink}href": classification_code  # Use xlink namespace
+        })
     
     # Save the updated XML file
     tree.write(xml_file, encoding="utf-8", xml_declaration=True)
     print(f"Updated XML file saved to {xml_file}")
 
+def mods_hash(mods):
+    """Return a content hash of a <mods> element; all serializers give the same bytes."""
+    return hashlib.sha256(serializers[default_serializer](mods)).hexdigest()
+
+def skip_exported(openalex_ids, dois, index, engine=None):
+    """
+    Drop input keys of works that were exported before and have not been updated since.
+
+    Exported works are checked with a cheap select=id,updated_date query, so
+    unchanged works are neither fetched, converted nor classified again.
+
+    Args:
+        openalex_ids (list): List of OpenAlex IDs to fetch.
+        dois (list): List of DOIs to fetch.
+        index (ExportIndex): Index of exported works.
+        engine (FetchEngine): Engine running the requests.
+    Returns:
+        tuple: (openalex_ids, dois) still to be fetched.
+    """
+    engine = engine or get_engine()
+    exported = {}  # input key -> (exported OpenAlex ID, updated_date)
+    for key in openalex_ids:
+        entry = index.lookup(openalex_id=normalize_openalex_id(key))
+        if entry:
+            exported[key] = entry[:2]
+    for key in dois:
+        entry = index.lookup(doi=normalize_doi(key))
+        if entry:
+            exported[key] = entry[:2]
+
+    exported_ids = list(dict.fromkeys(work_id for work_id, _ in exported.values()))
+    current = {}  # OpenAlex ID -> updated_date in OpenAlex now
+    for start in range(0, len(exported_ids), 100):
+        for work in fetch_openalex_filter("openalex", exported_ids[start:start + 100], engine.get, select="id,updated_date"):
+            current[normalize_openalex_id(work.get("id"))] = work.get("updated_date")
+
+    unchanged = {key for key, (work_id, updated_date) in exported.items()
+                 if updated_date and current.get(work_id) == updated_date}
+    metrics.count("records_skipped_exported", len(unchanged))
+    if unchanged:
+        print(f"Skipped {len(unchanged)} works already exported and not updated since")
+    return [key for key in openalex_ids if key not in unchanged], [key for key in dois if key not in unchanged]
+
+def convert_record(record):
+    """Build the <mods> element of a record, recording the conversion time."""
+    start = time.perf_counter()
+    mods = build_mods(record)
+    metrics.observe("convert_record_seconds", time.perf_counter() - start)
+    metrics.count("records_converted")
+    return mods
+
+def convert_stage(records, index=None, export_all=False):
+    """
+    Pipeline stage converting each record to a <mods> element.
+
+    With an export index, works exported before are skipped if their
+    updated_date or their generated <mods> element is unchanged, and the other
+    works are added to the index; commit the index once the file is written.
+
+    Args:
+        records (iterable): OpenAlex works.
+        index (ExportIndex): Optional index of exported works.
+        export_all (bool): Convert unchanged works too, still adding them to the index.
+    Yields:
+        tuple: (record, mods) so later stages keep each record with its own element.
+    """
+    skipped = 0
+    for record in records:
+        if index is None:
+            yield record, convert_record(record)
+            continue
+
+        openalex_id, doi, pmid = work_keys(record)
+        entry = None if export_all else index.lookup(openalex_id, doi, pmid)
+        updated_date = record.get("updated_date")
+        if entry and updated_date and entry[1] == updated_date:
+            skipped += 1
+            continue
+        mods = convert_record(record)
+        digest = mods_hash(mods)
+        if entry and entry[2] == digest:
+            # Only fields not exported to MODS changed (e.g., citation counts)
+            skipped += 1
+            continue
+        index.add(openalex_id, doi, pmid, updated_date, digest)
+        yield record, mods
+    metrics.count("records_skipped_unchanged", skipped)
+    if skipped:
+        print(f"Skipped {skipped} works unchanged since their last export")
+
+def classify_stage(pairs, engine=None, cache=None, workers=None, offline=False, chunk_size=100):
+    """
+    Pipeline stage adding the Swepub classification to each <mods> element before it is written.
+
+    The classify request of a record goes out as soon as the record arrives,
+    on the engine's thread pool, while later records are still being fetched
+    and converted. At most chunk_size records wait for their classification;
+    then the stage waits for the oldest one, which holds back the stages
+    before it. A (title, abstract) already being classified is not sent again.
+
+    Args:
+        pairs (iterable): (record, mods) tuples from convert_stage.
+        engine (FetchEngine): Engine sending the classify requests.
+        cache (ClassificationCache): Optional persistent cache of classify results.
+        workers (int): Maximum records being classified at once.
+        offline (bool): Only use cached classifications.
+        chunk_size (int): Maximum records waiting for their classification.
+    Yields:
+        tuple: (record, mods) in input order.
+    """
+    yield from classify_streaming(pairs, engine, cache, workers, offline, chunk_size)
+
+def classify_streaming(pairs, engine=None, cache=None, workers=None, offline=False, ahead=100):
+    """Classify (record, mods) pairs on the engine's thread pool as they arrive; see classify_stage."""
+    engine = engine or get_engine()
+    lock = threading.Lock()
+    in_flight = {}  # (title, abstract) -> [Future of its code, records waiting for it]
+
+    def classify(pair):
+        record, mods = pair
+        request = classify_request(record)
+        if request is None:
+            return record, mods, None
+        with lock:
+            entry = in_flight.get(request)
+            first = entry is None
+            if first:
+                entry = in_flight[request] = [Future(), 0]
+            entry[1] += 1
+        try:
+            if first:
+                try:
+                    entry[0].set_result(classify_one(request, engine, cache, offline))
+                except BaseException as e:
+                    # Records waiting for the same request fail with it rather than wait forever
+                    entry[0].set_exception(e)
+                    raise
+            else:
+                metrics.count("classify_duplicates")
+            return record, mods, entry[0].result()
+        finally:
+            with lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del in_flight[request]
+
+    for record, mods, classification_code in engine.imap(classify, pairs, workers, ahead):
+        if classification_code is not None:
+            add_subject(mods, classification_code)
+        yield record, mods
+
+def write_stage(pairs, xml_file, checkpoint=None, resume=None, serializer=default_serializer, shard_records=None,
+                shard_bytes=None):
+    """
+    Pipeline stage writing the <mods> elements to xml_file, each as soon as it arrives.
+
+    With shard_records or shard_bytes, the elements are written to size-bounded
+    shards named after xml_file, with a manifest (see shardOA); sharded output
+    is not checkpointed.
+
+    Args:
+        pairs (iterable): (record, mods) tuples.
+        xml_file (str): Path of the MODS XML file to write.
+        checkpoint (RunCheckpoint): Optional checkpoint told about every written element.
+        resume (tuple): (offset, count) of an interrupted run's XML file to continue.
+        serializer (str): Name of the transOA serializer writing the elements.
+        shard_records (int): Maximum records per shard.
+        shard_bytes (int): Maximum size of a shard in bytes.
+    Returns:
+        int: Number of records written.
+    """
+    if shard_records or shard_bytes:
+        serialize = serializers[serializer]
+        fragments = ((record.get("id"), serialize(mods)) for record, mods in pairs)
+        return write_mods_shards(fragments, xml_file, shard_records, shard_bytes)
+    if checkpoint is None:
+        return write_mods_stream((mods for _, mods in pairs), xml_file, resume, serializer=serializer)
+
+    current = {}  # The record whose element is being written
+
+    def elements():
+        for record, mods in pairs:
+            current["record"] = record
+            yield mods
+
+    def progress(count, file):
+        checkpoint.element_written(current["record"], count, file)
+
+    return write_mods_stream(elements(), xml_file, resume, progress, serializer)
+
+def skip_done(records, count, index=None, export_all=False):
+    """
+    Skip the records an interrupted run already wrote or skipped.
+
+    With an export index, the skipped records are converted again (without
+    classification or output) so they are added to the index like in the
+    interrupted run, whose index changes were not committed.
+
+    Args:
+        records (iterable): The record stream, from the start.
+        count (int): Records taken from the stream by the interrupted run.
+        index (ExportIndex): Optional index of exported works.
+        export_all (bool): As passed to convert_stage.
+    Yields:
+        dict: The records after the first count.
+    """
+    records = iter(records)
+    done = itertools.islice(records, count)
+    for _ in (convert_stage(done, index, export_all) if index is not None else done):
+        pass
+    yield from records
+
+def run_pipeline(records, xml_file, classify=True, engine=None, cache=None, workers=None,
+                 offline=False, index=None, export_all=False, checkpoint=None, resume=None,
+                 serializer=default_serializer, shard_records=None, shard_bytes=None):
+    """
+    Convert, classify and write records in a single pass, in one process.
+
+    The stages overlap: fetch_stage and harvest_stage fetch ahead on a
+    background thread and classify_stage sends requests as records arrive,
+    both with bounded queues, so network waits run alongside conversion and
+    writing and memory stays bounded. The time of each stage ("fetch" for
+    waiting on the records, "convert", "classify" for waiting on
+    classifications, "write") is recorded in metricsOA.metrics.
+
+    Args:
+        records (iterable): OpenAlex works, e.g. from fetch_stage or recordsOA.iter_records.
+        xml_file (str): Path of the MODS XML file to write.
+        classify (bool): Add Swepub classifications.
+        engine (FetchEngine): Engine sending the classify requests.
+        cache (ClassificationCache): Optional persistent cache of classify results.
+        workers (int): Maximum records being classified at once.
+        offline (bool): Only use cached classifications.
+        index (ExportIndex): Optional index of exported works; unchanged works are skipped
+            and the index is updated once the file has been written.
+        export_all (bool): Write unchanged works too.
+        checkpoint (RunCheckpoint): Optional checkpoint saving the progress of the run.
+        resume (dict): State loaded from the checkpoint of an interrupted run to continue.
+        serializer (str): Name of the transOA serializer writing the elements.
+        shard_records (int): Maximum records per output shard; see write_stage.
+        shard_bytes (int): Maximum size of an output shard in bytes.
+    Returns:
+        int: Number of records written.
+    """
+    records = metrics.timed(records, "fetch")
+    if checkpoint is not None:
+        records = checkpoint.track(records)
+    if resume:
+        records = skip_done(records, resume["read"], index, export_all)
+    pairs = metrics.timed(convert_stage(records, index, export_all), "convert", inner="fetch")
+    last = "convert"
+    if classify:
+        pairs = metrics.timed(classify_stage(pairs, engine, cache, workers, offline), "classify",
+                              inner="convert")
+        last = "classify"
+    try:
+        with metrics.timer("write", inner=last):
+            count = write_stage(pairs, xml_file, checkpoint,
+                                (resume["xml_offset"], resume["written"]) if resume else None, serializer,
+                                shard_records, shard_bytes)
+    except BaseException:
+        if index is not None:
+            index.rollback()
+        raise
+    metrics.count("records_written", count)
+    if index is not None:
+        index.commit()
+    if checkpoint is not None:
+        checkpoint.clear()
+    return count
+
 if __name__ == "__main__":
-    # Output file path
-    output_file = "openalex_records.json"
-    
-    # Fetch and save records
-    fetch_openalex_records(openalex_ids, doi, output_file)
-    
+    parser = argparse.ArgumentParser(description="Fetch OpenAlex works and convert them to MODS XML.")
+    parser.add_argument("--batch-size", type=int, default=batch_size,
+                        help="IDs/DOIs per OpenAlex filter query (0 = one request per work)")
+    parser.add_argument("--workers", type=int, default=default_workers,
+                        help="maximum number of HTTP requests in flight")
+    parser.add_argument("--rate", type=float, default=default_rate,
+                        help="maximum requests started per second (0 = unlimited)")
+    parser.add_argument("--cache", default=default_cache_file,
+                        help="SQLite file caching fetched works")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always fetch from OpenAlex and do not store works")
+    parser.add_argument("--cache-ttl", type=float, default=default_ttl / 86400,
+                        help="days before a cached work is revalidated")
+    parser.add_argument("--cache-size", type=int, default=default_max_bytes // (1024 * 1024),
+                        help="cache size cap in MB (least recently used works are evicted)")
+    cache_modes = parser.add_mutually_exclusive_group()
+    cache_modes.add_argument("--refresh", dest="cache_mode", action="store_const", const="refresh",
+                             help="ignore cached works and fetch everything again")
+    cache_modes.add_argument("--offline", dest="cache_mode", action="store_const", const="offline",
+                             help="use only cached works, without network access")
+    parser.add_argument("--records", default="openalex_records.jsonl",
+                        help="file receiving the fetched records (.jsonl, .jsonl.gz, .jsonl.zst or .json)")
+    parser.add_argument("--classify-cache", default=default_classify_cache_file,
+                        help="SQLite file caching Swepub classifications")
+    parser.add_argument("--classify-workers", type=int, default=None,
+                        help="maximum records being classified at once (defaults to --workers)")
+    parser.add_argument("--queue-size", type=int, default=queue_size,
+                        help="records fetched ahead of conversion and classification (0 = fetch in step)")
+    parser.add_argument("--local-model", default=None,
+                        help="classify with this local model (trained with classifyOA.py) before asking Swepub")
+    parser.add_argument("--local-threshold", type=float, default=local_threshold,
+                        help="minimum confidence of the local model; below it Swepub is asked")
+    parser.add_argument("--institution", action="append", default=[],
+                        help="harvest works of this OpenAlex institution ID that changed since the last harvest, "
+                             "instead of the doi/openalex_ids lists (can be repeated)")
+    parser.add_argument("--since", default=None,
+                        help="harvest from this date (YYYY-MM-DD) instead of the saved high-water mark")
+    parser.add_argument("--date-field", choices=sorted(date_fields), default="updated",
+                        help="harvest changed works (updated) or new works only (created)")
+    parser.add_argument("--state", default=default_state_file,
+                        help="JSON file keeping the high-water mark of each harvest")
+    parser.add_argument("--snapshot", default=None,
+                        help="read works from this local OpenAlex snapshot instead of the API, selecting "
+                             "the --institution works or the doi/openalex_ids lists")
+    parser.add_argument("--snapshot-workers", type=int, default=None,
+                        help="snapshot partitions scanned at once (default: CPUs)")
+    parser.add_argument("--full-records", action="store_true",
+                        help="fetch and keep complete OpenAlex works instead of only the fields used for MODS "
+                             "and classification (combine with --refresh to replace slim cached works)")
+    parser.add_argument("--api-url", default=openalex_api,
+                        help="OpenAlex works endpoint, e.g. a local stub for offline testing")
+    parser.add_argument("--export-index", default=default_export_index_file,
+                        help="SQLite index of exported works; works exported before are skipped unless changed")
+    parser.add_argument("--export-all", action="store_true",
+                        help="export every work, even if unchanged since its last export (the index is still updated)")
+    parser.add_argument("--retries", type=int, default=default_retries,
+                        help="extra attempts for requests failing with a network error, 429 or 5xx")
+    parser.add_argument("--timeout", type=float, default=default_timeout,
+                        help="seconds to wait for a connection or a response before retrying a request")
+    parser.add_argument("--checkpoint", default=default_checkpoint_file,
+                        help="JSON file saving the progress of the run")
+    parser.add_argument("--checkpoint-every", type=int, default=default_checkpoint_every,
+                        help="written records between checkpoints")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the interrupted run saved in --checkpoint")
+    parser.add_argument("--serializer", choices=sorted(serializers), default=default_serializer,
+                        help="how <mods> elements are serialized (default: direct; both give the same bytes)")
+    parser.add_argument("--shard-records", type=int, default=None,
+                        help="write the XML as shards of at most N records each, with a manifest")
+    parser.add_argument("--shard-mb", type=float, default=None,
+                        help="write the XML as shards of at most this many MB each, with a manifest")
+    parser.add_argument("--metrics", default=None,
+                        help="write a run report with stage times, counters and latency histograms "
+                             "to this file (JSON, or Prometheus text format for .prom files)")
+    parser.add_argument("--profile", default=None,
+                        help="profile the run with cProfile and save the statistics to this file")
+    args = parser.parse_args()
+    if args.resume and is_compressed(args.records):
+        parser.error("--resume needs an uncompressed --records file")
+    if args.institution and args.cache_mode == "offline" and not args.snapshot:
+        parser.error("--institution needs network access and cannot be combined with --offline")
+    sharded = bool(args.shard_records or args.shard_mb)
+    if args.resume and sharded:
+        parser.error("sharded output is not checkpointed and cannot be resumed")
+
+    openalex_api = args.api_url
+    if args.local_model:
+        local_classifier = LocalClassifier.load(args.local_model)
+        local_threshold = args.local_threshold
+    if args.full_records:
+        record_fields = None
+
+    engine = FetchEngine(workers=args.workers, rate=args.rate, headers=openalex_headers, retries=args.retries,
+                         timeout=args.timeout, endpoints={"openalex": openalex_api, "classify": classify_api})
+    cache = None
+    if not args.no_cache:
+        cache = WorkCache(args.cache, ttl=args.cache_ttl * 86400, max_bytes=args.cache_size * 1024 * 1024)
+    classify_cache = None if args.no_cache else ClassificationCache(args.classify_cache)
+    index = ExportIndex(args.export_index)
+
     # Generate today's date in YYMMDD format
     today_date = datetime.datetime.now().strftime("%y%m%d")
     xml_file = f"openalex{today_date}.xml"  # Output XML file with today's date
-    
-    # Call transOA.py to convert JSON to XML
-    try:
-        subprocess.run(["python3", "transOA.py", output_file, xml_file], check=True)
-        print(f"XML file successfully created by transOA.py: {xml_file}")
-    except subprocess.CalledProcessError as e:
-        print(f"An error occurred while running transOA.py: {e}")
-    
-    # Add classification to the XML
+
+    # Compressed record stores cannot be cut back to a checkpoint, so they are not checkpointed
+    checkpoint = None
+    if not is_compressed(args.records) and not sharded:
+        checkpoint = RunCheckpoint(args.checkpoint, args.records, xml_file, args.checkpoint_every)
+    resume = checkpoint.load() if args.resume else None
+    if args.resume and resume is None:
+        print(f"No checkpoint in {args.checkpoint}, starting from the beginning")
+    if resume:
+        # Continue the interrupted run's files from its last checkpoint
+        checkpoint.resume(resume)
+        args.records, xml_file = resume["records_file"], resume["xml_file"]
+        truncate_file(args.records, resume["records_offset"])
+        print(f"Resuming after {resume['written']} written records")
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+
+    # Fetch, convert, classify and write in one pass; the records are also kept in args.records
+    status = "completed"
     try:
-        with open(output_file, "r", encoding="utf-8") as file:
-            json_data_list = json.load(file)
-        add_classification_to_xml(json_data_list, xml_file)
-    except Exception as e:
-        print(f"An error occurred while adding classifications to the XML: {e}")
\ No newline at end of file
+        if args.snapshot:
+            # --since selects partitions by updated_date; the harvest high-water mark is not used
+            snapshot_filter = SnapshotFilter(args.institution, [] if args.institution else openalex_ids,
+                                             [] if args.institution else doi)
+            records = snapshot_stage(args.snapshot, snapshot_filter, args.records, args.since,
+                                     args.snapshot_workers, resume=bool(resume), fields=record_fields,
+                                     checkpoint=checkpoint)
+        elif args.institution:
+            state = HarvestState(args.state)
+            records = harvest_stage(args.institution, state, args.since, args.date_field, args.records, cache=cache,
+                                    resume=bool(resume), queue_size=args.queue_size, checkpoint=checkpoint)
+        else:
+            wanted_ids, wanted_dois = openalex_ids, doi
+            if not args.export_all and args.cache_mode != "offline":
+                with metrics.timer("skip_exported"):
+                    wanted_ids, wanted_dois = skip_exported(openalex_ids, doi, index, engine)
+            records = fetch_stage(wanted_ids, wanted_dois, args.records, batch_size=args.batch_size,
+                                  cache=cache, cache_mode=args.cache_mode,
+                                  resume=bool(resume), queue_size=args.queue_size, checkpoint=checkpoint)
+        run_pipeline(records, xml_file, cache=classify_cache, workers=args.classify_workers,
+                     offline=args.cache_mode == "offline",
+                     index=index, export_all=args.export_all, checkpoint=checkpoint, resume=resume,
+                     serializer=args.serializer, shard_records=args.shard_records,
+                     shard_bytes=int(args.shard_mb * 1024 * 1024) if args.shard_mb else None)
+        print(f"Records saved to {args.records}")
+        if args.institution and not args.snapshot:
+            # Only a completed run moves the high-water mark
+            state.commit()
+            print(f"High-water mark saved to {args.state}")
+    except requests.exceptions.RequestException as e:
+        status = "failed"
+        print(f"An error occurred while fetching records: {e}")
+        if checkpoint is not None:
+            print("Continue the run with --resume")
+    except KeyboardInterrupt:
+        status = "interrupted"
+        print("Interrupted")
+        if checkpoint is not None:
+            print("Continue the run with --resume")
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"Profile saved to {args.profile} (view with: python -m pstats {args.profile})")
+        # Commit the cache writes still pending
+        for store in (cache, classify_cache):
+            if store is not None:
+                store.close()
+
+    print(f"HTTP requests: {engine.summary()}")
+    print(f"Stage seconds: {metrics.stage_seconds()}")
+    if args.metrics:
+        metrics.count("http_retries", engine.retried)
+        write_report(metrics.report(status, http=engine.summary(), records_file=args.records,
+                                    xml_file=manifest_file(xml_file) if sharded else xml_file),
+                     args.metrics)
+        print(f"Run report saved to {args.metrics}")
@@ -0,0 +1,277 @@
+# ISO code tables used by transOA, parsed once at import.
+#
+# language_codes: ISO 639-1 (two-letter) -> ISO 639-2/B (three-letter bibliographic) codes
+# country_names: ISO 3166-1 alpha-2 codes -> English short names, plus XK (Kosovo), which
+# OpenAlex uses although it is not assigned in ISO 3166-1
+
+language_codes = dict(pair.split(":") for pair in """
+    aa:aar ab:abk ae:ave af:afr ak:aka am:amh an:arg ar:ara as:asm av:ava ay:aym az:aze
+    ba:bak be:bel bg:bul bh:bih bi:bis bm:bam bn:ben bo:tib br:bre bs:bos ca:cat ce:che
+    ch:cha co:cos cr:cre cs:cze cu:chu cv:chv cy:wel da:dan de:ger dv:div dz:dzo ee:ewe
+    el:gre en:eng eo:epo es:spa et:est eu:baq fa:per ff:ful fi:fin fj:fij fo:fao fr:fre
+    fy:fry ga:gle gd:gla gl:glg gn:grn gu:guj gv:glv ha:hau he:heb hi:hin ho:hmo hr:hrv
+    ht:hat hu:hun hy:arm hz:her ia:ina id:ind ie:ile ig:ibo ii:iii ik:ipk io:ido is:ice
+    it:ita iu:iku ja:jpn jv:jav ka:geo kg:kon ki:kik kj:kua kk:kaz kl:kal km:khm kn:kan
+    ko:kor kr:kau ks:kas ku:kur kv:kom kw:cor ky:kir la:lat lb:ltz lg:lug li:lim ln:lin
+    lo:lao lt:lit lu:lub lv:lav mg:mlg mh:mah mi:mao mk:mac ml:mal mn:mon mr:mar ms:may
+    mt:mlt my:bur na:nau nb:nob nd:nde ne:nep ng:ndo nl:dut nn:nno no:nor nr:nbl nv:nav
+    ny:nya oc:oci oj:oji om:orm or:ori os:oss pa:pan pi:pli pl:pol ps:pus pt:por qu:que
+    rm:roh rn:run ro:rum ru:rus rw:kin sa:san sc:srd sd:snd se:sme sg:sag si:sin sk:slo
+    sl:slv sm:smo sn:sna so:som sq:alb sr:srp ss:ssw st:sot su:sun sv:swe sw:swa ta:tam
+    te:tel tg:tgk th:tha ti:tir tk:tuk tl:tgl tn:tsn to:ton tr:tur ts:tso tt:tat tw:twi
+    ty:tah ug:uig uk:ukr ur:urd uz:uzb ve:ven vi:vie vo:vol wa:wln wo:wol xh:xho yi:yid
+    yo:yor za:zha zh:chi zu:zul
+""".split())
+
+country_names = dict(line.strip().split(" ", 1) for line in """
+    AD Andorra
+    AE United Arab Emirates
+    AF Afghanistan
+    AG Antigua and Barbuda
+    AI Anguilla
+    AL Albania
+    AM Armenia
+    AO Angola
+    AQ Antarctica
+    AR Argentina
+    AS American Samoa
+    AT Austria
+    AU Australia
+    AW Aruba
+    AX Åland Islands
+    AZ Azerbaijan
+    BA Bosnia and Herzegovina
+    BB Barbados
+    BD Bangladesh
+    BE Belgium
+    BF Burkina Faso
+    BG Bulgaria
+    BH Bahrain
+    BI Burundi
+    BJ Benin
+    BL Saint Barthélemy
+    BM Bermuda
+    BN Brunei
+    BO Bolivia
+    BQ Bonaire, Sint Eustatius and Saba
+    BR Brazil
+    BS Bahamas
+    BT Bhutan
+    BV Bouvet Island
+    BW Botswana
+    BY Belarus
+    BZ Belize
+    CA Canada
+    CC Cocos (Keeling) Islands
+    CD Democratic Republic of the Congo
+    CF Central African Republic
+    CG Republic of the Congo
+    CH Switzerland
+    CI Côte d'Ivoire
+    CK Cook Islands
+    CL Chile
+    CM Cameroon
+    CN China
+    CO Colombia
+    CR Costa Rica
+    CU Cuba
+    CV Cape Verde
+    CW Curaçao
+    CX Christmas Island
+    CY Cyprus
+    CZ Czech Republic
+    DE Germany
+    DJ Djibouti
+    DK Denmark
+    DM Dominica
+    DO Dominican Republic
+    DZ Algeria
+    EC Ecuador
+    EE Estonia
+    EG Egypt
+    EH Western Sahara
+    ER Eritrea
+    ES Spain
+    ET Ethiopia
+    FI Finland
+    FJ Fiji
+    FK Falkland Islands
+    FM Micronesia
+    FO Faroe Islands
+    FR France
+    GA Gabon
+    GB United Kingdom
+    GD Grenada
+    GE Georgia
+    GF French Guiana
+    GG Guernsey
+    GH Ghana
+    GI Gibraltar
+    GL Greenland
+    GM Gambia
+    GN Guinea
+    GP Guadeloupe
+    GQ Equatorial Guinea
+    GR Greece
+    GS South Georgia and the South Sandwich Islands
+    GT Guatemala
+    GU Guam
+    GW Guinea-Bissau
+    GY Guyana
+    HK Hong Kong
+    HM Heard Island and McDonald Islands
+    HN Honduras
+    HR Croatia
+    HT Haiti
+    HU Hungary
+    ID Indonesia
+    IE Ireland
+    IL Israel
+    IM Isle of Man
+    IN India
+    IO British Indian Ocean Territory
+    IQ Iraq
+    IR Iran
+    IS Iceland
+    IT Italy
+    JE Jersey
+    JM Jamaica
+    JO Jordan
+    JP Japan
+    KE Kenya
+    KG Kyrgyzstan
+    KH Cambodia
+    KI Kiribati
+    KM Comoros
+    KN Saint Kitts and Nevis
+    KP North Korea
+    KR South Korea
+    KW Kuwait
+    KY Cayman Islands
+    KZ Kazakhstan
+    LA Laos
+    LB Lebanon
+    LC Saint Lucia
+    LI Liechtenstein
+    LK Sri Lanka
+    LR Liberia
+    LS Lesotho
+    LT Lithuania
+    LU Luxembourg
+    LV Latvia
+    LY Libya
+    MA Morocco
+    MC Monaco
+    MD Moldova
+    ME Montenegro
+    MF Saint Martin
+    MG Madagascar
+    MH Marshall Islands
+    MK North Macedonia
+    ML Mali
+    MM Myanmar
+    MN Mongolia
+    MO Macao
+    MP Northern Mariana Islands
+    MQ Martinique
+    MR Mauritania
+    MS Montserrat
+    MT Malta
+    MU Mauritius
+    MV Maldives
+    MW Malawi
+    MX Mexico
+    MY Malaysia
+    MZ Mozambique
+    NA Namibia
+    NC New Caledonia
+    NE Niger
+    NF Norfolk Island
+    NG Nigeria
+    NI Nicaragua
+    NL Netherlands
+    NO Norway
+    NP Nepal
+    NR Nauru
+    NU Niue
+    NZ New Zealand
+    OM Oman
+    PA Panama
+    PE Peru
+    PF French Polynesia
+    PG Papua New Guinea
+    PH Philippines
+    PK Pakistan
+    PL Poland
+    PM Saint Pierre and Miquelon
+    PN Pitcairn Islands
+    PR Puerto Rico
+    PS Palestine
+    PT Portugal
+    PW Palau
+    PY Paraguay
+    QA Qatar
+    RE Réunion
+    RO Romania
+    RS Serbia
+    RU Russia
+    RW Rwanda
+    SA Saudi Arabia
+    SB Solomon Islands
+    SC Seychelles
+    SD Sudan
+    SE Sweden
+    SG Singapore
+    SH Saint Helena, Ascension and Tristan da Cunha
+    SI Slovenia
+    SJ Svalbard and Jan Mayen
+    SK Slovakia
+    SL Sierra Leone
+    SM San Marino
+    SN Senegal
+    SO Somalia
+    SR Suriname
+    SS South Sudan
+    ST São Tomé and Príncipe
+    SV El Salvador
+    SX Sint Maarten
+    SY Syria
+    SZ Swaziland
+    TC Turks and Caicos Islands
+    TD Chad
+    TF French Southern Territories
+    TG Togo
+    TH Thailand
+    TJ Tajikistan
+    TK Tokelau
+    TL Timor-Leste
+    TM Turkmenistan
+    TN Tunisia
+    TO Tonga
+    TR Turkey
+    TT Trinidad and Tobago
+    TV Tuvalu
+    TW Taiwan
+    TZ Tanzania
+    UA Ukraine
+    UG Uganda
+    UM United States Minor Outlying Islands
+    US United States
+    UY Uruguay
+    UZ Uzbekistan
+    VA Vatican City
+    VC Saint Vincent and the Grenadines
+    VE Venezuela
+    VG British Virgin Islands
+    VI U.S. Virgin Islands
+    VN Vietnam
+    VU Vanuatu
+    WF Wallis and Futuna
+    WS Samoa
+    XK Kosovo
+    YE Yemen
+    YT Mayotte
+    ZA South Africa
+    ZM Zambia
+    ZW Zimbabwe
+""".strip().splitlines())
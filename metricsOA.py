@@ -0,0 +1,237 @@
+import bisect
+import collections
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+
+# Upper bounds in seconds of the latency histogram buckets (Prometheus defaults, plus 30 and 60)
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Prefix of the metric names in Prometheus textfiles
+metric_prefix = "openalex"
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets, as in the Prometheus exposition format.
+
+    Args:
+        buckets (tuple): Sorted upper bounds in seconds; an implicit +Inf bucket follows.
+    """
+    def __init__(self, buckets=default_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        """Record one observation."""
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Return the upper bound of the bucket holding quantile q, or None without observations."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound if bound != float("inf") else self.max
+        return self.max
+
+    def to_dict(self):
+        """Return the histogram as cumulative bucket counts, like Prometheus."""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "max": round(self.max, 4),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": buckets
+        }
+
+class RunMetrics:
+    """
+    Timers, counters and latency histograms of one run.
+
+    Pipeline stages are wrapped with timed(); as stages pull their records
+    from the stage before, a wrapper measures its stage together with every
+    stage feeding it, and the stage's own time is that minus the time of its
+    inner stage. Counters are safe to increment from worker threads.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far and restart the run clock."""
+        with self.lock:
+            self.started = time.time()
+            self.clock = time.perf_counter()
+            self.counters = collections.Counter()
+            self.cumulative = collections.Counter()  # stage -> seconds including its inner stages
+            self.inner = {}  # stage -> the stage feeding it
+            self.histograms = {}
+
+    def count(self, name, amount=1):
+        """Add amount to the counter name."""
+        with self.lock:
+            self.counters[name] += amount
+
+    def observe(self, name, seconds):
+        """Add an observation to the latency histogram name."""
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(seconds)
+
+    def timed(self, items, stage, inner=None):
+        """
+        Yield items, timing how long each takes to produce.
+
+        Args:
+            items (iterable): The output of a pipeline stage.
+            stage (str): Name of the stage.
+            inner (str): Name of the timed stage feeding this one, if any.
+        Yields:
+            The items, unchanged.
+        """
+        self.inner[stage] = inner
+        items = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                # Also counts the time up to the end of the stage or an error in it
+                self.cumulative[stage] += time.perf_counter() - start
+            yield item
+
+    @contextlib.contextmanager
+    def timer(self, stage, inner=None):
+        """Time a block as a stage; see timed() for inner."""
+        self.inner[stage] = inner
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.cumulative[stage] += time.perf_counter() - start
+
+    def stage_seconds(self):
+        """Return the own seconds of every timed stage, in the order they were timed."""
+        return {stage: round(seconds - self.cumulative.get(self.inner.get(stage), 0), 4)
+                for stage, seconds in self.cumulative.items()}
+
+    def add_request(self, url, status, seconds, endpoints):
+        """
+        Add one HTTP request to its endpoint's latency histogram and counters.
+
+        Args:
+            url (str): Request URL.
+            status (int): HTTP status, or None if the request failed without a response.
+            seconds (float): Time the request took.
+            endpoints (dict): Endpoint name -> URL prefix; other URLs count as "other".
+        """
+        endpoint = next((name for name, prefix in endpoints.items() if url.startswith(prefix)), "other")
+        self.observe(f"http_{endpoint}_seconds", seconds)
+        self.count(f"http_{endpoint}_requests")
+        if status is None:
+            self.count(f"http_{endpoint}_errors")
+        elif status >= 400:
+            self.count(f"http_{endpoint}_status_{status}")
+
+    def report(self, status="completed", **extra):
+        """
+        Return the run report.
+
+        Args:
+            status (str): Outcome of the run, e.g. "completed", "failed" or "interrupted".
+            **extra: Further fields, e.g. the HTTP summary or file names.
+        Returns:
+            dict: Run times, stage seconds, counters, cache hit rates and histograms.
+        """
+        with self.lock:
+            counters = dict(sorted(self.counters.items()))
+            histograms = {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+        report = {
+            "status": status,
+            "started": datetime.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - self.clock, 4),
+            "stages": self.stage_seconds(),
+            "counters": counters,
+            "cache_hit_rates": hit_rates(counters),
+            "histograms": histograms
+        }
+        report.update(extra)
+        return report
+
+def hit_rates(counters):
+    """Return the hit rate of every cache with <cache>_hits or <cache>_misses counters."""
+    rates = {}
+    for name in counters:
+        for suffix in ("_hits", "_misses"):
+            if name.endswith(suffix):
+                cache = name[:-len(suffix)]
+                hits = counters.get(f"{cache}_hits", 0)
+                total = hits + counters.get(f"{cache}_misses", 0)
+                rates[cache] = round(hits / total, 4) if total else None
+    return rates
+
+def prometheus_text(report, prefix=metric_prefix):
+    """
+    Render a run report in the Prometheus text exposition format, e.g. for the node_exporter textfile collector.
+
+    Returns:
+        str: The metrics, one sample per line.
+    """
+    lines = [
+        f"# TYPE {prefix}_run_seconds gauge",
+        f"{prefix}_run_seconds {report['seconds']}",
+        f"# TYPE {prefix}_run_success gauge",
+        f"{prefix}_run_success {int(report['status'] == 'completed')}",
+        f"# TYPE {prefix}_run_started_timestamp_seconds gauge",
+        f"{prefix}_run_started_timestamp_seconds "
+        f"{int(datetime.datetime.fromisoformat(report['started']).timestamp())}",
+        f"# TYPE {prefix}_stage_seconds gauge"
+    ]
+    lines += [f'{prefix}_stage_seconds{{stage="{stage}"}} {seconds}' for stage, seconds in report["stages"].items()]
+    for name, value in report["counters"].items():
+        lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+    lines.append(f"# TYPE {prefix}_cache_hit_ratio gauge")
+    lines += [f'{prefix}_cache_hit_ratio{{cache="{cache}"}} {rate}'
+              for cache, rate in report["cache_hit_rates"].items() if rate is not None]
+    for name, histogram in report["histograms"].items():
+        lines.append(f"# TYPE {prefix}_{name} histogram")
+        lines += [f'{prefix}_{name}_bucket{{le="{bound}"}} {count}' for bound, count in histogram["buckets"].items()]
+        lines += [f"{prefix}_{name}_sum {histogram['sum']}", f"{prefix}_{name}_count {histogram['count']}"]
+    return "\n".join(lines) + "\n"
+
+def write_report(report, path):
+    """
+    Write a run report, atomically so a metrics collector never reads half a file.
+
+    Files ending in .prom get the Prometheus text format, other files JSON.
+    """
+    text = prometheus_text(report) if path.endswith(".prom") else json.dumps(report, indent=4) + "\n"
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(temporary, path)
+
+# Metrics of the current run, recorded by the stages of importOpenAlex
+metrics = RunMetrics()
@@ -0,0 +1,314 @@
+import gzip
+import io
+import json
+import os
+
+# zstd compression is optional
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# orjson decodes JSON several times faster; it is optional
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+
+# Fields of an OpenAlex work read by the converter, the classifier and the pipeline
+# (IDs, dates). A dict lists the fields kept of a nested object, or of each object
+# in a list; None keeps the whole value.
+work_fields = {
+    "id": None,
+    "doi": None,
+    "title": None,
+    "publication_year": None,
+    "language": None,
+    "updated_date": None,
+    "created_date": None,
+    "ids": {"openalex": None, "doi": None, "pmid": None},
+    "primary_location": {
+        "raw_type": None,
+        "is_oa": None,
+        "landing_page_url": None,
+        "host_organization_name": None,
+        "source": {"display_name": None, "issn_l": None, "host_organization_name": None}
+    },
+    "authorships": {
+        "author": {"id": None, "display_name": None, "orcid": None},
+        "institutions": {"id": None, "display_name": None, "country_code": None, "lineage": None}
+    },
+    "biblio": None,
+    "funders": {"id": None, "display_name": None},
+    "abstract_inverted_index": None
+}
+
+def select_fields(fields=work_fields):
+    """Return the value of the OpenAlex select parameter for a field projection, e.g. "id,doi,title,..."."""
+    return ",".join(fields)
+
+def project(value, fields=work_fields):
+    """
+    Keep only the listed fields of an OpenAlex object, recursively.
+
+    OpenAlex select only works on top-level fields; this also drops the nested
+    ones nobody reads, e.g. the raw affiliation strings of each authorship.
+
+    Args:
+        value: A work (dict), a list of objects, or a nested value.
+        fields (dict): Projection; see work_fields.
+    Returns:
+        The projected copy of value.
+    """
+    if isinstance(value, dict):
+        return {key: value[key] if fields[key] is None else project(value[key], fields[key])
+                for key in fields if key in value}
+    if isinstance(value, list):
+        return [project(item, fields) for item in value]
+    return value
+
+# Slim record model that transOA converts from. Each class keeps only the
+# fields build_mods reads, in __slots__, so an instance holds those attributes
+# instead of a dict per object. Like dict.get(field, default), a missing field
+# gets the default build_mods used to pass; null values are kept as None.
+
+class Source:
+    __slots__ = ("display_name", "issn_l")
+
+    def __init__(self, data):
+        self.display_name = data.get("display_name")
+        self.issn_l = data.get("issn_l")
+
+class Location:
+    __slots__ = ("raw_type", "is_oa", "landing_page_url", "host_organization_name", "source")
+
+    def __init__(self, data):
+        self.raw_type = data.get("raw_type", "")
+        self.is_oa = data.get("is_oa", False)
+        self.landing_page_url = data.get("landing_page_url", "")
+        self.host_organization_name = data.get("host_organization_name")
+        source = data.get("source")
+        self.source = Source(source) if source is not None else None
+
+class Institution:
+    __slots__ = ("id", "display_name", "country_code")
+
+    def __init__(self, data):
+        self.id = data.get("id")
+        self.display_name = data.get("display_name", "")
+        self.country_code = data.get("country_code", "")
+
+class Authorship:
+    __slots__ = ("display_name", "orcid", "institution_ids", "raw_institutions")
+
+    def __init__(self, data):
+        author = data.get("author", {})
+        self.display_name = author.get("display_name", "")
+        self.orcid = author.get("orcid")
+        self.raw_institutions = data.get("institutions", [])
+        self.institution_ids = tuple([institution.get("id") for institution in self.raw_institutions])
+
+    @property
+    def institutions(self):
+        """Institution objects, decoded on use: the converter mostly needs only institution_ids."""
+        return [Institution(institution) for institution in self.raw_institutions]
+
+class Work:
+    """
+    The fields of an OpenAlex work that build_mods reads, decoded from a (projected) work.
+
+    The pipeline keeps passing records as dicts (to the record store, the
+    caches, the classifier and the export index); only the conversion works
+    on this model.
+
+    Args:
+        data (dict): OpenAlex work.
+    """
+    __slots__ = ("title", "publication_year", "language", "doi", "pmid", "primary_location", "raw_authorships",
+                 "volume", "issue", "first_page", "last_page", "funders", "abstract_inverted_index")
+
+    def __init__(self, data):
+        self.title = data.get("title", "")
+        self.publication_year = data.get("publication_year", "")
+        self.language = data.get("language", "")
+        self.doi = data.get("doi", "")
+        self.pmid = data.get("ids", {}).get("pmid", "")
+        self.primary_location = Location(data.get("primary_location", {}))
+        self.raw_authorships = data.get("authorships", [])
+        biblio = data.get("biblio", {})
+        self.volume = biblio.get("volume", "")
+        self.issue = biblio.get("issue", "")
+        self.first_page = biblio.get("first_page", "")
+        self.last_page = biblio.get("last_page", "")
+        # Funder display names
+        self.funders = [funder.get("display_name", "") for funder in data.get("funders") or []]
+        self.abstract_inverted_index = data.get("abstract_inverted_index")
+
+    @property
+    def authorships(self):
+        """
+        Iterator over the Authorship objects, decoded one at a time.
+
+        A hyper-authored work never holds thousands of them at once, and each
+        is freed as soon as the converter moves on to the next.
+        """
+        return map(Authorship, self.raw_authorships)
+
+def open_text(path, mode="r"):
+    """
+    Open a text file, transparently (de)compressing .gz and .zst files.
+
+    Args:
+        path (str): File path; the extension selects the compression.
+        mode (str): "r", "w" or "a".
+    Returns:
+        file: Text file object using UTF-8.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("Reading or writing .zst files requires the zstandard package")
+        if mode == "r":
+            stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(open(path, mode + "b"), closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def is_json_lines(path):
+    """Return True if path names a JSON Lines file (.jsonl, optionally .gz/.zst compressed)."""
+    for suffix in (".gz", ".zst"):
+        if path.endswith(suffix):
+            path = path[:-len(suffix)]
+    return path.endswith(".jsonl")
+
+class RecordWriter:
+    """
+    Write records one at a time as they arrive, so a crash leaves every record written so far.
+
+    JSON Lines files (.jsonl, .jsonl.gz, .jsonl.zst) get one compact record per
+    line. Other files get the pretty-printed JSON array that json.dump(records,
+    file, indent=4) would produce.
+
+    offset is the size of an uncompressed file up to the end of the last
+    record written and flushed (None for compressed files): unlike the file
+    size, it never points into a record still being written.
+
+    Args:
+        path (str): Output file.
+        append (bool): Continue a file left unfinished by an interrupted run
+            (for arrays, one without the closing "]").
+    """
+    def __init__(self, path, append=False):
+        self.path = path
+        self.json_lines = is_json_lines(path)
+        # Records already in an appended array need a separator before the next one
+        self.continued = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open_text(path, "a" if append else "w")
+        self.count = 0
+        self.offset = None if is_compressed(path) else self.file.tell()
+
+    def write(self, record):
+        """Append one record and flush it to disk."""
+        if self.json_lines:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            text = json.dumps(record, indent=4).replace("\n", "\n    ")
+            first = self.count == 0 and not self.continued
+            self.file.write(("[\n    " if first else ",\n    ") + text)
+        self.count += 1
+        self.file.flush()
+        if self.offset is not None:
+            self.offset = self.file.tell()
+
+    def close(self):
+        """Finish the file; arrays are closed with "]"."""
+        if not self.json_lines:
+            self.file.write("\n]" if self.count or self.continued else "[]")
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def is_compressed(path):
+    """Return True if path names a .gz or .zst file."""
+    return path.endswith((".gz", ".zst"))
+
+def truncate_file(path, size):
+    """
+    Cut an uncompressed file back to size bytes, e.g. to the last checkpoint of an interrupted run.
+
+    Args:
+        path (str): File to truncate; created empty if missing.
+        size (int): New size in bytes.
+    """
+    with open(path, "ab") as file:
+        file.truncate(size)
+
+def iter_records(input_file, chunk_size=1 << 16):
+    """
+    Read JSON records one at a time from a JSON array file or a JSON Lines file.
+
+    Arrays are decoded incrementally, so only one record is held in memory.
+    Files ending in .gz or .zst are decompressed on the fly.
+
+    Args:
+        input_file (str): Path to a file holding a JSON array of records or one record per line.
+        chunk_size (int): Characters read from the file at a time.
+    Yields:
+        dict: One JSON record at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open_text(input_file) as file:
+        buffer = file.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            # JSON Lines: one record per non-empty line
+            for line in buffer_lines(buffer, file, chunk_size):
+                if line.strip():
+                    yield json_loads(line)
+            return
+
+        position = 1
+        eof = False
+        while True:
+            # Skip whitespace and separators between records
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            if position >= len(buffer) and eof:
+                # An array left unfinished by an interrupted run ends after its last complete record
+                return
+            try:
+                if position >= len(buffer):
+                    raise ValueError("Need more data")
+                record, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    raise
+                # The record continues past the buffer: read on and try again, growing
+                # the read size with the buffer so large records are not re-parsed too often
+                chunk = file.read(max(chunk_size, len(buffer) - position))
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield record
+            position = end
+
+def buffer_lines(buffer, file, chunk_size):
+    """Yield the lines of an already read buffer followed by the rest of the file."""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        yield from lines
+    yield from buffer.split("\n")
@@ -0,0 +1,232 @@
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+import requests
+
+import importOpenAlex
+import transOA
+from cacheOA import WorkCache, ClassificationCache, default_cache_file, default_classify_cache_file
+from classifyOA import LocalClassifier
+from httpOA import FetchEngine, default_rate, default_workers, default_retries, default_timeout
+from metricsOA import metrics, prometheus_text
+
+# Default address of the service; only local clients can reach it
+default_host = "127.0.0.1"
+default_port = 8070
+
+# Maximum OpenAlex IDs and DOIs converted in one request
+max_keys = 500
+
+class ConversionService:
+    """
+    Convert works to MODS on demand, keeping everything a run would set up in memory.
+
+    The FetchEngine (keep-alive session and rate limiter), the work and
+    classification caches, the genre mapping and the institution/country
+    tables of transOA are created once and shared by all requests, so a
+    request only pays for fetching and classifying its own works.
+
+    Args:
+        engine (FetchEngine): Engine for the OpenAlex and Swepub requests.
+        cache (WorkCache): Optional cache of works.
+        classify_cache (ClassificationCache): Optional cache of Swepub classifications.
+        classify (bool): Add Swepub classifications.
+        serializer (str): Name of the transOA serializer.
+    """
+    def __init__(self, engine, cache=None, classify_cache=None, classify=True,
+                 serializer=transOA.default_serializer):
+        self.engine = engine
+        self.cache = cache
+        self.classify_cache = classify_cache
+        self.classify = classify
+        self.serialize = transOA.serializers[serializer]
+        self.start_tag, self.end_tag, _ = transOA.collection_tags()
+        self.started = time.time()
+
+    def fetch(self, openalex_ids, dois):
+        """
+        Fetch works through the cache, in input order.
+
+        Returns:
+            tuple: (records, not_found) with the works found and the keys that returned no work.
+        """
+        if self.cache is not None:
+            results = importOpenAlex.iter_openalex_cached(openalex_ids, dois, self.cache, engine=self.engine)
+        else:
+            results = importOpenAlex.iter_openalex_batched(openalex_ids, dois, engine=self.engine)
+        records, not_found = [], []
+        for key, record in results:
+            if record is None:
+                not_found.append(key)
+            else:
+                records.append(record)
+        return records, not_found
+
+    def convert(self, openalex_ids=(), dois=()):
+        """
+        Fetch, convert and classify works.
+
+        Args:
+            openalex_ids (list): OpenAlex IDs to convert.
+            dois (list): DOIs to convert.
+        Returns:
+            tuple: (xml, count, not_found) with a complete <modsCollection> document (bytes),
+                the number of <mods> elements in it and the keys that returned no work.
+        """
+        start = time.perf_counter()
+        records, not_found = self.fetch(list(openalex_ids), list(dois))
+        pairs = ((record, importOpenAlex.convert_record(record)) for record in records)
+        if self.classify:
+            pairs = importOpenAlex.classify_stage(pairs, self.engine, self.classify_cache)
+        fragments = [self.serialize(mods) for _, mods in pairs]
+        metrics.count("serve_records", len(fragments))
+        metrics.count("works_not_found", len(not_found))
+        metrics.observe("serve_convert_seconds", time.perf_counter() - start)
+        return transOA.xml_declaration + self.start_tag + b"".join(fragments) + self.end_tag, len(fragments), not_found
+
+class ConvertHandler(BaseHTTPRequestHandler):
+    """
+    Local HTTP API of a ConversionService.
+
+    - POST /convert with a JSON body {"dois": [...], "openalex_ids": [...]}
+    - GET /convert?doi=...&id=... (both can be repeated)
+
+    return a MODS XML document holding the works found, in request order
+    (404 if none was found); keys without a work are listed in the
+    X-Not-Found header (URL-encoded). GET /health returns the service status as JSON and
+    GET /metrics its counters and latency histograms in the Prometheus text format.
+    """
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send_body(status, json.dumps({"error": message}).encode("utf-8"), "application/json")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/convert":
+            query = parse_qs(url.query)
+            return self.convert(query.get("id", []), query.get("doi", []))
+        if url.path == "/health":
+            status = {"status": "ok", "uptime_seconds": round(time.time() - self.service.started),
+                      "http": self.service.engine.summary()}
+            return self.send_body(200, json.dumps(status).encode("utf-8"), "application/json")
+        if url.path == "/metrics":
+            text = prometheus_text(metrics.report("running"))
+            return self.send_body(200, text.encode("utf-8"), "text/plain; version=0.0.4")
+        self.send_error_json(404, f"unknown path {url.path}")
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/convert":
+            return self.send_error_json(404, f"unknown path {self.path}")
+        usage = 'expected a JSON object {"dois": [...], "openalex_ids": [...]}'
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except ValueError:
+            return self.send_error_json(400, usage)
+        if not isinstance(body, dict):
+            return self.send_error_json(400, usage)
+        openalex_ids = body.get("openalex_ids", [])
+        dois = body.get("dois", [])
+        # A string would otherwise be taken as a list of one-character keys
+        if not isinstance(openalex_ids, list) or not isinstance(dois, list):
+            return self.send_error_json(400, usage)
+        self.convert(openalex_ids, dois)
+
+    def convert(self, openalex_ids, dois):
+        if not all(isinstance(key, str) for key in openalex_ids + dois):
+            return self.send_error_json(400, "OpenAlex IDs and DOIs must be strings")
+        if not openalex_ids and not dois:
+            return self.send_error_json(400, "give at least one DOI or OpenAlex ID")
+        if len(openalex_ids) + len(dois) > max_keys:
+            return self.send_error_json(413, f"at most {max_keys} DOIs and OpenAlex IDs per request")
+        metrics.count("serve_requests")
+        try:
+            xml, count, not_found = self.service.convert(openalex_ids, dois)
+        except requests.exceptions.RequestException as e:
+            metrics.count("serve_errors")
+            return self.send_error_json(502, f"OpenAlex request failed: {e}")
+        headers = {"X-Records": str(count)}
+        if not_found:
+            # Header values must be Latin-1 without line breaks; keys are sent URL-encoded
+            headers["X-Not-Found"] = ", ".join(quote(key, safe="/:;()<>.-_") for key in not_found)
+        self.send_body(200 if count else 404, xml, "application/xml; charset=utf-8", headers)
+
+def serve(service, host=default_host, port=default_port):
+    """
+    Serve a ConversionService over HTTP until interrupted; each request runs on its own thread.
+    """
+    handler = type("Handler", (ConvertHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"Serving MODS conversion on http://{host}:{server.server_address[1]}/convert")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for store in (service.cache, service.classify_cache):
+            if store is not None:
+                store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve OpenAlex to MODS conversion over a local HTTP API.")
+    parser.add_argument("--host", default=default_host, help="address to listen on (default: local only)")
+    parser.add_argument("--port", type=int, default=default_port, help="port to listen on")
+    parser.add_argument("--workers", type=int, default=default_workers,
+                        help="maximum HTTP requests to OpenAlex and Swepub in flight")
+    parser.add_argument("--rate", type=float, default=default_rate,
+                        help="maximum requests started per second (0 = unlimited)")
+    parser.add_argument("--retries", type=int, default=default_retries,
+                        help="extra attempts for requests failing with a network error, 429 or 5xx")
+    parser.add_argument("--timeout", type=float, default=default_timeout,
+                        help="seconds to wait for a connection or a response before retrying a request")
+    parser.add_argument("--cache", default=default_cache_file, help="SQLite file caching fetched works")
+    parser.add_argument("--classify-cache", default=default_classify_cache_file,
+                        help="SQLite file caching Swepub classifications")
+    parser.add_argument("--no-cache", action="store_true", help="always fetch from OpenAlex and Swepub")
+    parser.add_argument("--no-classify", action="store_true", help="do not add Swepub classifications")
+    parser.add_argument("--local-model", default=None,
+                        help="classify with this local model (trained with classifyOA.py) before asking Swepub")
+    parser.add_argument("--local-threshold", type=float, default=importOpenAlex.local_threshold,
+                        help="minimum confidence of the local model; below it Swepub is asked")
+    parser.add_argument("--genre-mapping", default=transOA.default_genre_mapping_file,
+                        help="JSON file with the raw_type -> genre rules")
+    parser.add_argument("--serializer", choices=sorted(transOA.serializers), default=transOA.default_serializer,
+                        help="how <mods> elements are serialized")
+    parser.add_argument("--api-url", default=importOpenAlex.openalex_api,
+                        help="OpenAlex works endpoint, e.g. a local stub for offline testing")
+    parser.add_argument("--classify-url", default=importOpenAlex.classify_api, help="Swepub Classify endpoint")
+    args = parser.parse_args()
+
+    importOpenAlex.openalex_api = args.api_url
+    importOpenAlex.classify_api = args.classify_url
+    if args.local_model:
+        importOpenAlex.local_classifier = LocalClassifier.load(args.local_model)
+        importOpenAlex.local_threshold = args.local_threshold
+    transOA.set_genre_mapping(transOA.load_genre_mapping(args.genre_mapping))
+
+    engine = FetchEngine(workers=args.workers, rate=args.rate, headers=importOpenAlex.openalex_headers,
+                         retries=args.retries, timeout=args.timeout,
+                         endpoints={"openalex": args.api_url, "classify": args.classify_url})
+    importOpenAlex.engine = engine
+    service = ConversionService(
+        engine,
+        cache=None if args.no_cache else WorkCache(args.cache),
+        classify_cache=None if args.no_cache else ClassificationCache(args.classify_cache),
+        classify=not args.no_classify,
+        serializer=args.serializer)
+    serve(service, args.host, args.port)
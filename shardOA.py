@@ -0,0 +1,310 @@
+import argparse
+import collections
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import sys
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+import transOA
+from recordsOA import iter_records
+
+# Tag of the <mods> elements in a parsed shard
+mods_tag = "{http://www.loc.gov/mods/v3}mods"
+
+def shard_file(output_file, number):
+    """Return the path of shard number (from 1) of an output file, e.g. "openalex251018_0001.xml"."""
+    base, extension = os.path.splitext(output_file)
+    return f"{base}_{number:04d}{extension or '.xml'}"
+
+def manifest_file(output_file):
+    """Return the path of the manifest of a sharded output file, e.g. "openalex251018.manifest.json"."""
+    return os.path.splitext(output_file)[0] + ".manifest.json"
+
+def short_id(record_id):
+    """Return the short form ("W123") of an OpenAlex work ID."""
+    return (record_id or "").replace("https://openalex.org/", "") or None
+
+class ShardWriter:
+    """
+    Write serialized <mods> elements to a series of complete <modsCollection> files.
+
+    A new shard is started when the current one holds max_records elements, or
+    when the next element would take it over max_bytes; a single element larger
+    than max_bytes gets a shard of its own. Each shard is a standalone MODS
+    document that can be imported and validated on its own.
+
+    Args:
+        output_file (str): Output file the shard names are derived from (see shard_file).
+        max_records (int): Maximum elements per shard (None for no limit).
+        max_bytes (int): Maximum size of a shard in bytes (None for no limit).
+        first_number (int): Number of the first shard written.
+    """
+    def __init__(self, output_file, max_records=None, max_bytes=None, first_number=1):
+        self.output_file = output_file
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.number = first_number
+        self.start_tag, self.end_tag, _ = transOA.collection_tags()
+        self.shards = []  # Manifest entries of the finished shards
+        self.file = None
+        self.count = 0
+
+    def write(self, fragment, record_id=None):
+        """
+        Write one element, rolling over to a new shard first if a limit would be exceeded.
+
+        Args:
+            fragment (bytes): UTF-8 encoded <mods> element.
+            record_id (str): OpenAlex ID of the record, for the manifest's ID ranges.
+        """
+        if self.file is not None and self.entry["records"] and (
+                (self.max_records and self.entry["records"] >= self.max_records) or
+                (self.max_bytes and self.size + len(fragment) + len(self.end_tag) > self.max_bytes)):
+            self.finish_shard()
+        if self.file is None:
+            self.start_shard()
+        self.add(fragment)
+        entry = self.entry
+        entry["records"] += 1
+        entry["first_id"] = entry["first_id"] or short_id(record_id)
+        entry["last_id"] = short_id(record_id)
+        self.count += 1
+
+    def add(self, data):
+        """Write bytes to the current shard, keeping its size and checksum."""
+        self.file.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+
+    def start_shard(self):
+        path = shard_file(self.output_file, self.number)
+        self.number += 1
+        self.file = open(path, "wb")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.entry = {"file": os.path.basename(path), "records": 0, "first_id": None, "last_id": None}
+        self.add(transOA.xml_declaration + self.start_tag)
+
+    def finish_shard(self):
+        self.add(self.end_tag)
+        self.file.close()
+        self.file = None
+        self.entry["bytes"] = self.size
+        self.entry["sha256"] = self.digest.hexdigest()
+        self.shards.append(self.entry)
+        print(f"XML shard saved to {shard_file(self.output_file, self.number - 1)}")
+
+    def close(self):
+        """Finish the current shard."""
+        if self.file is not None:
+            self.finish_shard()
+
+def write_manifest(output_file, shards, max_records=None, max_bytes=None):
+    """
+    Write the manifest of a sharded output file; it is replaced atomically.
+
+    Returns:
+        str: Path of the manifest.
+    """
+    path = manifest_file(output_file)
+    manifest = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "max_records": max_records,
+        "max_bytes": max_bytes,
+        "records": sum(shard["records"] for shard in shards),
+        "shards": shards
+    }
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(temporary, path)
+    print(f"Manifest of {len(shards)} shards saved to {path}")
+    return path
+
+def write_mods_shards(fragments, output_file, max_records=None, max_bytes=None):
+    """
+    Write serialized <mods> elements to size-bounded shards and a manifest.
+
+    Args:
+        fragments (iterable): (record ID, UTF-8 encoded <mods> element) tuples, in output order.
+        output_file (str): Output file the shard and manifest names are derived from.
+        max_records (int): Maximum elements per shard.
+        max_bytes (int): Maximum size of a shard in bytes.
+    Returns:
+        int: Number of elements written.
+    """
+    writer = ShardWriter(output_file, max_records, max_bytes)
+    try:
+        for record_id, fragment in fragments:
+            writer.write(fragment, record_id)
+    finally:
+        writer.close()
+    write_manifest(output_file, writer.shards, max_records, max_bytes)
+    transOA.report_unmatched()
+    return writer.count
+
+def convert_shard(json_records, output_file, number, serializer=transOA.default_serializer):
+    """
+    Convert records to one shard file (run in a worker process).
+
+    Returns:
+        tuple: (entry, unmatched, unknown) with the shard's manifest entry and the
+            raw_types and codes of its records that were not found in the tables.
+    """
+    serialize = transOA.serializers[serializer]
+    writer = ShardWriter(output_file, first_number=number)
+    for json_data in json_records:
+        writer.write(serialize(transOA.build_mods(json_data)), json_data.get("id"))
+    writer.close()
+    unmatched = collections.Counter(transOA.unmatched_raw_types)
+    unknown = collections.Counter(transOA.unknown_codes)
+    transOA.unmatched_raw_types.clear()
+    transOA.unknown_codes.clear()
+    return writer.shards[0], unmatched, unknown
+
+def json_to_xml_sharded(json_records, output_file, max_records=None, max_bytes=None, workers=0,
+                        serializer=transOA.default_serializer):
+    """
+    Convert JSON records to size-bounded MODS shards and a manifest.
+
+    With workers and only a record limit, every shard is converted and written
+    by its own worker process. With a byte limit, shard boundaries depend on
+    the sizes of the elements before them, so the records are converted on the
+    workers and the shards written in this process.
+
+    Args:
+        json_records (iterable): JSON records, e.g. from recordsOA.iter_records.
+        output_file (str): Output file the shard and manifest names are derived from.
+        max_records (int): Maximum records per shard.
+        max_bytes (int): Maximum size of a shard in bytes.
+        workers (int): Number of worker processes (0 = convert in this process).
+        serializer (str): Name of the transOA serializer.
+    Returns:
+        int: Number of records written.
+    """
+    if workers and max_records and not max_bytes:
+        return write_shards_parallel(json_records, output_file, max_records, workers, serializer)
+    if workers:
+        fragments = transOA.iter_fragments_parallel(json_records, workers, serializer=serializer)
+    else:
+        serialize = transOA.serializers[serializer]
+        fragments = ((json_data.get("id"), serialize(transOA.build_mods(json_data))) for json_data in json_records)
+    return write_mods_shards(fragments, output_file, max_records, max_bytes)
+
+def write_shards_parallel(json_records, output_file, max_records, workers, serializer=transOA.default_serializer):
+    """Write every shard of max_records records on its own worker process; see json_to_xml_sharded."""
+    records = iter(json_records)
+    shards = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=transOA.set_genre_mapping,
+                             initargs=((transOA.genre_rules, transOA.default_genre_rule),)) as pool:
+        pending = collections.deque()
+        number = 1
+        while True:
+            # At most two shards per worker are read ahead, which bounds memory
+            while len(pending) < 2 * workers:
+                chunk = list(itertools.islice(records, max_records))
+                if not chunk:
+                    break
+                pending.append(pool.submit(convert_shard, chunk, output_file, number, serializer))
+                number += 1
+            if not pending:
+                break
+            entry, unmatched, unknown = pending.popleft().result()
+            transOA.unmatched_raw_types.update(unmatched)
+            transOA.unknown_codes.update(unknown)
+            shards.append(entry)
+    write_manifest(output_file, shards, max_records)
+    transOA.report_unmatched()
+    return sum(shard["records"] for shard in shards)
+
+def validate_shard(path, entry):
+    """
+    Check one shard against its manifest entry: size, checksum, well-formedness and number of records.
+
+    The shard is parsed incrementally, so memory stays bounded by one record.
+
+    Returns:
+        list: Problems found; empty if the shard is valid.
+    """
+    if not os.path.exists(path):
+        return [f"{entry['file']}: missing"]
+    problems = []
+    if os.path.getsize(path) != entry["bytes"]:
+        problems.append(f"{entry['file']}: {os.path.getsize(path)} bytes, manifest says {entry['bytes']}")
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    if digest.hexdigest() != entry["sha256"]:
+        problems.append(f"{entry['file']}: checksum differs from the manifest")
+    records = 0
+    try:
+        for _, element in ET.iterparse(path):
+            if element.tag == mods_tag:
+                records += 1
+                element.clear()
+    except ET.ParseError as e:
+        return problems + [f"{entry['file']}: not well-formed XML: {e}"]
+    if records != entry["records"]:
+        problems.append(f"{entry['file']}: {records} records, manifest says {entry['records']}")
+    return problems
+
+def validate_manifest(path, workers=None):
+    """
+    Validate every shard listed in a manifest, several shards at a time.
+
+    Args:
+        path (str): Path of the manifest.
+        workers (int): Number of worker processes (defaults to the number of CPUs).
+    Returns:
+        list: Problems found; empty if all shards are valid.
+    """
+    with open(path, encoding="utf-8") as file:
+        manifest = json.load(file)
+    directory = os.path.dirname(os.path.abspath(path))
+    paths = [os.path.join(directory, entry["file"]) for entry in manifest["shards"]]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        problems = list(itertools.chain.from_iterable(pool.map(validate_shard, paths, manifest["shards"])))
+    if sum(entry["records"] for entry in manifest["shards"]) != manifest["records"]:
+        problems.append(f"Shards hold {sum(entry['records'] for entry in manifest['shards'])} records, "
+                        f"manifest says {manifest['records']}")
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write and validate sharded MODS exports.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="convert a record file to size-bounded shards and a manifest")
+    convert.add_argument("input_file", help="JSON array or JSON Lines file (optionally .gz/.zst)")
+    convert.add_argument("output_file", help="output file the shard names are derived from, e.g. openalex.xml")
+    convert.add_argument("--shard-records", type=int, default=None, help="maximum records per shard")
+    convert.add_argument("--shard-mb", type=float, default=None, help="maximum shard size in MB")
+    convert.add_argument("--workers", type=int, default=0,
+                         help="convert on N worker processes (0 = convert in this process)")
+    convert.add_argument("--serializer", choices=sorted(transOA.serializers), default=transOA.default_serializer,
+                         help="how <mods> elements are serialized")
+    convert.add_argument("--genre-mapping", default=transOA.default_genre_mapping_file,
+                         help="JSON file with the raw_type -> genre rules")
+    validate = commands.add_parser("validate", help="check every shard listed in a manifest")
+    validate.add_argument("manifest", help="manifest file written with the shards")
+    validate.add_argument("--workers", type=int, default=None, help="shards validated at once (default: CPUs)")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        if not args.shard_records and not args.shard_mb:
+            parser.error("convert needs --shard-records and/or --shard-mb")
+        transOA.set_genre_mapping(transOA.load_genre_mapping(args.genre_mapping))
+        max_bytes = int(args.shard_mb * 1024 * 1024) if args.shard_mb else None
+        json_to_xml_sharded(iter_records(args.input_file), args.output_file, args.shard_records, max_bytes,
+                            args.workers, args.serializer)
+        sys.exit(0)
+
+    problems = validate_manifest(args.manifest, args.workers)
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+    print(f"All shards in {args.manifest} are valid")
@@ -0,0 +1,232 @@
+import argparse
+import collections
+import glob
+import gzip
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from recordsOA import RecordWriter, iter_records, json_loads, project, work_fields
+
+# Partition directories of the works snapshot, e.g. works/updated_date=2025-06-01/part_000.gz
+partition_pattern = re.compile(r"updated_date=(\d{4}-\d{2}-\d{2})")
+
+# OpenAlex work IDs and DOIs as they appear in the raw JSON lines
+work_id_pattern = re.compile(rb"openalex\.org/(W\d+)\"")
+doi_pattern = re.compile(rb"doi\.org/([^\"]+)\"")
+
+def find_partitions(snapshot_dir, since=None):
+    """
+    Return the works partition files of an OpenAlex snapshot, newest partition first.
+
+    Args:
+        snapshot_dir (str): Snapshot root (holding data/works or works) or its works directory.
+        since (str): Only partitions with updated_date on or after this date (YYYY-MM-DD).
+    Returns:
+        list: (updated_date, path) tuples.
+    """
+    for works_dir in (os.path.join(snapshot_dir, "data", "works"), os.path.join(snapshot_dir, "works"), snapshot_dir):
+        paths = glob.glob(os.path.join(works_dir, "updated_date=*", "*.gz"))
+        if paths:
+            break
+    partitions = []
+    for path in paths:
+        updated_date = partition_pattern.search(path).group(1)
+        if since is None or updated_date >= since[:10]:
+            partitions.append((updated_date, path))
+    # Newest first, so the latest copy of a work that moved between partitions is the one kept
+    partitions.sort(key=lambda partition: (partition[0], partition[1]), reverse=True)
+    return partitions
+
+class SnapshotFilter:
+    """
+    Select works of a snapshot by institution, OpenAlex ID or DOI.
+
+    Every line first goes through a cheap byte-level check, so only candidate
+    lines are parsed as JSON; the parsed work is then checked exactly.
+
+    Args:
+        institution_ids (list): Institution IDs; works with an authorship at one of them
+            or a child institution (authorships.institutions.lineage) match.
+        openalex_ids (list): Work IDs (e.g., "W123" or "https://openalex.org/W123").
+        dois (list): DOIs, with or without "https://doi.org/".
+    """
+    def __init__(self, institution_ids=(), openalex_ids=(), dois=()):
+        self.institutions = {short_id(i) for i in institution_ids}
+        self.institution_tokens = [f"openalex.org/{i}\"".encode("ascii") for i in self.institutions]
+        self.work_ids = {short_id(i) for i in openalex_ids}
+        self.dois = {bare_doi(doi) for doi in dois}
+
+    def candidate(self, line):
+        """Return True if a raw JSON line may hold a wanted work."""
+        if any(token in line for token in self.institution_tokens):
+            return True
+        if self.work_ids and any(match.decode("ascii") in self.work_ids for match in work_id_pattern.findall(line)):
+            return True
+        if self.dois and b"doi.org/" in line:
+            return any(match.decode("utf-8", "replace").lower() in self.dois for match in doi_pattern.findall(line))
+        return False
+
+    def matches(self, work):
+        """Return True if a parsed work is wanted."""
+        if short_id(work.get("id")) in self.work_ids or bare_doi(work.get("doi")) in self.dois:
+            return True
+        for authorship in work.get("authorships") or []:
+            for institution in authorship.get("institutions") or []:
+                lineage = institution.get("lineage") or [institution.get("id")]
+                if any(short_id(i) in self.institutions for i in lineage):
+                    return True
+        return False
+
+def short_id(openalex_id):
+    """Return the upper-cased short form ("W123", "I123") of an OpenAlex ID."""
+    return (openalex_id or "").strip().replace("https://openalex.org/", "").upper()
+
+def bare_doi(doi):
+    """Return a lower-cased DOI without "https://doi.org/"."""
+    doi = (doi or "").strip().lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "doi:"):
+        if doi.startswith(prefix):
+            return doi[len(prefix):]
+    return doi
+
+def scan_partition(path, snapshot_filter, fields=None):
+    """
+    Return the wanted works of one partition file (run in a worker process).
+
+    Works are projected to fields here, so only the slim records are sent
+    back to the parent process.
+
+    Returns:
+        tuple: (works, lines, candidates) with the matched works in file order,
+            the number of lines read and the number of lines parsed.
+    """
+    works = []
+    lines = candidates = 0
+    with gzip.open(path, "rb") as file:
+        for line in file:
+            lines += 1
+            if not snapshot_filter.candidate(line):
+                continue
+            candidates += 1
+            work = json_loads(line)
+            if snapshot_filter.matches(work):
+                works.append(project(work, fields) if fields else work)
+    return works, lines, candidates
+
+def iter_snapshot(snapshot_dir, snapshot_filter, since=None, workers=None, skip_ids=(), fields=None):
+    """
+    Scan the partitions of a works snapshot in parallel and yield the wanted works.
+
+    Partitions are scanned by a pool of worker processes, at most two per
+    worker ahead, and their works are yielded newest partition first, in a
+    deterministic order. A work found in several partitions is yielded once,
+    from the newest.
+
+    Args:
+        snapshot_dir (str): Snapshot directory; see find_partitions.
+        snapshot_filter (SnapshotFilter): Which works to yield.
+        since (str): Only scan partitions with updated_date on or after this date.
+        workers (int): Number of worker processes (defaults to the number of CPUs).
+        skip_ids (iterable): Short IDs of works not to yield, e.g. those of an interrupted run.
+        fields (dict): Projection of the works (see recordsOA.work_fields); None yields full works.
+    Yields:
+        dict: One OpenAlex work at a time.
+    """
+    partitions = find_partitions(snapshot_dir, since)
+    if not partitions:
+        print(f"No works partitions found in {snapshot_dir}")
+        return
+    workers = workers or os.cpu_count() or 1
+    seen = set(skip_ids)
+    totals = collections.Counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        partitions = iter(partitions)
+        while True:
+            while len(pending) < 2 * workers:
+                partition = next(partitions, None)
+                if partition is None:
+                    break
+                pending.append(pool.submit(scan_partition, partition[1], snapshot_filter, fields))
+            if not pending:
+                break
+            works, lines, candidates = pending.popleft().result()
+            totals.update(partitions=1, lines=lines, candidates=candidates)
+            for work in works:
+                work_id = short_id(work.get("id"))
+                if work_id in seen:
+                    continue
+                seen.add(work_id)
+                totals["works"] += 1
+                yield work
+    print(f"Scanned {totals['lines']} works in {totals['partitions']} partitions: "
+          f"{totals['candidates']} parsed, {totals['works']} matched")
+
+def snapshot_stage(snapshot_dir, snapshot_filter, records_file=None, since=None, workers=None, resume=False,
+                   fields=None, checkpoint=None):
+    """
+    Pipeline stage reading works from a local snapshot instead of the OpenAlex API.
+
+    Records are yielded as found and, if records_file is given, appended to it.
+    With resume, the records already in records_file are yielded first and
+    skipped in the scan.
+
+    Args:
+        snapshot_dir (str): Snapshot directory; see find_partitions.
+        snapshot_filter (SnapshotFilter): Which works to read.
+        records_file (str): Optional record store (.jsonl, .jsonl.gz, .jsonl.zst or .json).
+        since (str): Only scan partitions with updated_date on or after this date.
+        workers (int): Number of worker processes scanning partitions.
+        resume (bool): Continue the records_file of an interrupted run.
+        fields (dict): Projection of the works (see recordsOA.work_fields); None yields full works.
+        checkpoint (RunCheckpoint): Optional checkpoint told the record store offset after each record.
+    Yields:
+        dict: One OpenAlex work at a time.
+    """
+    done = set()
+    if resume:
+        for record in iter_records(records_file):
+            done.add(short_id(record.get("id")))
+            yield record
+
+    writer = RecordWriter(records_file, append=resume) if records_file else None
+    try:
+        for record in iter_snapshot(snapshot_dir, snapshot_filter, since, workers, done, fields):
+            if writer:
+                writer.write(record)
+                if checkpoint is not None:
+                    checkpoint.stored(writer.offset)
+            yield record
+    finally:
+        if writer:
+            writer.close()
+
+def read_keys(path):
+    """Read one ID or DOI per line from a file, skipping empty lines and # comments."""
+    with open(path, encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith("#")]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract works from a local OpenAlex works snapshot.")
+    parser.add_argument("snapshot", help="snapshot directory (holding data/works/updated_date=.../part_*.gz)")
+    parser.add_argument("output_file", help="record store to write (.jsonl, .jsonl.gz, .jsonl.zst or .json)")
+    parser.add_argument("--institution", action="append", default=[],
+                        help="select works of this institution ID or its child institutions (can be repeated)")
+    parser.add_argument("--doi-file", help="file with one DOI per line to select")
+    parser.add_argument("--id-file", help="file with one OpenAlex work ID per line to select")
+    parser.add_argument("--since", default=None, help="only scan partitions updated on or after YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=None, help="partitions scanned at once (default: CPUs)")
+    parser.add_argument("--full-records", action="store_true",
+                        help="keep complete works instead of only the fields used for MODS and classification")
+    args = parser.parse_args()
+
+    snapshot_filter = SnapshotFilter(args.institution, read_keys(args.id_file) if args.id_file else (),
+                                     read_keys(args.doi_file) if args.doi_file else ())
+    if not (snapshot_filter.institutions or snapshot_filter.work_ids or snapshot_filter.dois):
+        parser.error("give --institution, --doi-file or --id-file")
+    fields = None if args.full_records else work_fields
+    for _ in snapshot_stage(args.snapshot, snapshot_filter, args.output_file, args.since, args.workers,
+                            fields=fields):
+        pass
+    print(f"Records saved to {args.output_file}")
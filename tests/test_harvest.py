@@ -0,0 +1,94 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import importOpenAlex
+from benchOA import StubHandler
+from harvestOA import HarvestState, harvest_key
+from httpOA import FetchEngine
+
+def work(number, updated_date, institution="I1", lineage=("I1", "I100")):
+    """Return a work with one author at an institution, last updated on updated_date."""
+    return {
+        "id": f"https://openalex.org/W{number}",
+        "doi": f"https://doi.org/10.9999/harvest.{number}",
+        "title": f"Harvested work {number}",
+        "updated_date": updated_date,
+        "created_date": "2024-01-01",
+        "authorships": [{
+            "author": {"display_name": f"Author {number}"},
+            "institutions": [{"id": f"https://openalex.org/{institution}", "display_name": "Test University",
+                              "country_code": "SE", "lineage": [f"https://openalex.org/{i}" for i in lineage]}]
+        }]
+    }
+
+@pytest.fixture
+def api(monkeypatch):
+    """Serve works from the benchOA stub in this process; yields a function replacing the served works."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    # Small pages, so a harvest follows the cursor
+    monkeypatch.setattr(StubHandler, "max_per_page", 2)
+    monkeypatch.setattr(importOpenAlex, "openalex_api", f"http://127.0.0.1:{server.server_address[1]}/works")
+    monkeypatch.setattr(importOpenAlex, "openalex_api_key", None)
+    yield StubHandler.load
+    server.shutdown()
+    server.server_close()
+    StubHandler.load([])
+
+def harvest(state, **kwargs):
+    engine = FetchEngine(workers=1, rate=0, retries=0, endpoints={"openalex": importOpenAlex.openalex_api})
+    records = importOpenAlex.harvest_stage(["I100"], state, engine=engine, **kwargs)
+    return sorted(importOpenAlex.normalize_openalex_id(record["id"]) for record in records)
+
+def test_stub_filters_by_lineage_and_date(api):
+    api([work(1, "2025-01-01T10:00:00"), work(2, "2025-02-01T10:00:00", institution="I2", lineage=("I2",)),
+         work(3, "2025-03-01T10:00:00", institution="I3", lineage=("I3", "I100"))])
+    engine = FetchEngine(workers=1, rate=0, retries=0)
+    assert [record["id"][-2:] for record in importOpenAlex.iter_openalex_changed(["I100"], engine=engine)] == ["W1", "W3"]
+    assert [record["id"][-2:] for record in importOpenAlex.iter_openalex_changed(
+        ["https://openalex.org/I100"], "2025-02-15", engine=engine)] == ["W3"]
+
+def test_incremental_harvest(api, tmp_path):
+    path = str(tmp_path / "harvest_state.json")
+    key = harvest_key(["I100"], "updated")
+    works = [work(1, "2025-01-01T10:00:00"), work(2, "2025-01-02T09:00:00"), work(3, "2025-01-02T12:00:00"),
+             work(4, "2025-01-02T12:00:00", institution="I5", lineage=("I5",)), work(5, "2024-12-01T00:00:00")]
+    api(works)
+
+    # First run: all works of the institution and its children, paged through the cursor
+    state = HarvestState(path)
+    assert harvest(state) == ["W1", "W2", "W3", "W5"]
+    # The high-water mark only moves with commit()
+    assert state.watermark(key) is None
+    assert HarvestState(path).watermark(key) is None
+    state.commit()
+    assert HarvestState(path).watermark(key) == "2025-01-02T12:00:00"
+
+    # Nothing changed: the works of the high-water day come back from the API but are skipped
+    assert harvest(HarvestState(path)) == []
+
+    # Second run: only the changed and the new work
+    works[0]["updated_date"] = "2025-01-03T08:00:00"
+    works.append(work(6, "2025-01-04T08:00:00"))
+    api(works)
+    state = HarvestState(path)
+    assert harvest(state) == ["W1", "W6"]
+    assert HarvestState(path).watermark(key) == "2025-01-02T12:00:00"
+    state.commit()
+    assert HarvestState(path).watermark(key) == "2025-01-04T08:00:00"
+    assert harvest(HarvestState(path)) == []
+
+def test_uncommitted_harvest_is_repeated(api, tmp_path):
+    path = str(tmp_path / "harvest_state.json")
+    api([work(1, "2025-01-01T10:00:00")])
+    state = HarvestState(path)
+    assert harvest(state) == ["W1"]
+    state.commit()
+
+    api([work(1, "2025-01-05T10:00:00")])
+    # A run that fails before commit() leaves the mark, so the next run harvests the change again
+    assert harvest(HarvestState(path)) == ["W1"]
+    assert harvest(HarvestState(path)) == ["W1"]
@@ -0,0 +1,84 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import transOA
+
+def work(index, title, authors, abstract=None, **fields):
+    """Return a minimal OpenAlex work; fields override or extend it."""
+    record = {
+        "id": f"https://openalex.org/W{index}",
+        "doi": f"https://doi.org/10.9999/test.{index}",
+        "title": title,
+        "publication_year": 2024,
+        "language": "en",
+        "ids": {"openalex": f"https://openalex.org/W{index}", "pmid": f"https://pubmed.ncbi.nlm.nih.gov/{index}"},
+        "primary_location": {
+            "raw_type": "journal-article",
+            "is_oa": True,
+            "landing_page_url": f"https://example.org/article?id={index}&format=full",
+            "source": {"display_name": "Journal of Tests & <Markup>", "issn_l": "1234-5678"}
+        },
+        "authorships": [
+            {
+                "author": {"display_name": name, "orcid": f"https://orcid.org/0000-0002-0000-000{number}"},
+                "institutions": [{"id": f"https://openalex.org/I{number}", "display_name": institution,
+                                  "country_code": country}]
+            }
+            for number, (name, institution, country) in enumerate(authors)
+        ],
+        "biblio": {"volume": "12", "issue": "3", "first_page": "100", "last_page": "110"},
+        "funders": [{"display_name": "Vetenskapsrådet"}]
+    }
+    if abstract is not None:
+        record["abstract_inverted_index"] = {}
+        for position, word in enumerate(abstract.split(" ")):
+            record["abstract_inverted_index"].setdefault(word, []).append(position)
+    record.update(fields)
+    return record
+
+records = [
+    # Markup characters in text and attribute values
+    work(1, 'Fish & chips: "quoted" <b>bold</b> and \'apostrophes\' > 0',
+         [("Anna O'Brien & Co", "Lund <University>", "SE")],
+         abstract='We show that a < b && b > c, with "quotes" & \'apostrophes\'.'),
+    # Non-ASCII text: diacritics, scripts outside Latin-1 and characters outside the BMP
+    work(2, "Élan vital: Ångström-skala för åäö, 日本語のタイトル and emoji 🧪",
+         [("José Álvarez-Núñez", "Universidad Autónoma de Madrid", "ES"),
+          ("Ørjan Ødegård", "Norges teknisk-naturvitenskapelige universitet", "NO"),
+          ("山田 太郎", "東京大学", "JP")],
+         abstract="Résumé des résultats: naïve Bayes över korpusar, 数据 and “typographic quotes” — dash"),
+    # Whitespace in text: tabs, line breaks and carriage returns
+    work(3, "Line\nbreaks\tand\r\ncarriage returns", [("Per Svensson", "Örebro universitet", "SE")],
+         abstract="First line\nsecond\tline"),
+    # No abstract, authors without institutions or ORCID, empty fields
+    work(4, "Minimal", [], primary_location={"raw_type": "book-chapter", "is_oa": False}, funders=[]),
+]
+
+def build_elements():
+    elements = [transOA.build_mods(record) for record in records]
+    for mods, code in zip(elements, ["10205", "30220", "50201", None]):
+        if code is not None:
+            transOA.add_subject(mods, code)
+    return elements
+
+@pytest.mark.parametrize("serializer", [name for name in sorted(transOA.serializers) if name != "etree"])
+def test_serializer_matches_etree_after_c14n(serializer, tmp_path):
+    elements = build_elements()
+    reference_file = tmp_path / "etree.xml"
+    output_file = tmp_path / f"{serializer}.xml"
+    transOA.write_mods_stream(elements, str(reference_file), serializer="etree")
+    transOA.write_mods_stream(elements, str(output_file), serializer=serializer)
+
+    assert ET.canonicalize(from_file=str(output_file)) == ET.canonicalize(from_file=str(reference_file))
+
+def test_documents_cover_the_tricky_content(tmp_path):
+    # Guard against the records above losing what they are meant to exercise
+    output_file = tmp_path / "direct.xml"
+    transOA.write_mods_stream(build_elements(), str(output_file), serializer="direct")
+    root = ET.parse(output_file).getroot()
+    text = ET.tostring(root, encoding="unicode")
+    assert "&amp;" in text and "&lt;" in text
+    assert "日本語" in text and "🧪" in text
+    assert any(element.tag.endswith("abstract") for element in root.iter())
+    assert any(element.tag.endswith("subject") for element in root.iter())
@@ -2,464 +2,784 @@ import json
 import xml.etree.ElementTree as ET
 import sys
 import datetime
+import argparse
+import collections
+import itertools
+import functools
+import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from recordsOA import iter_records, Work
+from isoOA import language_codes, country_names
+
+# Default genre mapping file, next to this script
+default_genre_mapping_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "genre_mapping.json")
+
+def normalize_raw_type(raw_type):
+    """Normalize a primary_location raw_type for genre lookup (trimmed, case-folded)."""
+    return (raw_type or "").strip().casefold()
+
+def load_genre_mapping(mapping_file=default_genre_mapping_file):
+    """
+    Load the raw_type -> genre rules from a JSON mapping file.
 
-def json_to_xml(json_data_list, output_file):
+    Each rule lists raw_types and the genre elements to add; "role" (default "aut")
+    is the marcrelator role of the names and "epub_ahead_of_print" marks journal
+    types that get an "Epub ahead of print" note when volume and issue are missing.
+    If a raw_type is listed by several rules, the first one wins.
+
+    Args:
+        mapping_file (str): Path to the JSON mapping file.
+    Returns:
+        tuple: (rules, default_rule) where rules maps normalized raw_type -> rule.
     """
-    Convert a list of JSON records to a single XML file with a <modsCollection> root.
+    with open(mapping_file, "r", encoding="utf-8") as file:
+        mapping = json.load(file)
+
+    def compile_rule(rule):
+        # Prebuild (attributes, text) pairs so build_mods only creates the elements
+        genres = tuple(({key: value for key, value in genre.items() if key != "text"}, genre["text"])
+                       for genre in rule["genres"])
+        return {
+            "genres": genres,
+            "role": rule.get("role", "aut"),
+            "epub_ahead_of_print": rule.get("epub_ahead_of_print", False)
+        }
+
+    rules = {}
+    for rule in mapping["rules"]:
+        compiled = compile_rule(rule)
+        for raw_type in rule["raw_types"]:
+            rules.setdefault(normalize_raw_type(raw_type), compiled)
+    return rules, compile_rule(mapping["default"])
+
+def set_genre_mapping(mapping):
+    """
+    Replace the genre rules used by build_mods.
 
     Args:
-        json_data_list (list): List of JSON records to convert.
-        output_file (str): The path to the output XML file.
+        mapping (tuple): (rules, default_rule) as returned by load_genre_mapping.
     """
-   # Define namespaces
-    namespaces = {
-        "": "http://www.loc.gov/mods/v3",  # Default namespace
-        "xlink": "http://www.w3.org/1999/xlink",  # xlink namespace
-        "xsi": "http://www.w3.org/2001/XMLSchema-instance"  # xsi namespace
-    }
-    for prefix, uri in namespaces.items():
-        ET.register_namespace(prefix, uri)  # Register namespaces
+    global genre_rules, default_genre_rule
+    genre_rules, default_genre_rule = mapping
 
-        # Create the <modsCollection> element with the default namespace
-    mods_collection = ET.Element("modsCollection", {
-            "xmlns": namespaces[""],  # Default namespace
-            "xmlns:xlink": namespaces["xlink"],  # xlink namespace
-            "xmlns:xsi": namespaces["xsi"]  # xsi namespace
-        })
-
-    # Define a mapping from ISO 639-1 (two-letter) to ISO 639-2/B (three-letter) language codes
-    language_code_mapping = {
-        "en": "eng",
-        "sv": "swe",
-        "da": "dan",
-        "de": "ger",
-        "fr": "fre",
-        "es": "spa",
-        "it": "ita",
-        "zh": "chi",
-        "ru": "rus",
-        "ja": "jpn",
-        "no": "nor",
-        "nl": "dut",
-        "pt": "por",
-        "fi": "fin",
-        # Add more mappings as needed
-    }
-
-    # Mapping of ISO 3166-1 alpha-2 country codes to country names
-    country_code_mapping = {
-        "US": "United States",
-        "SE": "Sweden",
-        "GB": "United Kingdom",
-        "DE": "Germany",
-        "FR": "France",
-        "IT": "Italy",
-        "ES": "Spain",
-        "CN": "China",
-        "JP": "Japan",
-        "IN": "India",
-        "BR": "Brazil",
-        "RU": "Russia",
-        "ZA": "South Africa",
-        "DK": "Denmark",
-        "NO": "Norway",
-        "FI": "Finland",
-        "NL": "Netherlands",
-        "PT": "Portugal",
-        "AU": "Australia",
-        "CA": "Canada",
-        "KR": "South Korea",
-        "MX": "Mexico",
-        "TR": "Turkey",
-        "PL": "Poland",
-        "BE": "Belgium",
-        "AT": "Austria",
-        "CH": "Switzerland",
-        "IE": "Ireland",
-        "NZ": "New Zealand",
-        "HR": "Croatia",
-        "CZ": "Czech Republic",
-        "HU": "Hungary",
-        "CL": "Chile",
-        "JO": "Jordan",
-        "UA": "Ukraine",
-        "GR": "Greece",
-        "EE": "Estonia",
-        "SA": "Saudi Arabia",
-        "MY": "Malaysia",
-        "ET": "Ethiopia",
-        "SG": "Singapore",
-        "BD": "Bangladesh",
-        "IR": "Iran",
-        "HK": "Hong Kong",
-        "SZ": "Swaziland",
-        "TW": "Taiwan",
-        "PH": "Philippines",
-        "LV": "Latvia",
-        "LS": "Lesotho",
-        "AR": "Argentina",
-        "TH": "Thailand",
-        "SK": "Slovakia",
-        "GE": "Georgia",
-        "RO": "Romania",
-        "BG": "Bulgaria",
-        "SI": "Slovenia",
-        "KH": "Cambodia",
-        "VN": "Vietnam",
-        # Add more mappings as needed
-    }
+# Genre rules, loaded once at import
+genre_rules, default_genre_rule = load_genre_mapping()
 
-    # Iterate over each JSON record and create a <mods> element for each
-    for json_data in json_data_list:
-        mods = ET.SubElement(mods_collection, "mods", {
-            "version": "3.7",
-            "xsi:schemaLocation": "http://www.loc.gov/mods/v3 http://www.loc.gov/standards/mods/v3/mods-3-7.xsd",
-        })
-
-        # Add genre elements based on primary_location raw_type
-        primary_location = json_data.get("primary_location", {})
-        primary_location_raw_type = primary_location.get("raw_type", "")
-
-        if primary_location_raw_type in ["proceedings-article", "Conference papers", "conference paper", "Conference Proceeding", "Conference Paper, peer reviewed","contributiontobookanthology/conference","contributiontoconference/paper","info:eu-repo/semantics/conferencePaper","InProceedings","Paper in proceeding", "PAPER", "Peer-reviewed Paper" ]:
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "refereed"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "conferencePaper"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Conference paper"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "proceeding"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationSubTypeCode"}).text = "publishedPaper"
-        elif primary_location_raw_type == "Conference Paper, other":
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "science"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "conferencePaper"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Conference paper"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "proceeding"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationSubTypeCode"}).text = "publishedPaper"
-        elif primary_location_raw_type in ["Conference Meeting Abstract", "contributiontoconference/abstract"]:
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "science"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "conferencePaper"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Conference paper"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "proceeding"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationSubTypeCode"}).text = "publishedPaper"          
-        elif primary_location_raw_type in ["journal-article", "article-journal", "Article in journal", "Article, other", "Article, other scientific","Article, peer reviewed scientific","contributiontojournal/article","contributiontoperiodical/newspaperarticle","contributionToPeriodical","info:eu-repo/semantics/article","journal article","Journal Item","journalArticle"]:
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "refereed"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "article"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Article in journal"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "article"
-        elif primary_location_raw_type in ["Article, review","Article, review peer-reviewed scientific"]:
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "refereed"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "review" 
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Article, review/survey"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "article"
-        elif primary_location_raw_type == "Conference Abstract":
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "science"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "article"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Article in journal"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "article"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationSubTypeCode"}).text = "meetingAbstract"
-        elif primary_location_raw_type == "contributiontoperiodical/newspaperarticle":
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "other"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "article"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Article in journal"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "article"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationSubTypeCode"}).text = "newsItem"
-        elif primary_location_raw_type == "Article, book review":
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "science"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "bookReview"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Article, book review"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "article"
-        elif primary_location_raw_type in ["book-chapter", "book-part", "book sections", "contributiontoeditedbook/bookchapter","contributionToEditedBook","Book Section","bookChapter","chapter in raport","contributiontobookanthology/chapter"]:
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "science"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "chapter"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Chapter in book"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "bookitem"
-        elif primary_location_raw_type in ["book", "monograph", "book-set","Buch / Monografie","Hochschulschrift","info:eu-repo/semantics/book"]:
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "science"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "book"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Book"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "book"
-        elif primary_location_raw_type in ["report","bookanthology/report","Reports","info:eu-repo/semantics/report"]:
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "science"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "report"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Report"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "book"
-        elif primary_location_raw_type in ["edited-book","bookanthology/book","Aufsatzsammlung"]:
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "science"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "collection"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Collection (editor)"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "book"
-        elif primary_location_raw_type == "posted-content":
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "science"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "manuscript"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Manuscript (preprint)"
-            ET.SubElement(mods, "genre", {"authority": "kev", "type": "publicationType", "lang": "eng"}).text = "preprint"
-        else:
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "contentTypeCode"}).text = "science"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationTypeCode"}).text = "vet"
-            ET.SubElement(mods, "genre", {"authority": "diva", "type": "publicationType", "lang": "eng"}).text = "Other"
+# raw_types that matched no rule and fell through to the default genre ("vet"), with counts
+unmatched_raw_types = collections.Counter()
 
-        # Add author information with duplicate handling (preserve order, keep conflicts)
-        authorships = json_data.get("authorships", [])
-        
-        # Track the first instance of each author to check for conflicts
-        seen_authors = {}  # display_name -> first instance data
-        
-        for authorship in authorships:
-            author = authorship.get("author", {})
-            institutions = authorship.get("institutions", [])
-            display_name = author.get("display_name", "")
-            orcid = author.get("orcid", None)
-            
-            # Create affiliation string
-            affiliations = []
-            for institution in institutions:
-                inst_display_name = institution.get("display_name", "")
-                country_code = institution.get("country_code", "")
-                country_name = country_code_mapping.get(country_code)
-                
-                if not country_name:
-                    print(f"Error: Country code '{country_code}' not found in country_code_mapping.")
-                    country_name = country_code
-                
-                if inst_display_name:
-                    affiliations.append(f"{inst_display_name}, {country_name}")
-            
-            affiliation_str = "; ".join(affiliations)
-            current_author_data = {
-                'orcid': orcid,
-                'affiliation': affiliation_str,
-                'institutions': institutions
-            }
-            
-            # Check if we've seen this author before
-            if display_name in seen_authors:
-                # Check for conflicts with the first instance
-                first_instance = seen_authors[display_name]
-                has_orcid_conflict = (first_instance['orcid'] != current_author_data['orcid']) and (first_instance['orcid'] and current_author_data['orcid'])
-                has_affiliation_conflict = (first_instance['affiliation'] != current_author_data['affiliation']) and (first_instance['affiliation'] and current_author_data['affiliation'])
-                
-                # If there are conflicts, add this as a separate author entry
-                if has_orcid_conflict or has_affiliation_conflict:
-                    # Create XML for this conflicting author
-                    name_parts = display_name.split()
-                    family_name = name_parts[-1] if name_parts else ""
-                    given_name = " ".join(name_parts[:-1]) if len(name_parts) > 1 else ""
-
-                    name_elem = ET.SubElement(mods, "name", {"type": "personal"})
-                    ET.SubElement(name_elem, "namePart", {"type": "family"}).text = family_name
-                    ET.SubElement(name_elem, "namePart", {"type": "given"}).text = given_name
-
-                    if primary_location_raw_type in ["edited-book","bookanthology/book","Aufsatzsammlung"]:
-                        role_elem = ET.SubElement(name_elem, "role")
-                        ET.SubElement(role_elem, "roleTerm", {"type": "code", "authority": "marcrelator"}).text = "edt"
-                    else:
-                        role_elem = ET.SubElement(name_elem, "role")
-                        ET.SubElement(role_elem, "roleTerm", {"type": "code", "authority": "marcrelator"}).text = "aut"
-
-                    if current_author_data['affiliation']:
-                        ET.SubElement(name_elem, "affiliation").text = current_author_data['affiliation']
-
-                    if current_author_data['orcid']:
-                        orcid_value = current_author_data['orcid'].replace("https://orcid.org/", "")
-                        ET.SubElement(name_elem, "description").text = f"orcid.org={orcid_value}"
-                # If no conflicts, skip this duplicate (don't add it again)
-            else:
-                # First time seeing this author, store their data and create XML
-                seen_authors[display_name] = current_author_data
-                
-                # Create XML for the first instance
-                name_parts = display_name.split()
-                family_name = name_parts[-1] if name_parts else ""
-                given_name = " ".join(name_parts[:-1]) if len(name_parts) > 1 else ""
-
-                name_elem = ET.SubElement(mods, "name", {"type": "personal"})
-                ET.SubElement(name_elem, "namePart", {"type": "family"}).text = family_name
-                ET.SubElement(name_elem, "namePart", {"type": "given"}).text = given_name
-
-                if primary_location_raw_type in ["edited-book","bookanthology/book","Aufsatzsammlung"]:
-                    role_elem = ET.SubElement(name_elem, "role")
-                    ET.SubElement(role_elem, "roleTerm", {"type": "code", "authority": "marcrelator"}).text = "edt"
-                else:
-                    role_elem = ET.SubElement(name_elem, "role")
-                    ET.SubElement(role_elem, "roleTerm", {"type": "code", "authority": "marcrelator"}).text = "aut"
-
-                if current_author_data['affiliation']:
-                    ET.SubElement(name_elem, "affiliation").text = current_author_data['affiliation']
-
-                if current_author_data['orcid']:
-                    orcid_value = current_author_data['orcid'].replace("https://orcid.org/", "")
-                    ET.SubElement(name_elem, "description").text = f"orcid.org={orcid_value}"
-        # Add Language
-        language_field = json_data.get("language", "")
-        if isinstance(language_field, dict):
-            # Extract the "lang" value if the language field is a dictionary
-            language = language_field.get("lang", "")
-        else:
-            # Use the language field directly if it's a string
-            language = language_field
+def lookup_genre_rule(raw_type):
+    """
+    Return the genre rule for a raw_type, counting raw_types without a rule.
+
+    Args:
+        raw_type (str): primary_location raw_type.
+    Returns:
+        dict: Rule with "genres", "role" and "epub_ahead_of_print".
+    """
+    rule = genre_rules.get(normalize_raw_type(raw_type))
+    if rule is None:
+        unmatched_raw_types[raw_type] += 1
+        return default_genre_rule
+    return rule
+
+# Language and country codes missing from the ISO tables, as (table, code) with counts
+# of records ("language") and of authorship affiliations ("country")
+unknown_codes = collections.Counter()
+
+def report_unmatched():
+    """Print the raw_types that fell through to the default genre and the unknown codes, then reset the counts."""
+    if unmatched_raw_types:
+        print("raw_types without a genre rule (mapped to 'vet'):")
+        for raw_type, count in unmatched_raw_types.most_common():
+            print(f"  {raw_type!r}: {count}")
+    for table, heading in (("language", "Unknown language codes (mapped to 'und'):"),
+                           ("country", "Unknown country codes (kept as code):")):
+        counts = [(code, count) for (code_table, code), count in unknown_codes.most_common() if code_table == table]
+        if counts:
+            print(heading)
+            for code, count in counts:
+                print(f"  {code!r}: {count}")
+    unmatched_raw_types.clear()
+    unknown_codes.clear()
+
+# Attributes of the elements created for every author
+SubElement = ET.SubElement
+personal_name_attrib = {"type": "personal"}
+family_name_attrib = {"type": "family"}
+given_name_attrib = {"type": "given"}
+role_term_attrib = {"type": "code", "authority": "marcrelator"}
+
+# Affiliation part ("Name, Country") per institution ID, computed once; cleared
+# when it gets large, so a long-running service does not keep every institution
+institution_affiliations = {}
+max_institution_affiliations = 100000
+
+def institution_affiliation(institution):
+    """
+    Return the "Name, Country" affiliation part of an institution, or None if it has no name.
+
+    Results are cached by institution ID, so each institution is formatted once.
+    Institutions with an unknown country code are not cached, so every
+    occurrence is counted in unknown_codes.
+    """
+    institution_id = institution.id
+    if institution_id in institution_affiliations:
+        return institution_affiliations[institution_id]
+
+    inst_display_name = institution.display_name
+    country_code = institution.country_code
+    country_name = country_names.get(country_code)
+    if not country_name:
+        # Reported once at the end of the run
+        unknown_codes["country", country_code] += 1
+        country_name = country_code
+
+    affiliation = f"{inst_display_name}, {country_name}" if inst_display_name else None
+    if institution_id and country_name != country_code:
+        if len(institution_affiliations) >= max_institution_affiliations:
+            institution_affiliations.clear()
+        institution_affiliations[institution_id] = affiliation
+    return affiliation
+
+# Affiliation string per tuple of institution IDs, for authorships whose
+# institutions are all in institution_affiliations; cleared when it gets large
+authorship_affiliations = {}
+max_authorship_affiliations = 100000
+
+def authorship_affiliation(authorship):
+    """
+    Return the affiliation string of an authorship: the parts of its institutions joined with "; ".
+
+    The string is cached by the tuple of institution IDs once every part is
+    cached, so the authors of a collaboration, who share a few institution
+    combinations, reuse it instead of joining the parts again.
+    """
+    affiliation = authorship_affiliations.get(authorship.institution_ids)
+    if affiliation is not None:
+        return affiliation
+    parts = []
+    for institution in authorship.institutions:
+        part = institution_affiliations.get(institution.id) or institution_affiliation(institution)
+        if part:
+            parts.append(part)
+    affiliation = "; ".join(parts)
+    if all(institution_id in institution_affiliations for institution_id in authorship.institution_ids):
+        if len(authorship_affiliations) >= max_authorship_affiliations:
+            authorship_affiliations.clear()
+        authorship_affiliations[authorship.institution_ids] = affiliation
+    return affiliation
+
+# Combining diacritical marks left by NFKD decomposition ("é" -> "e" + U+0301)
+combining_marks = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+
+@functools.lru_cache(maxsize=1 << 16)
+def normalize_name(display_name):
+    """
+    Normalize an author name for duplicate detection: case and diacritics folded, whitespace collapsed.
+
+    Example: "José  Álvarez" and "jose alvarez" give the same key. Results are
+    cached, as large collaborations repeat the same author list across works.
+    """
+    folded = display_name.casefold()
+    if not folded.isascii():
+        folded = combining_marks.sub("", unicodedata.normalize("NFKD", folded))
+    return " ".join(folded.split())
+
+def dedupe_authorships(authorships):
+    """
+    Remove duplicate authors while preserving order and keeping conflicting entries.
+
+    An authorship is a duplicate of an earlier one with the same ORCID or, failing
+    that, the same normalized name. A duplicate is kept as a separate entry only if
+    it conflicts with the first instance: both have an ORCID and they differ, or both
+    have an affiliation and they differ.
 
-        # Map the two-letter language code to the three-letter code
-        language_term = language_code_mapping.get(language, "und")  # Default to "und" (undefined) if not found
+    Args:
+        authorships (iterable): Authorship objects of a Work.
+    Yields:
+        tuple: (display_name, affiliation, orcid) for each author to output.
+    """
+    seen_names = {}  # normalized display_name -> first instance (affiliation, orcid)
+    seen_orcids = {}  # orcid -> first instance (affiliation, orcid)
+    cached_affiliation = authorship_affiliations.get
+
+    for authorship in authorships:
+        display_name = authorship.display_name
+        orcid = authorship.orcid
+        # Most authorships have an institution combination seen before
+        affiliation = cached_affiliation(authorship.institution_ids)
+        if affiliation is None:
+            affiliation = authorship_affiliation(authorship)
+
+        # ORCID identifies an author first, the normalized name second
+        name_key = normalize_name(display_name)
+        first_instance = (orcid and seen_orcids.get(orcid)) or seen_names.get(name_key)
+
+        if first_instance is None:
+            # First time seeing this author
+            seen_names[name_key] = first_instance = (affiliation, orcid)
+            if orcid:
+                seen_orcids[orcid] = first_instance
+            yield display_name, affiliation, orcid
+            continue
+
+        # Check for conflicts with the first instance
+        first_affiliation, first_orcid = first_instance
+        has_orcid_conflict = first_orcid != orcid and first_orcid and orcid
+        has_affiliation_conflict = first_affiliation != affiliation and first_affiliation and affiliation
+
+        # If there are conflicts, add this as a separate author entry; otherwise skip the duplicate
+        if has_orcid_conflict or has_affiliation_conflict:
+            yield display_name, affiliation, orcid
+
+def add_name(mods, display_name, role, affiliation, orcid):
+    """
+    Add a personal <name> element to a <mods> element.
+
+    Args:
+        mods (ET.Element): Parent <mods> element.
+        display_name (str): Author name; the last word is taken as family name.
+        role (str): marcrelator role code ("aut" or "edt").
+        affiliation (str): Affiliation string, may be empty.
+        orcid (str): ORCID URL or None.
+    """
+    name_parts = display_name.split()
+    family_name = name_parts[-1] if name_parts else ""
+    given_name = " ".join(name_parts[:-1]) if len(name_parts) > 1 else ""
+
+    # Attribute dicts are shared constants; SubElement copies them
+    name_elem = SubElement(mods, "name", personal_name_attrib)
+    SubElement(name_elem, "namePart", family_name_attrib).text = family_name
+    SubElement(name_elem, "namePart", given_name_attrib).text = given_name
+
+    role_elem = SubElement(name_elem, "role")
+    SubElement(role_elem, "roleTerm", role_term_attrib).text = role
+
+    if affiliation:
+        SubElement(name_elem, "affiliation").text = affiliation
+
+    if orcid:
+        orcid_value = orcid.replace("https://orcid.org/", "")
+        SubElement(name_elem, "description").text = f"orcid.org={orcid_value}"
+
+def abstract_from_inverted_index(inverted_index):
+    """
+    Rebuild an abstract in word order from an OpenAlex abstract_inverted_index.
+
+    Each word is scattered into a list preallocated to the length of the
+    abstract (the number of word occurrences), so the rebuild is linear in the
+    number of words. Indexes with positions beyond that length, i.e. with gaps,
+    are sorted instead.
+
+    Example: {"Hello": [0], "world": [1, 3], "again": [2]} -> "Hello world again world"
+
+    Args:
+        inverted_index (dict): Word -> list of positions, or None.
+    Returns:
+        str: The abstract, or "" if there is none.
+    """
+    if not inverted_index:
+        return ""
+    words = [None] * sum(map(len, inverted_index.values()))
+    try:
+        for word, positions in inverted_index.items():
+            for position in positions:
+                words[position] = word
+    except IndexError:
+        pairs = sorted((position, word) for word, positions in inverted_index.items() for position in positions)
+        return " ".join(word for _, word in pairs)
+    # Positions given twice leave empty slots, which are dropped
+    return " ".join(filter(None, words))
+
+def build_mods(json_data):
+    """
+    Convert one JSON record to a <mods> element.
+
+    Args:
+        json_data (dict): OpenAlex work, or a Work decoded from one.
+    Returns:
+        ET.Element: The <mods> element, not attached to any parent.
+    """
+    work = json_data if isinstance(json_data, Work) else Work(json_data)
+    mods = ET.Element("mods", {
+        "version": "3.7",
+        "xsi:schemaLocation": "http://www.loc.gov/mods/v3 http://www.loc.gov/standards/mods/v3/mods-3-7.xsd",
+    })
+
+    # Add genre elements based on primary_location raw_type
+    primary_location = work.primary_location
+    genre_rule = lookup_genre_rule(primary_location.raw_type)
+
+    for genre_attrib, genre_text in genre_rule["genres"]:
+        ET.SubElement(mods, "genre", genre_attrib).text = genre_text
+
+    # Add author information with duplicate handling (preserve order, keep conflicts)
+    for display_name, affiliation, orcid in dedupe_authorships(work.authorships):
+        add_name(mods, display_name, genre_rule["role"], affiliation, orcid)
+
+    # Add Language
+    language_field = work.language
+    if isinstance(language_field, dict):
+        # Extract the "lang" value if the language field is a dictionary
+        language = language_field.get("lang", "")
+    else:
+        # Use the language field directly if it's a string
+        language = language_field
+
+    # Map the two-letter language code to the three-letter code
+    language_term = language_codes.get(language, "und")  # Default to "und" (undefined) if not found
+    if language and language_term == "und":
+        unknown_codes["language", language] += 1
+    
+    # Add title information
+    title = work.title
+    if ":" in title:
+        # Split the title into main title and subtitle
+        main_title, sub_title = map(str.strip, title.split(":", 1))
+        # Remove trailing periods
+        main_title = main_title.rstrip(".")
+        sub_title = sub_title.rstrip(".")  # Remove trailing periods
         
-        # Add title information
-        title = json_data.get("title", "")
-        if ":" in title:
-            # Split the title into main title and subtitle
-            main_title, sub_title = map(str.strip, title.split(":", 1))
-            # Remove trailing periods
-            main_title = main_title.rstrip(".")
-            sub_title = sub_title.rstrip(".")  # Remove trailing periods
-            
-            # Create <titleInfo> with <title> and <subTitle>
-            title_info_elem = ET.SubElement(mods, "titleInfo", {"lang": language_term})
-            ET.SubElement(title_info_elem, "title").text = main_title
-            ET.SubElement(title_info_elem, "subTitle").text = sub_title
+        # Create <titleInfo> with <title> and <subTitle>
+        title_info_elem = ET.SubElement(mods, "titleInfo", {"lang": language_term})
+        ET.SubElement(title_info_elem, "title").text = main_title
+        ET.SubElement(title_info_elem, "subTitle").text = sub_title
+    else:
+        # Remove trailing period and create <titleInfo> with only <title>
+        title = title.rstrip(".")
+        title_info_elem = ET.SubElement(mods, "titleInfo", {"lang": language_term})
+        ET.SubElement(title_info_elem, "title").text = title
+    
+    # Create the <language> element
+    language_elem = ET.SubElement(mods, "language")
+    ET.SubElement(language_elem, "languageTerm", {"type": "code", "authority": "iso639-2b"}).text = language_term
+
+    # Create the <originInfo> element
+    origin_info_elem = ET.SubElement(mods, "originInfo")
+    ET.SubElement(origin_info_elem, "dateIssued").text = str(work.publication_year)
+
+    # Add the <publisher> element only if "host_organization_name" is not None
+    publisher = primary_location.host_organization_name
+    if publisher:
+        ET.SubElement(origin_info_elem, "publisher").text = publisher
+
+    # Create the <physicalDescription> element
+    physical_description_elem = ET.SubElement(mods, "physicalDescription")
+    ET.SubElement(physical_description_elem, "form", {"authority": "marcform"}).text = "electronic"
+
+    # Create the <abstract> element, rebuilt from the inverted index
+    abstract = abstract_from_inverted_index(work.abstract_inverted_index)
+    if abstract:
+        ET.SubElement(mods, "abstract", {"lang": language_term}).text = abstract
+
+    # Create <identifier type=doi> element
+    doi = work.doi
+    if doi and doi.lower() != "none":  # Check if DOI exists and is not "none"
+        doi_value = doi.replace("https://doi.org/", "")
+        ET.SubElement(mods, "identifier", {"type": "doi"}).text = doi_value
+
+    # Create <identifier type=pmid> element
+    pmid = work.pmid
+    if pmid and pmid.lower() != "none":  # Check if PMID exists and is not "none"
+        pmid_value = pmid.replace("https://pubmed.ncbi.nlm.nih.gov/", "")
+        ET.SubElement(mods, "identifier", {"type": "pmid"}).text = pmid_value
+
+    # Only proceed if "source" is not None
+    source = primary_location.source
+    issn = source.issn_l if source else None
+    if issn and isinstance(issn, str):  # Ensure issn is not None and is a string
+        ET.SubElement(mods, "identifier", {"type": "issn"}).text = issn
+
+    # Add location
+    if not doi:
+        # Create <location> with landing_page_url if there is no DOI
+        if primary_location.is_oa is True:
+            location_elem = ET.SubElement(mods, "location")
+            ET.SubElement(location_elem, "url", {"displayLabel": "Fulltext", "note": "free"}).text = primary_location.landing_page_url
         else:
-            # Remove trailing period and create <titleInfo> with only <title>
-            title = title.rstrip(".")
-            title_info_elem = ET.SubElement(mods, "titleInfo", {"lang": language_term})
-            ET.SubElement(title_info_elem, "title").text = title
-        
-        # Create the <language> element
-        language_elem = ET.SubElement(mods, "language")
-        ET.SubElement(language_elem, "languageTerm", {"type": "code", "authority": "iso639-2b"}).text = language_term
+            location_elem = ET.SubElement(mods, "location")
+            ET.SubElement(location_elem, "url", {"displayLabel": "Fulltext"}).text = primary_location.landing_page_url
+
+    # Add related item
+    related_item_elem = ET.SubElement(mods, "relatedItem", {"type": "host"})
+
+    # Check if "source" and "display_name" exist and are not None
+    display_name = source.display_name if source else None
+
+    if display_name:
+        title_info_elem = ET.SubElement(related_item_elem, "titleInfo")
+        ET.SubElement(title_info_elem, "title").text = display_name
+
+    # Use issn in the related item section
+    if issn and isinstance(issn, str):
+        ET.SubElement(related_item_elem, "identifier", {"type": "issn"}).text = issn
+
+    part_elem = ET.SubElement(related_item_elem, "part")
+
+    # Add volume, issue, first_page, and last_page from "biblio"
+    volume = work.volume
+    if volume:
+        detailv_elem = ET.SubElement(part_elem, "detail", {"type": "volume"})
+        ET.SubElement(detailv_elem, "number").text = volume
+
+    issue = work.issue
+    if issue:
+        detaili_elem = ET.SubElement(part_elem, "detail", {"type": "issue"})
+        ET.SubElement(detaili_elem, "number").text = issue
+
+    page_start = work.first_page
+    page_end = work.last_page
+    if page_start or page_end:
+        extent_elem = ET.SubElement(part_elem, "extent")
+        if page_start:
+            ET.SubElement(extent_elem, "start").text = page_start
+        if page_end:
+            ET.SubElement(extent_elem, "end").text = page_end
+   
+
+    if genre_rule["epub_ahead_of_print"] and not volume and not issue:
+        ET.SubElement(mods, "note", {"type": "publicationStatus", "lang": "eng"}).text = "Epub ahead of print"    
+
+    # Add funding information
+    for funder_name in work.funders:
+        if funder_name:
+            ET.SubElement(mods, "note", {"type": "funder"}).text = funder_name
+
+    return mods
+
+# Namespaces declared on the <modsCollection> root
+namespaces = {
+    "": "http://www.loc.gov/mods/v3",  # Default namespace
+    "xlink": "http://www.w3.org/1999/xlink",  # xlink namespace
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance"  # xsi namespace
+}
+
+def create_mods_collection():
+    """
+    Create the empty <modsCollection> root element.
 
-        # Extract the publisher information from "host_organization_name"
-        primary_location = json_data.get("primary_location", {})
-        source = primary_location.get("host_organization_name", None)  # Explicitly check if source is None
+    Returns:
+        ET.Element: The root element with the namespace declarations.
+    """
+    for prefix, uri in namespaces.items():
+        ET.register_namespace(prefix, uri)  # Register namespaces
 
-        # Only proceed if source is not None
-        if source:
-            publisher = source.get("host_organization_name", None)
+    # Create the <modsCollection> element with the default namespace
+    return ET.Element("modsCollection", {
+        "xmlns": namespaces[""],  # Default namespace
+        "xmlns:xlink": namespaces["xlink"],  # xlink namespace
+        "xmlns:xsi": namespaces["xsi"]  # xsi namespace
+    })
 
-            # Create the <originInfo> element
-            origin_info_elem = ET.SubElement(mods, "originInfo")
-            ET.SubElement(origin_info_elem, "dateIssued").text = str(json_data.get("publication_year", ""))
+def json_to_xml(json_data_list, output_file):
+    """
+    Convert a list of JSON records to a single XML file with a <modsCollection> root.
 
-            # Add the <publisher> element only if "host_organization_name" is not None
-            if publisher:
-                ET.SubElement(origin_info_elem, "publisher").text = publisher
-        else:
-            # Create the <originInfo> element without a publisher
-            origin_info_elem = ET.SubElement(mods, "originInfo")
-            ET.SubElement(origin_info_elem, "dateIssued").text = str(json_data.get("publication_year", ""))
-
-        # Create the <physicalDescription> element
-        physical_description_elem = ET.SubElement(mods, "physicalDescription")
-        ET.SubElement(physical_description_elem, "form", {"authority": "marcform"}).text = "electronic"
-
-        # Create <identifier type=doi> element
-        doi = json_data.get("doi", "")
-        if doi and doi.lower() != "none":  # Check if DOI exists and is not "none"
-            doi_value = doi.replace("https://doi.org/", "")
-            ET.SubElement(mods, "identifier", {"type": "doi"}).text = doi_value
-
-        # Create <identifier type=pmid> element
-        pmid = json_data.get("ids", {}).get("pmid", "")
-        if pmid and pmid.lower() != "none":  # Check if PMID exists and is not "none"
-            pmid_value = pmid.replace("https://pubmed.ncbi.nlm.nih.gov/", "")
-            ET.SubElement(mods, "identifier", {"type": "pmid"}).text = pmid_value
-
-        # Initialize issn with a default value
-        issn = None
-
-        # Check if "source" exists
-        primary_location = json_data.get("primary_location", {})
-        source = primary_location.get("source", None)
-
-        # Only proceed if "source" is not None
-        if source:
-            issn = source.get("issn_l", None)  # Explicitly check for None
-            if issn and isinstance(issn, str):  # Ensure issn is not None and is a string
-                ET.SubElement(mods, "identifier", {"type": "issn"}).text = issn
-
-        # Add location
-        primary_location = json_data.get("primary_location", {})
-        
-        if not doi:
-            # Create <location> with landing_page_url if there is no DOI
-            if primary_location.get("is_oa", False) is True:
-                location_elem = ET.SubElement(mods, "location")
-                ET.SubElement(location_elem, "url", {"displayLabel": "Fulltext", "note": "free"}).text = primary_location.get("landing_page_url", "")
-            else:
-                location_elem = ET.SubElement(mods, "location")
-                ET.SubElement(location_elem, "url", {"displayLabel": "Fulltext"}).text = primary_location.get("landing_page_url", "")
-
-        # Add related item
-        related_item_elem = ET.SubElement(mods, "relatedItem", {"type": "host"})
-
-        # Check if "source" and "display_name" exist and are not None
-        source = primary_location.get("source", None)
-        display_name = source.get("display_name", None) if source else None
-
-        if display_name:
-            title_info_elem = ET.SubElement(related_item_elem, "titleInfo")
-            ET.SubElement(title_info_elem, "title").text = display_name
-
-        # Use issn in the related item section
-        if issn and isinstance(issn, str):
-            ET.SubElement(related_item_elem, "identifier", {"type": "issn"}).text = issn
-
-        part_elem = ET.SubElement(related_item_elem, "part")
-
-        # Access the "biblio" object
-        biblio = json_data.get("biblio", {})
-
-        # Extract volume, issue, first_page, and last_page from "biblio"
-        volume = biblio.get("volume", "")
-        if volume:
-            detailv_elem = ET.SubElement(part_elem, "detail", {"type": "volume"})
-            ET.SubElement(detailv_elem, "number").text = volume
-
-        issue = biblio.get("issue", "")
-        if issue:
-            detaili_elem = ET.SubElement(part_elem, "detail", {"type": "issue"})
-            ET.SubElement(detaili_elem, "number").text = issue
-
-        page_start = biblio.get("first_page", "")
-        page_end = biblio.get("last_page", "")
-        if page_start or page_end:
-            extent_elem = ET.SubElement(part_elem, "extent")
-            if page_start:
-                ET.SubElement(extent_elem, "start").text = page_start
-            if page_end:
-                ET.SubElement(extent_elem, "end").text = page_end
-       
-
-        if primary_location_raw_type in ["journal-article", "article-journal", "Article in journal", "Article, other", "Article, other scientific","Article, peer reviewed scientific","contributiontojournal/article",
-                                         "contributiontoperiodical/newspaperarticle","contributionToPeriodical","info:eu-repo/semantics/article","journal article","Journal Item","journalArticle","Article, book review",
-                                         "Article, review","Article, review peer-reviewed scientific"] and not biblio.get("volume") and not biblio.get("issue"):
-            ET.SubElement(mods, "note", {"type": "publicationStatus", "lang": "eng"}).text = "Epub ahead of print"    
-
-        # Add funding information
-        funders = json_data.get("funders", [])
-        if funders:
-            for funder in funders:
-                funder_name = funder.get("display_name", "")
-                if funder_name:
-                    ET.SubElement(mods, "note", {"type": "funder"}).text = funder_name
+    Args:
+        json_data_list (list): List of JSON records to convert.
+        output_file (str): The path to the output XML file.
+    """
+    mods_collection = create_mods_collection()
+
+    # Iterate over each JSON record and create a <mods> element for each
+    for json_data in json_data_list:
+        mods_collection.append(build_mods(json_data))
 
-        
     # Write the XML to a file
     tree = ET.ElementTree(mods_collection)
     tree.write(output_file, encoding="utf-8", xml_declaration=True)
     print(f"XML file saved to {output_file}")
+    report_unmatched()
+
+def escape_text(text):
+    """Escape character data as ElementTree does."""
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+def escape_attribute(value):
+    """Escape an attribute value as ElementTree does, including line breaks and tabs."""
+    value = escape_text(value)
+    if "\"" in value:
+        value = value.replace("\"", "&quot;")
+    if "\r" in value:
+        value = value.replace("\r", "&#13;")
+    if "\n" in value:
+        value = value.replace("\n", "&#10;")
+    if "\t" in value:
+        value = value.replace("\t", "&#09;")
+    return value
+
+def write_element(element, write):
+    """Write the markup of an element, its descendants and its tail through write."""
+    tag = element.tag
+    write("<" + tag)
+    for name, value in element.items():
+        write(f" {name}=\"{escape_attribute(value)}\"")
+    text = element.text
+    if text or len(element):
+        write(">")
+        if text:
+            write(escape_text(text))
+        for child in element:
+            write_element(child, write)
+        write(f"</{tag}>")
+    else:
+        write(" />")
+    if element.tail:
+        write(escape_text(element.tail))
+
+def serialize_etree(mods):
+    """Serialize a <mods> element with ElementTree."""
+    return ET.tostring(mods, encoding="utf-8")
+
+def serialize_direct(mods):
+    """
+    Serialize a <mods> element by writing its escaped markup directly.
+
+    Gives the same bytes as serialize_etree, without ElementTree's namespace
+    and stream handling. Only for trees using prefixed names ("xlink:href"),
+    as build_mods does, rather than "{uri}name" tags and attributes.
+    """
+    parts = []
+    write_element(mods, parts.append)
+    return "".join(parts).encode("utf-8")
+
+# Serializers of <mods> elements to UTF-8 markup, selectable by name
+serializers = {
+    "etree": serialize_etree,
+    "direct": serialize_direct
+}
+default_serializer = "direct"
+
+# XML declaration written by ElementTree
+xml_declaration = b"<?xml version='1.0' encoding='utf-8'?>\n"
+
+def collection_tags():
+    """
+    Return the serialized <modsCollection> start tag, end tag and empty (self-closing) element.
+
+    Returns:
+        tuple: (start_tag, end_tag, empty) as UTF-8 bytes, as ElementTree writes them.
+    """
+    # Split the serialized empty root into its start tag and end tag
+    empty = ET.tostring(create_mods_collection(), encoding="utf-8")
+    return empty[:-len(b" />")] + b">", b"</modsCollection>", empty
+
+def write_mods_fragments(fragments, output_file, resume=None, progress=None):
+    """
+    Write serialized <mods> elements to an XML file with a <modsCollection> root.
+
+    Produces the same bytes as writing the whole tree with tree.write.
+
+    Args:
+        fragments (iterable): UTF-8 encoded <mods> elements, in output order.
+        output_file (str): The path to the output XML file.
+        resume (tuple): (offset, count) saved by an interrupted run: the file is cut
+            back to offset bytes, holding count elements, and continued.
+        progress (callable): Called as progress(count, file) after each element is written.
+    Returns:
+        int: Number of elements written, including those of an interrupted run.
+    """
+    start_tag, end_tag, root_xml = collection_tags()
+
+    count = 0
+    if resume and resume[1]:
+        offset, count = resume
+        file = open(output_file, "r+b")
+        file.truncate(offset)
+        file.seek(offset)
+    else:
+        file = open(output_file, "wb")
+        file.write(xml_declaration)
+    with file:
+        for fragment in fragments:
+            if count == 0:
+                file.write(start_tag)
+            file.write(fragment)
+            count += 1
+            if progress:
+                progress(count, file)
+        # ElementTree writes an empty collection as a self-closing tag
+        file.write(end_tag if count else root_xml)
+    print(f"XML file saved to {output_file}")
+    report_unmatched()
+    return count
+
+def write_mods_stream(mods_elements, output_file, resume=None, progress=None, serializer=default_serializer):
+    """
+    Write <mods> elements to an XML file with a <modsCollection> root, one at a time.
+
+    Each element is serialized as soon as it is received and then dropped.
+
+    Args:
+        mods_elements (iterable): <mods> elements, e.g. from build_mods.
+        output_file (str): The path to the output XML file.
+        resume (tuple): (offset, count) of an interrupted run; see write_mods_fragments.
+        progress (callable): Called as progress(count, file) after each element is written.
+        serializer (str): Name of the serializer in serializers.
+    Returns:
+        int: Number of elements written.
+    """
+    serialize = serializers[serializer]
+    fragments = (serialize(mods) for mods in mods_elements)
+    return write_mods_fragments(fragments, output_file, resume, progress)
+
+def json_to_xml_stream(json_records, output_file, serializer=default_serializer):
+    """
+    Convert JSON records to an XML file, writing each <mods> element as soon as it is built.
+
+    Produces the same bytes as json_to_xml, but holds only one record and one
+    <mods> element in memory at a time.
+
+    Args:
+        json_records (iterable): JSON records, e.g. from recordsOA.iter_records.
+        output_file (str): The path to the output XML file.
+        serializer (str): Name of the serializer in serializers.
+    Returns:
+        int: Number of records written.
+    """
+    mods_elements = (build_mods(json_data) for json_data in json_records)
+    return write_mods_stream(mods_elements, output_file, serializer=serializer)
+
+def convert_chunk(json_records, serializer=default_serializer):
+    """
+    Convert a chunk of records to serialized <mods> elements (run in a worker process).
+
+    Returns:
+        tuple: (fragments, unmatched, unknown) with the UTF-8 encoded <mods> elements in input
+            order, the raw_types of this chunk that matched no genre rule and its unknown codes.
+    """
+    serialize = serializers[serializer]
+    fragments = [serialize(build_mods(json_data)) for json_data in json_records]
+    unmatched = collections.Counter(unmatched_raw_types)
+    unknown = collections.Counter(unknown_codes)
+    unmatched_raw_types.clear()
+    unknown_codes.clear()
+    return fragments, unmatched, unknown
+
+def iter_fragments_parallel(json_records, workers=None, chunk_size=200, serializer=default_serializer):
+    """
+    Convert JSON records to serialized <mods> elements on a pool of worker processes.
+
+    Records are sent to the workers in chunks and the fragments come back in
+    the original order. At most two chunks per worker are in flight, which
+    bounds memory.
+
+    Args:
+        json_records (iterable): JSON records, e.g. from recordsOA.iter_records.
+        workers (int): Number of worker processes (defaults to the number of CPUs).
+        chunk_size (int): Records per chunk sent to a worker.
+        serializer (str): Name of the serializer in serializers.
+    Yields:
+        tuple: (record ID, UTF-8 encoded <mods> element) in input order.
+    """
+    workers = workers or os.cpu_count() or 1
+    records = iter(json_records)
+    # Workers use the same genre rules as this process
+    with ProcessPoolExecutor(max_workers=workers, initializer=set_genre_mapping,
+                             initargs=((genre_rules, default_genre_rule),)) as pool:
+        pending = collections.deque()
+        while True:
+            # Keep the pool busy without reading the whole input ahead
+            while len(pending) < 2 * workers:
+                chunk = list(itertools.islice(records, chunk_size))
+                if not chunk:
+                    break
+                ids = [json_data.get("id") for json_data in chunk]
+                pending.append((ids, pool.submit(convert_chunk, chunk, serializer)))
+            if not pending:
+                return
+            ids, future = pending.popleft()
+            chunk_fragments, unmatched, unknown = future.result()
+            unmatched_raw_types.update(unmatched)
+            unknown_codes.update(unknown)
+            yield from zip(ids, chunk_fragments)
+
+def json_to_xml_parallel(json_records, output_file, workers=None, chunk_size=200, serializer=default_serializer):
+    """
+    Convert JSON records to an XML file on a pool of worker processes.
+
+    The parent writes the fragments returned by iter_fragments_parallel in the
+    original order, so the output is identical to json_to_xml.
+
+    Args:
+        json_records (iterable): JSON records, e.g. from recordsOA.iter_records.
+        output_file (str): The path to the output XML file.
+        workers (int): Number of worker processes (defaults to the number of CPUs).
+        chunk_size (int): Records per chunk sent to a worker.
+        serializer (str): Name of the serializer in serializers.
+    Returns:
+        int: Number of records written.
+    """
+    fragments = iter_fragments_parallel(json_records, workers, chunk_size, serializer)
+    return write_mods_fragments((fragment for _, fragment in fragments), output_file)
+
+def add_subject(mods, classification_code):
+    """
+    Add the Swepub (HSV) classification to a <mods> element.
+
+    Args:
+        mods (ET.Element): <mods> element built by build_mods.
+        classification_code (str): Classification code (e.g., "10205").
+    """
+    ET.SubElement(mods, "subject", {
+        "lang": "eng",
+        "authority": "hsv",
+        "xlink:href": classification_code  # xlink prefix is declared on <modsCollection>
+    })
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert OpenAlex JSON records to MODS XML.")
+    parser.add_argument("input_file", nargs="?", help="JSON array or JSON Lines file (optionally .gz/.zst)")
+    parser.add_argument("output_file", nargs="?", help="MODS XML file to write")
+    parser.add_argument("--stream", action="store_true",
+                        help="read and write one record at a time instead of loading all records")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="convert on N worker processes (0 = convert in this process)")
+    parser.add_argument("--serializer", choices=sorted(serializers), default=default_serializer,
+                        help="how --stream and --workers serialize <mods> elements (default: direct)")
+    parser.add_argument("--genre-mapping", default=default_genre_mapping_file,
+                        help="JSON file with the raw_type -> genre rules")
+    args = parser.parse_args()
+
+    set_genre_mapping(load_genre_mapping(args.genre_mapping))
 
     # Check if command-line arguments are provided
-    if len(sys.argv) < 3:
+    if not args.output_file:
         print(f"No input or output file provided. Using default input file 'openalex_records.json' and output file 'openalex.xml'.")
         input_file = "openalex_records.json"  # Default input file
         output_file = f"openalex.xml"  # Default output file with today's date
     else:
-        input_file = sys.argv[1]
-        output_file = sys.argv[2]
+        input_file = args.input_file
+        output_file = args.output_file
+
+    # Convert on a process pool, or stream records from the input file instead of loading them all at once
+    if args.workers or args.stream:
+        try:
+            if args.workers:
+                json_to_xml_parallel(iter_records(input_file), output_file, args.workers,
+                                     serializer=args.serializer)
+            else:
+                json_to_xml_stream(iter_records(input_file), output_file, args.serializer)
+        except FileNotFoundError:
+            print(f"Error: The file '{input_file}' was not found.")
+            sys.exit(1)
+        sys.exit(0)
 
-    # Load the JSON data from the input file
+    # Load the JSON data (array or JSON Lines, optionally compressed) from the input file
     try:
-        with open(input_file, "r", encoding="utf-8") as file:
-            json_data = json.load(file)
+        json_data = list(iter_records(input_file))
     except FileNotFoundError:
         print(f"Error: The file '{input_file}' was not found.")
         sys.exit(1)
 
     # Convert JSON to XML
-    json_to_xml(json_data, output_file)
\ No newline at end of file
+    json_to_xml(json_data, output_file)